@@ -123,6 +123,19 @@ STATICFILES_DIRS = [BASE_DIR / 'core' / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Caches
+# Upload progress is written by the import worker and read by every gunicorn
+# worker, so it lives in a cache shared across processes rather than LocMem
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'progress': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'logs' / 'progress_cache',
+    },
+}
+
 # Custom User Model
 AUTH_USER_MODEL = 'core.User'
 
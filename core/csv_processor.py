@@ -1,11 +1,21 @@
 """
 CSV/Excel processing and validation component
 """
-from datetime import datetime, date, time as dt_time
+import itertools
+from datetime import datetime, date
 import csv
 from io import StringIO, BytesIO
+from django.db import transaction
 from django.utils import timezone
 from .models import Company, AttendanceRecord
+from .services.bulk_upsert_service import BulkUpsertService
+from .services.checkpoint_service import CheckpointService
+from .services.staging_merge_service import StagingMergeService
+from .services.import_diff_service import ImportDiffService
+from .services.company_resolver import CompanyResolver
+from .services.chunked_reader_service import ChunkedReaderService
+from .date_parsing import parse_date, parse_date_series
+from .time_parsing import parse_time, format_hhmm, parse_time_series
 
 try:
     import pandas as pd
@@ -21,6 +31,33 @@ class CSVProcessor:
     OPTIONAL_FIELDS = ['IN', 'OUT', 'IN (2)', 'OUT (2)', 'IN (3)', 'OUT (3)', 'OVERSTAY', 'HOURS', 'OVERTIME', 'OVERTIME TO MANDAYS']
     VALID_STATUS = ['P', 'A', 'PH', 'PD', 'L', 'WO', '-0.5', '-1']
     
+    # Upload column -> model field for values stored as time objects
+    TIME_FIELDS = {
+        'IN': 'in_time',
+        'OUT': 'out_time',
+        'IN (2)': 'in_time_2',
+        'OUT (2)': 'out_time_2',
+        'IN (3)': 'in_time_3',
+        'OUT (3)': 'out_time_3',
+        'OVERTIME': 'overtime',
+    }
+    
+    # Upload column -> model field for values stored as HH:MM strings
+    HHMM_FIELDS = {
+        'OVERSTAY': 'overstay',
+        'HOURS': 'hours',
+        'OVERTIME TO MANDAYS': 'overtime_to_mandays',
+    }
+    
+    DATE_FORMATS = [
+        '%Y-%m-%d',      # 2025-11-21
+        '%d-%m-%Y',      # 21-11-2025
+        '%d/%m/%Y',      # 21/11/2025
+        '%Y/%m/%d',      # 2025/11/21
+        '%d.%m.%Y',      # 21.11.2025
+        '%Y.%m.%d',      # 2025.11.21
+    ]
+    
     # Column name mappings: Upload file column -> Database column
     # This maps the columns from your upload file to the expected database columns
     COLUMN_ALIASES = {
@@ -37,15 +74,28 @@ class CSVProcessor:
         'REGULAR HOURS': 'OVERTIME TO MANDAYS',
     }
     
-    def __init__(self, fast_mode=True):
+    # Uploads above these sizes are streamed in chunks instead of loaded whole;
+    # XLSX is zip-compressed, so the same rows take far fewer bytes than CSV
+    STREAMING_THRESHOLD_BYTES = 20 * 1024 * 1024
+    XLSX_STREAMING_THRESHOLD_BYTES = 5 * 1024 * 1024
+    CHUNK_SIZE = 5000
+    
+    def __init__(self, fast_mode=True, columnar_validation=True, streaming=None):
         self.errors = []
         self.success_count = 0
         self.updated_count = 0
+        self.unchanged_count = 0
         self.error_count = 0
+        self.failed_ranges = []
+        self.chunk_errors = []
         self.total_rows = 0
         self.processed_rows = 0
         self.progress_callback = None
         self.fast_mode = fast_mode  # Skip heavy validation for speed
+        self.columnar_validation = columnar_validation  # Validate whole columns instead of row by row
+        self.streaming = streaming  # None = stream only CSV/XLSX uploads above the size thresholds
+        self.company_resolver = CompanyResolver()
+        self.chunk_reader = ChunkedReaderService()
     
     def read_file_to_dataframe(self, file):
         """
@@ -136,6 +186,49 @@ class CSVProcessor:
         except Exception as e:
             raise Exception(f'Error reading file: {str(e)}')
     
+    def should_stream(self, file):
+        """
+        Decide whether an upload is read in chunks instead of as one DataFrame
+        
+        Args:
+            file: Uploaded file object
+        
+        Returns:
+            Boolean indicating if chunked reading applies
+        """
+        filename = file.name.lower()
+        if filename.endswith('.csv'):
+            threshold = self.STREAMING_THRESHOLD_BYTES
+        elif filename.endswith('.xlsx'):
+            threshold = self.XLSX_STREAMING_THRESHOLD_BYTES
+        else:
+            return False
+        if self.streaming is not None:
+            return self.streaming
+        size = getattr(file, 'size', None)
+        return size is not None and size > threshold
+    
+    def open_chunks(self, file):
+        """
+        Parse the upload once, returning its first DataFrame and an iterator over all of them
+        
+        When streaming, only the first chunk has been read so far; the iterator
+        yields it again and then continues with the live reader.
+        
+        Args:
+            file: Uploaded file object
+        
+        Returns:
+            Tuple of (first DataFrame or None if unsupported, iterator over DataFrames)
+        """
+        if not self.should_stream(file):
+            df = self.read_file_to_dataframe(file)
+            return df, iter([df])
+        
+        chunks = self.chunk_reader.iter_chunks(file, self.CHUNK_SIZE)
+        first_chunk = next(chunks, pd.DataFrame())
+        return first_chunk, itertools.chain([first_chunk], chunks)
+    
     def validate_csv(self, file):
         """
         Validate CSV/Excel file structure and headers
@@ -147,9 +240,25 @@ class CSVProcessor:
             dict with 'valid' boolean and 'errors' list
         """
         try:
-            # Try to read file as DataFrame
-            df = self.read_file_to_dataframe(file)
-            
+            df, _ = self.open_chunks(file)
+        except Exception as e:
+            return {'valid': False, 'errors': [f'Error reading file: {str(e)}']}
+        finally:
+            file.seek(0)
+        
+        return self.validate_headers(df)
+    
+    def validate_headers(self, df):
+        """
+        Validate the headers of an already parsed upload
+        
+        Args:
+            df: DataFrame (or first chunk) read from the upload, None if unsupported
+        
+        Returns:
+            dict with 'valid' boolean and 'errors' list
+        """
+        try:
             if df is None:
                 return {'valid': False, 'errors': ['Unsupported file format']}
             
@@ -202,47 +311,7 @@ class CSVProcessor:
         Returns:
             date object or None if invalid
         """
-        if date_str is None:
-            return None
-        
-        # Handle pandas NaT (Not a Time)
-        if pd.isna(date_str):
-            return None
-        
-        # If it's already a datetime object (from pandas), convert to date
-        if isinstance(date_str, pd.Timestamp):
-            parsed_date = date_str.date()
-        elif isinstance(date_str, datetime):
-            parsed_date = date_str.date()
-        elif isinstance(date_str, date):
-            parsed_date = date_str
-        else:
-            # It's a string, try to parse it
-            date_str = str(date_str).strip()
-            if not date_str:
-                return None
-            
-            parsed_date = None
-            
-            # Try multiple date formats
-            date_formats = [
-                '%Y-%m-%d',      # 2025-11-21
-                '%d-%m-%Y',      # 21-11-2025
-                '%d/%m/%Y',      # 21/11/2025
-                '%Y/%m/%d',      # 2025/11/21
-                '%d.%m.%Y',      # 21.11.2025
-                '%Y.%m.%d',      # 2025.11.21
-            ]
-            
-            for date_format in date_formats:
-                try:
-                    parsed_date = datetime.strptime(date_str, date_format).date()
-                    break
-                except ValueError:
-                    continue
-            
-            if parsed_date is None:
-                return None
+        parsed_date = parse_date(date_str, self.DATE_FORMATS)
         
         # Check if date is in the future
         if parsed_date and parsed_date > date.today():
@@ -261,46 +330,7 @@ class CSVProcessor:
         Returns:
             time object or None if invalid or empty
         """
-        if not time_str or not time_str.strip():
-            return None
-        
-        time_str = str(time_str).strip()
-        
-        # Handle "0" as a valid value (means no time/zero hours)
-        if time_str == '0' or time_str == '0.0':
-            return None  # Return None to indicate no time value
-        
-        # Handle format like "06:04:00 (N)" or "06:04 (N)" - extract time parts
-        if '(' in time_str and ')' in time_str:
-            # Remove the (N) part for parsing
-            time_str = time_str.split('(')[0].strip()
-        
-        # Parse time manually to support hours > 24
-        parts = time_str.split(':')
-        if len(parts) < 2:
-            return None
-        
-        try:
-            hours = int(parts[0])
-            minutes = int(parts[1])
-            seconds = int(parts[2]) if len(parts) >= 3 else 0
-            
-            # Validate minutes and seconds (0-59)
-            if minutes < 0 or minutes > 59 or seconds < 0 or seconds > 59:
-                return None
-            
-            # For hours > 23, normalize to fit in time object (mod 24)
-            # Store original for display but return normalized time
-            if hours >= 24:
-                # Return time with hours mod 24 for storage
-                normalized_hours = hours % 24
-                return dt_time(normalized_hours, minutes, seconds)
-            elif hours < 0:
-                return None
-            else:
-                return dt_time(hours, minutes, seconds)
-        except (ValueError, TypeError):
-            return None
+        return parse_time(time_str)
     
     def format_time_as_hhmm(self, time_str):
         """
@@ -312,42 +342,7 @@ class CSVProcessor:
         Returns:
             String in HH:MM format or empty string
         """
-        if not time_str or not time_str.strip():
-            return ''
-        
-        time_str = str(time_str).strip()
-        
-        # Handle "0" as no time
-        if time_str in ['0', '0.0', '']:
-            return ''
-        
-        # Handle format like "06:04:00 (N)" or "06:04 (N)" - extract time parts
-        if '(' in time_str and ')' in time_str:
-            time_str = time_str.split('(')[0].strip()
-        
-        # Parse time manually
-        parts = time_str.split(':')
-        if len(parts) < 2:
-            return ''
-        
-        try:
-            hours = int(parts[0])
-            minutes = int(parts[1])
-            
-            # Validate minutes
-            if minutes < 0 or minutes > 59:
-                return ''
-            
-            # Normalize hours > 23 using modulo 24
-            if hours >= 24:
-                hours = hours % 24
-            elif hours < 0:
-                return ''
-            
-            # Return formatted as HH:MM
-            return f"{hours:02d}:{minutes:02d}"
-        except (ValueError, TypeError):
-            return ''
+        return format_hhmm(time_str)
     
     def validate_status(self, status):
         """
@@ -406,19 +401,8 @@ class CSVProcessor:
             errors.append(f"Row {row_number}: Invalid status value '{row['STATUS']}'. Must be one of: {', '.join(self.VALID_STATUS)}")
         
         # Validate optional time fields
-        time_fields = {
-            'IN': 'in_time',
-            'OUT': 'out_time',
-            'IN (2)': 'in_time_2',
-            'OUT (2)': 'out_time_2',
-            'IN (3)': 'in_time_3',
-            'OUT (3)': 'out_time_3',
-            'OVERTIME': 'overtime',
-            'OVERTIME TO MANDAYS': 'overtime_to_mandays'
-        }
-        
         time_values = {}
-        for csv_field, model_field in time_fields.items():
+        for csv_field, model_field in self.TIME_FIELDS.items():
             if csv_field in row and not is_empty(row[csv_field]):
                 value_str = str(row[csv_field]).strip()
                 # Check if it's "0" (valid, means no time)
@@ -447,7 +431,7 @@ class CSVProcessor:
                 return (False, f"Row {row_number}: Access Denied - Company '{company_name}' does not match your assigned company '{user.company.name}'. Admin users can only upload data for their own company.", None)
         
         try:
-            company, _ = Company.objects.get_or_create(name=company_name)
+            company = self.company_resolver.company_for_name(company_name)
         except Exception as e:
             return (False, f"Row {row_number}: Error creating/getting company: {str(e)}", None)
         
@@ -460,12 +444,178 @@ class CSVProcessor:
             'shift': str(row['SHIFT']).strip(),
             'overstay': self.format_time_as_hhmm(row.get('OVERSTAY', '')) if not is_empty(row.get('OVERSTAY')) else '',
             'hours': self.format_time_as_hhmm(row.get('HOURS', '')) if not is_empty(row.get('HOURS')) else '',
+            # Stored as an HH:MM string, like HOURS
+            'overtime_to_mandays': self.format_time_as_hhmm(str(row.get('OVERTIME TO MANDAYS'))) if not is_empty(row.get('OVERTIME TO MANDAYS')) else '',
             'status': str(row['STATUS']).strip(),
             **time_values
         }
         
         return (True, None, data)
     
+    def parse_date_column(self, series):
+        """
+        Vectorized counterpart of validate_date for a whole column
+        
+        Args:
+            series: pandas Series of date strings or datetime values
+        
+        Returns:
+            datetime64 Series normalized to midnight, NaT where invalid or in the future
+        """
+        parsed = parse_date_series(series, self.DATE_FORMATS)
+        return parsed.where(parsed <= pd.Timestamp(date.today()))
+    
+    def parse_time_column(self, series):
+        """
+        Vectorized counterpart of validate_time for a whole column
+        
+        Args:
+            series: pandas Series of time strings
+        
+        Returns:
+            DataFrame from time_parsing.parse_time_series, with boolean 'empty'
+            and 'valid' columns, the parsed 'time' and the 'hhmm' string
+        """
+        return parse_time_series(series)
+    
+    def validate_dataframe(self, df, user, first_row_number=2):
+        """
+        Validate a mapped DataFrame column by column
+        
+        Produces the same error messages and data dictionaries as process_row,
+        but parses each column once as a whole Series. Error messages are only
+        built for the rows that fail.
+        
+        Args:
+            df: DataFrame whose columns are already mapped to expected field names
+            user: User performing the upload
+            first_row_number: Row number of the first DataFrame row for error reporting
+        
+        Returns:
+            tuple (error_mask, row_errors, records) - boolean Series marking failing
+            rows, dict of row number -> error message, and list of data
+            dictionaries for the valid rows
+        """
+        index = df.index
+        
+        def column(field):
+            if field in df.columns:
+                return df[field]
+            return pd.Series(None, index=index, dtype=object)
+        
+        stripped = {}
+        
+        def text(field):
+            if field not in stripped:
+                stripped[field] = column(field).astype(str).str.strip()
+            return stripped[field]
+        
+        def empty(field):
+            return column(field).isna() | text(field).eq('')
+        
+        # Each check is (mask, message builder); checks are listed in process_row order
+        missing_checks = []
+        for field in self.REQUIRED_FIELDS:
+            missing_checks.append((
+                empty(field),
+                lambda n, i, field=field: f"Row {n}: Missing required field '{field}'"
+            ))
+        missing_any = pd.Series(False, index=index)
+        for mask, _ in missing_checks:
+            missing_any |= mask
+        
+        dates = self.parse_date_column(column('DATE'))
+        statuses = text('STATUS')
+        value_checks = [
+            (
+                dates.isna(),
+                lambda n, i: f"Row {n}: Invalid date format or future date in 'DATE' field"
+            ),
+            (
+                ~statuses.isin(self.VALID_STATUS),
+                lambda n, i: f"Row {n}: Invalid status value '{df.at[i, 'STATUS']}'. Must be one of: {', '.join(self.VALID_STATUS)}"
+            ),
+        ]
+        
+        parsed_times = {}
+        for csv_field in self.TIME_FIELDS:
+            parsed = self.parse_time_column(column(csv_field))
+            parsed_times[csv_field] = parsed
+            value_checks.append((
+                ~parsed['empty'] & ~parsed['valid'],
+                lambda n, i, csv_field=csv_field: f"Row {n}: Invalid time format in '{csv_field}' field"
+            ))
+        
+        # Value checks only apply when every required field is present
+        value_checks = [(mask & ~missing_any, build) for mask, build in value_checks]
+        value_any = pd.Series(False, index=index)
+        for mask, _ in value_checks:
+            value_any |= mask
+        
+        # STRICT: Check company access for admin users
+        company_names = text('COMPANY NAME')
+        passed = ~missing_any & ~value_any
+        access_checks = []
+        if user.role == 'admin':
+            if not user.company:
+                access_checks.append((
+                    passed,
+                    lambda n, i: f"Row {n}: Admin user must have a company assigned"
+                ))
+            else:
+                access_checks.append((
+                    passed & company_names.ne(user.company.name),
+                    lambda n, i: f"Row {n}: Access Denied - Company '{company_names.at[i]}' does not match your assigned company '{user.company.name}'. Admin users can only upload data for their own company."
+                ))
+        
+        error_mask = ~passed
+        for mask, _ in access_checks:
+            error_mask |= mask
+        
+        # Build messages only for failing rows
+        row_errors = {}
+        checks = [
+            (mask.to_numpy(), build)
+            for mask, build in missing_checks + value_checks + access_checks
+        ]
+        for position in error_mask.to_numpy().nonzero()[0]:
+            row_number = first_row_number + int(position)
+            label = index[position]
+            messages = [build(row_number, label) for mask, build in checks if mask[position]]
+            row_errors[row_number] = '; '.join(messages)
+        
+        valid_index = index[~error_mask.to_numpy()]
+        if len(valid_index) == 0:
+            return error_mask, row_errors, []
+        
+        companies = self.company_resolver.prefetch_names(company_names[valid_index].unique())
+        
+        data = pd.DataFrame({
+            'ep_no': text('EP NO')[valid_index],
+            'ep_name': text('EP NAME')[valid_index],
+            'company': company_names[valid_index].map(companies),
+            'date': dates[valid_index].dt.date,
+            'shift': text('SHIFT')[valid_index],
+            'status': statuses[valid_index],
+        }, index=valid_index)
+        
+        # Each distinct time was built once, so rows share the objects
+        for csv_field, model_field in self.TIME_FIELDS.items():
+            data[model_field] = parsed_times[csv_field]['time'].loc[valid_index]
+        
+        for csv_field, model_field in self.HHMM_FIELDS.items():
+            parsed = self.parse_time_column(column(csv_field)[valid_index])
+            data[model_field] = parsed['hhmm'].where(parsed['valid'], '')
+        
+        # Plain zip is much cheaper than DataFrame.to_dict for wide frames
+        columns = list(data.columns)
+        records = [
+            dict(zip(columns, values))
+            for values in zip(*(data[name].tolist() for name in columns))
+        ]
+        
+        return error_mask, row_errors, records
+    
     def create_or_update_record(self, data):
         """
         Create new or update existing attendance record
@@ -486,10 +636,207 @@ class CSVProcessor:
         except Exception as e:
             raise Exception(f"Error saving record: {str(e)}")
     
+    def save_batch(self, upsert_service, records):
+        """
+        Write a batch of validated rows with one bulk insert and one bulk update
+        
+        Args:
+            upsert_service: StagingMergeService/BulkUpsertService bound to AttendanceRecord
+            records: List of data dictionaries produced by process_row
+        
+        A failed write raises, so process_chunk rolls back the whole chunk
+        instead of checkpointing past rows that were never written.
+        """
+        created, updated = upsert_service.upsert(records)
+        self.success_count += created
+        self.updated_count += updated
+        self.unchanged_count += len(records) - created - updated
+    
+    def process_dataframe_rows(self, df, user, upsert_service, batch_size, first_row_number=2):
+        """
+        Validate a mapped DataFrame row by row with process_row and save valid rows
+        
+        Args:
+            df: DataFrame whose columns are already mapped to expected field names
+            user: User performing the upload
+            upsert_service: StagingMergeService/BulkUpsertService bound to AttendanceRecord
+            batch_size: Number of valid rows written per upsert
+            first_row_number: Row number of the first DataFrame row for error reporting
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        # Resolve every company named in the file up front; admin uploads only use their own
+        if user.role == 'admin':
+            company_names = [user.company.name] if user.company else []
+        elif 'COMPANY NAME' in df.columns:
+            company_names = df['COMPANY NAME'].dropna().astype(str).str.strip().unique()
+        else:
+            company_names = []
+        self.company_resolver.prefetch_names(company_names)
+        
+        records_to_save = []
+        progress_update_interval = 100  # Update progress every 100 rows for real-time display
+        
+        # Process rows with minimal validation for speed
+        for row_number, row in enumerate(df.to_dict('records'), start=first_row_number):
+            success, error_msg, data = self.process_row(row, row_number, user)
+            
+            if success:
+                records_to_save.append(data)
+            else:
+                self.error_count += 1
+                if len(self.errors) < 100:
+                    self.errors.append(error_msg)
+            
+            self.processed_rows += 1
+            
+            # Update progress frequently for real-time display
+            if self.processed_rows % progress_update_interval == 0:
+                if self.progress_callback:
+                    current_ep = data.get('ep_no') if success and data else None
+                    self.progress_callback(self.processed_rows, self.total_rows, current_ep)
+            
+            # Bulk save every batch_size records
+            if len(records_to_save) >= batch_size:
+                self.save_batch(upsert_service, records_to_save)
+                records_to_save = []
+                
+                # Log progress less frequently for speed
+                if self.processed_rows % 5000 == 0:
+                    logger.info(f'Progress: {self.processed_rows}/{self.total_rows} rows ({int(self.processed_rows/max(self.total_rows, 1)*100)}%)')
+        
+        # Save remaining records
+        if records_to_save:
+            self.save_batch(upsert_service, records_to_save)
+    
+    def process_dataframe_columnar(self, df, user, upsert_service, batch_size, first_row_number=2):
+        """
+        Validate a mapped DataFrame column by column and save valid rows
+        
+        Args:
+            df: DataFrame whose columns are already mapped to expected field names
+            user: User performing the upload
+            upsert_service: StagingMergeService/BulkUpsertService bound to AttendanceRecord
+            batch_size: Number of valid rows written per upsert
+            first_row_number: Row number of the first DataFrame row for error reporting
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        error_mask, row_errors, records = self.validate_dataframe(df, user, first_row_number)
+        
+        self.error_count += len(row_errors)
+        for error_msg in list(row_errors.values())[:max(0, 100 - len(self.errors))]:
+            self.errors.append(error_msg)
+        
+        # Rows are validated up front, so progress follows the writes
+        processed_before = self.processed_rows + len(row_errors)
+        for start in range(0, len(records), batch_size):
+            batch = records[start:start + batch_size]
+            self.save_batch(upsert_service, batch)
+            
+            self.processed_rows = processed_before + start + len(batch)
+            if self.progress_callback:
+                self.progress_callback(self.processed_rows, self.total_rows, batch[-1]['ep_no'])
+            logger.info(f'Progress: {self.processed_rows}/{self.total_rows} rows ({int(self.processed_rows/max(self.total_rows, 1)*100)}%)')
+        
+        self.processed_rows = processed_before - len(row_errors) + len(df)
+    
+    def process_chunk(self, chunk, user, upsert_service, batch_size, first_row_number, checkpoint=None):
+        """
+        Map, validate and write one chunk of the upload in a single transaction
+        
+        Args:
+            chunk: DataFrame as read from the upload
+            user: User performing the upload
+            upsert_service: StagingMergeService/BulkUpsertService bound to AttendanceRecord
+            batch_size: Number of valid rows written per upsert
+            first_row_number: Row number of the first chunk row for error reporting
+            checkpoint: Optional ImportCheckpoint, advanced past this chunk in the
+                same transaction as its rows
+        
+        If a write fails, the chunk is rolled back and its row range is kept in
+        failed_ranges (and on the checkpoint), so a resumed import retries it.
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        start = first_row_number - 2
+        stop = start + len(chunk)
+        row_offset = max(checkpoint.row_offset, stop) if checkpoint is not None else stop
+        counts = (self.success_count, self.updated_count, self.unchanged_count, self.error_count, list(self.errors))
+        processed_before = self.processed_rows
+        
+        mapped_df = self.map_dataframe(chunk)
+        try:
+            with transaction.atomic():
+                if self.columnar_validation:
+                    self.process_dataframe_columnar(mapped_df, user, upsert_service, batch_size, first_row_number)
+                else:
+                    self.process_dataframe_rows(mapped_df, user, upsert_service, batch_size, first_row_number)
+                
+                failed_ranges = self.remove_range(self.failed_ranges, start, stop)
+                if checkpoint is not None:
+                    self.advance_checkpoint(checkpoint, row_offset, failed_ranges)
+            self.failed_ranges = failed_ranges
+        except Exception as e:
+            logger.error(f'Error saving rows {first_row_number}-{first_row_number + len(chunk) - 1}: {str(e)}')
+            self.success_count, self.updated_count, self.unchanged_count, self.error_count, self.errors = counts
+            self.processed_rows = processed_before + len(chunk)
+            self.chunk_errors.append(f'Rows {first_row_number}-{first_row_number + len(chunk) - 1}: {str(e)}')
+            self.failed_ranges = self.remove_range(self.failed_ranges, start, stop) + [(start, stop)]
+            if checkpoint is not None:
+                self.advance_checkpoint(checkpoint, row_offset, self.failed_ranges)
+    
+    def advance_checkpoint(self, checkpoint, row_offset, failed_ranges):
+        """Record the running counts on the checkpoint; rows of failed chunks are not counted"""
+        CheckpointService().advance(
+            checkpoint,
+            row_offset,
+            success_count=self.success_count,
+            updated_count=self.updated_count,
+            unchanged_count=self.unchanged_count,
+            error_count=self.error_count,
+            errors=self.errors,
+            failed_ranges=failed_ranges
+        )
+    
+    @staticmethod
+    def remove_range(row_ranges, start, stop):
+        """Return row_ranges without the rows in [start, stop)"""
+        remaining = []
+        for range_start, range_stop in row_ranges:
+            if range_start < start:
+                remaining.append((range_start, min(range_stop, start)))
+            if range_stop > stop:
+                remaining.append((max(range_start, stop), range_stop))
+        return remaining
+    
     def normalize_column_name(self, col_name):
         """Normalize column name for matching"""
         return str(col_name).strip().upper()
     
+    def map_dataframe(self, df):
+        """
+        Build a DataFrame holding only the mapped columns, renamed to expected field names
+        
+        Args:
+            df: DataFrame as read from the upload
+        
+        Returns:
+            pandas DataFrame with expected field names as columns
+        """
+        # Map columns (only process matching columns)
+        column_mapping = self.map_columns(df.columns.tolist())
+        
+        # Create a new DataFrame with only mapped columns
+        mapped_df = pd.DataFrame(index=df.index)
+        for df_col, expected_col in column_mapping.items():
+            mapped_df[expected_col] = df[df_col]
+        
+        return mapped_df
+    
     def map_columns(self, df_columns):
         """
         Map DataFrame columns to expected field names
@@ -529,24 +876,53 @@ class CSVProcessor:
         
         return column_mapping
     
-    def process_csv(self, file, user):
+    def process_csv(self, file, user, checkpoint=None, dry_run=False):
         """
         Process entire CSV/Excel file
         
+        Rows are committed CHUNK_SIZE at a time. With a checkpoint, rows it
+        records as committed are skipped, its counts are carried over, and
+        it is advanced with every chunk written.
+        
+        A dry run validates every row the same way but only compares the
+        valid ones with the stored records: nothing is written, and the
+        result's counts are what a real run would report, plus a 'diff'
+        with a sample of the changed fields.
+        
         Args:
             file: Uploaded file object
             user: User performing the upload
+            checkpoint: Optional ImportCheckpoint for this file; ignored on a dry run
+            dry_run: Preview the import without writing
         
         Returns:
             dict with processing results
         """
-        self.errors = []
-        self.success_count = 0
-        self.updated_count = 0
-        self.error_count = 0
+        if dry_run:
+            checkpoint = None
+        self.errors = list(checkpoint.errors) if checkpoint else []
+        self.success_count = checkpoint.success_count if checkpoint else 0
+        self.updated_count = checkpoint.updated_count if checkpoint else 0
+        self.unchanged_count = checkpoint.unchanged_count if checkpoint else 0
+        self.error_count = checkpoint.error_count if checkpoint else 0
+        # Chunks whose write failed, as [start, stop) row ranges and messages
+        self.failed_ranges = [tuple(row_range) for row_range in checkpoint.failed_ranges] if checkpoint else []
+        self.chunk_errors = []
+        self.company_resolver = CompanyResolver(create_missing=not dry_run)
+        
+        streaming = self.should_stream(file)
+        
+        # Parse the upload once; the header check and processing share the same frames
+        try:
+            if streaming:
+                # Scan before the reader opens, since the scan moves the file position
+                self.total_rows = self.chunk_reader.count_rows(file)
+            df, chunks = self.open_chunks(file)
+        except Exception as e:
+            validation_result = {'valid': False, 'errors': [f'Error reading file: {str(e)}']}
+        else:
+            validation_result = self.validate_headers(df)
         
-        # Validate file structure
-        validation_result = self.validate_csv(file)
         if not validation_result['valid']:
             return {
                 'success': False,
@@ -556,31 +932,8 @@ class CSVProcessor:
                 'error_count': len(validation_result['errors'])
             }
         
-        # Read file into DataFrame
-        try:
-            df = self.read_file_to_dataframe(file)
-        except Exception as e:
-            return {
-                'success': False,
-                'errors': [str(e)],
-                'success_count': 0,
-                'updated_count': 0,
-                'error_count': 1
-            }
-        
-        # Map columns (only process matching columns)
-        column_mapping = self.map_columns(df.columns.tolist())
-        
-        # Create a new DataFrame with only mapped columns
-        mapped_df = pd.DataFrame()
-        for df_col, expected_col in column_mapping.items():
-            mapped_df[expected_col] = df[df_col]
-        
-        # Convert DataFrame to list of dictionaries
-        rows = mapped_df.to_dict('records')
-        
-        # Set total rows for progress tracking
-        self.total_rows = len(rows)
+        if not streaming:
+            self.total_rows = len(df)
         self.processed_rows = 0
         
         # Import logger for progress updates
@@ -588,149 +941,83 @@ class CSVProcessor:
         logger = logging.getLogger(__name__)
         
         # Log initial progress
-        logger.info(f'Starting to process {self.total_rows} rows')
-        
-        # ULTRA-FAST: Disable indexes for maximum speed
-        from django.db import connection
-        with connection.cursor() as cursor:
-            # Drop indexes temporarily for speed
-            try:
-                cursor.execute("DROP INDEX IF EXISTS core_attendancerecord_ep_no_date_idx")
-                cursor.execute("DROP INDEX IF EXISTS core_attendancerecord_company_id_date_idx")
-                cursor.execute("DROP INDEX IF EXISTS core_attendancerecord_date_idx")
-                logger.info("Indexes dropped for fast import")
-            except:
-                pass  # Indexes might not exist
-        
-        # ULTRA-FAST: Prepare records with minimal processing
-        records_to_create = []
+        logger.info(f'Starting to process {self.total_rows} rows' + (' in chunks' if streaming else ''))
+        
+        # Validated rows are accumulated and merged through a staging table once per batch;
+        # the table's indexes stay in place for everyone else's queries. Rows whose
+        # content hash matches the stored record are skipped
+        if dry_run:
+            upsert_service = ImportDiffService(AttendanceRecord, ('ep_no', 'date'), hash_field='row_hash')
+        elif StagingMergeService.is_supported():
+            upsert_service = StagingMergeService(AttendanceRecord, ('ep_no', 'date'), hash_field='row_hash')
+        else:
+            upsert_service = BulkUpsertService(AttendanceRecord, ('ep_no', 'date'), hash_field='row_hash')
         batch_size = 5000  # MUCH larger batches for maximum speed
-        progress_update_interval = 100  # Update progress every 100 rows for real-time display
         
-        # Process rows with minimal validation for speed
-        for row_number, row in enumerate(rows, start=2):
-            success, error_msg, data = self.process_row(row, row_number, user)
-            
-            if success:
-                try:
-                    records_to_create.append(AttendanceRecord(**data))
-                    self.success_count += 1
-                except Exception as e:
-                    self.error_count += 1
-                    if len(self.errors) < 100:  # Limit error storage
-                        self.errors.append(str(e))
-            else:
-                self.error_count += 1
-                if len(self.errors) < 100:
-                    self.errors.append(error_msg)
-            
-            self.processed_rows += 1
-            
-            # Update progress frequently for real-time display
-            if self.processed_rows % progress_update_interval == 0:
-                if self.progress_callback:
-                    current_ep = data.get('ep_no') if success and data else None
-                    self.progress_callback(self.processed_rows, self.total_rows, current_ep)
-            
-            # Bulk save every batch_size records
-            if len(records_to_create) >= batch_size:
-                try:
-                    # Create new records, updating existing ones
-                    created_records = []
-                    for record in records_to_create:
-                        obj, created = AttendanceRecord.objects.update_or_create(
-                            ep_no=record.ep_no,
-                            date=record.date,
-                            defaults={
-                                'ep_name': record.ep_name,
-                                'company': record.company,
-                                'shift': record.shift,
-                                'overstay': record.overstay,
-                                'status': record.status,
-                                'in_time': record.in_time,
-                                'out_time': record.out_time,
-                                'in_time_2': record.in_time_2,
-                                'out_time_2': record.out_time_2,
-                                'in_time_3': record.in_time_3,
-                                'out_time_3': record.out_time_3,
-                                'overtime': record.overtime,
-                                'overtime_to_mandays': record.overtime_to_mandays,
-                            }
+        # Each chunk is mapped, validated and written before the next one is read. Whole-file
+        # uploads are cut into CHUNK_SIZE pieces too, so they commit and checkpoint as often
+        first_row_number = 2
+        resume_offset = checkpoint.row_offset if checkpoint else 0
+        try:
+            for chunk in chunks:
+                for start in range(0, len(chunk), self.CHUNK_SIZE):
+                    piece = chunk.iloc[start:start + self.CHUNK_SIZE]
+                    piece_start = first_row_number - 2
+                    piece_stop = piece_start + len(piece)
+                    
+                    # Rows committed by an earlier, interrupted run are skipped; rows of
+                    # chunks that failed to write are retried
+                    row_ranges = [
+                        (max(range_start, piece_start), min(range_stop, piece_stop))
+                        for range_start, range_stop in self.failed_ranges
+                        if range_start < piece_stop and range_stop > piece_start
+                    ]
+                    if piece_stop > resume_offset:
+                        row_ranges.append((max(piece_start, resume_offset), piece_stop))
+                    
+                    for range_start, range_stop in row_ranges:
+                        self.process_chunk(
+                            piece.iloc[range_start - piece_start:range_stop - piece_start],
+                            user, upsert_service, batch_size, range_start + 2, checkpoint
                         )
-                        if not created:
-                            self.updated_count += 1
-                except Exception as e:
-                    logger.error(f'Bulk create error: {str(e)}')
-                
-                records_to_create = []
-                
-                # Log progress less frequently for speed
-                if self.processed_rows % 5000 == 0:
-                    logger.info(f'Progress: {self.processed_rows}/{self.total_rows} rows ({int(self.processed_rows/self.total_rows*100)}%)')
+                    self.processed_rows += len(piece) - sum(stop - start for start, stop in row_ranges)
+                    first_row_number = piece_stop + 2
+        except Exception as e:
+            logger.error(f'Error reading file at row {first_row_number}: {str(e)}')
+            self.error_count += 1
+            self.errors.append(f'Error reading file at row {first_row_number}: {str(e)}')
         
-        # Save remaining records
-        if records_to_create:
-            try:
-                for record in records_to_create:
-                    obj, created = AttendanceRecord.objects.update_or_create(
-                        ep_no=record.ep_no,
-                        date=record.date,
-                        defaults={
-                            'ep_name': record.ep_name,
-                            'company': record.company,
-                            'shift': record.shift,
-                            'overstay': record.overstay,
-                            'status': record.status,
-                            'in_time': record.in_time,
-                            'out_time': record.out_time,
-                            'in_time_2': record.in_time_2,
-                            'out_time_2': record.out_time_2,
-                            'in_time_3': record.in_time_3,
-                            'out_time_3': record.out_time_3,
-                            'overtime': record.overtime,
-                            'overtime_to_mandays': record.overtime_to_mandays,
-                        }
-                    )
-                    if not created:
-                        self.updated_count += 1
-            except Exception as e:
-                logger.error(f'Final bulk create error: {str(e)}')
+        # The streamed row count is an estimate; report what was actually read
+        if streaming:
+            self.total_rows = self.processed_rows
+        
+        # Rows of chunks that failed to write count as errors until a resumed import writes them
+        error_count = self.error_count + sum(stop - start for start, stop in self.failed_ranges)
+        errors = self.errors + self.chunk_errors
         
         # Final progress
         if self.progress_callback:
             self.progress_callback(self.processed_rows, self.total_rows)
         
-        # Rebuild indexes for performance
-        logger.info("Rebuilding indexes...")
-        from django.db import connection
-        with connection.cursor() as cursor:
-            try:
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS core_attendancerecord_ep_no_date_idx 
-                    ON core_attendancerecord (ep_no, date)
-                """)
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS core_attendancerecord_company_id_date_idx 
-                    ON core_attendancerecord (company_id, date)
-                """)
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS core_attendancerecord_date_idx 
-                    ON core_attendancerecord (date)
-                """)
-                logger.info("Indexes rebuilt successfully")
-            except Exception as e:
-                logger.error(f"Error rebuilding indexes: {str(e)}")
-        
         # Log final progress
         logger.info(f'Processing complete: {self.processed_rows}/{self.total_rows} rows processed (100%)')
-        logger.info(f'Results: Created={self.success_count}, Updated={self.updated_count}, Errors={self.error_count}')
-        
-        return {
-            'success': self.error_count == 0,
-            'errors': self.errors,
+        logger.info(
+            f'Results: Created={self.success_count}, Updated={self.updated_count}, '
+            f'Unchanged={self.unchanged_count}, Errors={error_count}'
+        )
+        
+        result = {
+            'success': error_count == 0,
+            'errors': errors,
             'success_count': self.success_count,
             'updated_count': self.updated_count,
-            'error_count': self.error_count,
+            'unchanged_count': self.unchanged_count,
+            'error_count': error_count,
+            'failed_ranges': [list(row_range) for row_range in self.failed_ranges],
             'total_rows': self.total_rows,
             'processed_rows': self.processed_rows
         }
+        if dry_run:
+            result['dry_run'] = True
+            result['diff'] = upsert_service.diff.to_dict()
+        return result
@@ -0,0 +1,158 @@
+"""
+Parsing of attendance date values shared by every import path
+
+Uploads write their dates in one of a handful of formats, but a given file
+almost always sticks to one of them. Columns are therefore parsed by sampling
+the distinct values, picking the format most of them match, and converting
+the column with a single to_datetime call; only values that format rejects
+are tried against the others one by one.
+"""
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Optional, Sequence
+
+try:
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+
+DATE_FORMATS = (
+    '%Y-%m-%d',      # 2025-11-21
+    '%d-%m-%Y',      # 21-11-2025
+    '%d/%m/%Y',      # 21/11/2025
+    '%Y/%m/%d',      # 2025/11/21
+    '%d.%m.%Y',      # 21.11.2025
+    '%Y.%m.%d',      # 2025.11.21
+)
+
+# Distinct values tried against each format when inferring a column's format
+SAMPLE_SIZE = 100
+
+# Distinct strings kept by the per-value fallback
+CACHE_SIZE = 4096
+
+
+def to_date(value) -> Optional[date]:
+    """Date of a datetime-like cell (Timestamp, datetime or date), None otherwise"""
+    if isinstance(value, datetime):
+        return None if pd.isna(value) else value.date()
+    if isinstance(value, date):
+        return value
+    return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_date_text(text: str, formats: Sequence[str] = DATE_FORMATS) -> Optional[date]:
+    """
+    Parse a date string with the first of formats it matches
+
+    Args:
+        text: Stripped date string
+        formats: strptime formats, as a tuple, in order of preference
+
+    Returns:
+        date object, or None if no format matches
+    """
+    for date_format in formats:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_date(value, formats: Sequence[str] = DATE_FORMATS) -> Optional[date]:
+    """
+    Parse a single cell into a date
+
+    Args:
+        value: Date string or datetime-like value
+        formats: strptime formats, as a tuple, in order of preference
+
+    Returns:
+        date object, or None if the value is empty or invalid
+    """
+    if value is None:
+        return None
+    parsed = to_date(value)
+    if parsed is not None:
+        return parsed
+    if isinstance(value, float) and value != value:
+        return None
+    text = str(value).strip()
+    if not text:
+        return None
+    return parse_date_text(text, tuple(formats))
+
+
+def infer_date_format(text: 'pd.Series', formats: Sequence[str] = DATE_FORMATS) -> Optional[str]:
+    """
+    Pick the format matching the most of a sample of date strings
+
+    Ties go to the format listed first, so ambiguous values such as 01/02/2024
+    follow the caller's preferred order.
+
+    Args:
+        text: Distinct, stripped date strings
+        formats: strptime formats in order of preference
+
+    Returns:
+        The best format, or None if none matches any sampled value
+    """
+    sample = text.head(SAMPLE_SIZE)
+    best_format, best_count = None, 0
+    for date_format in formats:
+        count = int(pd.to_datetime(sample, format=date_format, errors='coerce').notna().sum())
+        if count > best_count:
+            best_format, best_count = date_format, count
+            if count == len(sample):
+                break
+    return best_format
+
+
+def parse_date_series(series: 'pd.Series', formats: Sequence[str] = DATE_FORMATS) -> 'pd.Series':
+    """
+    Parse a whole date column
+
+    Each distinct value is parsed once. Datetime cells are taken as they are;
+    strings are converted with the format inferred for the column, and the
+    few strings it rejects fall back to parse_date_text.
+
+    Args:
+        series: Column of date strings or datetime values
+        formats: strptime formats in order of preference
+
+    Returns:
+        datetime64 Series aligned with series, normalized to midnight, NaT
+        where the value is missing or invalid
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return pd.to_datetime(series, errors='coerce').dt.normalize()
+
+    formats = tuple(formats)
+    codes, uniques = pd.factorize(series)
+    uniques = pd.Series(uniques, dtype=object)
+    parsed = pd.Series(pd.NaT, index=uniques.index, dtype='datetime64[ns]')
+
+    # Excel cells may already hold datetime objects
+    is_datetime = uniques.map(lambda value: isinstance(value, (datetime, date)))
+    if is_datetime.any():
+        parsed[is_datetime] = pd.to_datetime(uniques[is_datetime], errors='coerce')
+
+    text = uniques[~is_datetime].astype(str).str.strip()
+    text = text[text != '']
+    date_format = infer_date_format(text, formats) if len(text) else None
+    if date_format is not None:
+        parsed[text.index] = pd.to_datetime(text, format=date_format, errors='coerce')
+
+    leftovers = text[parsed[text.index].isna()]
+    if len(leftovers):
+        parsed[leftovers.index] = pd.to_datetime(
+            leftovers.map(lambda value: parse_date_text(value, formats)), errors='coerce'
+        )
+
+    # Missing values are coded -1, which take() reads as the trailing NaT
+    parsed = pd.concat([parsed, pd.Series([pd.NaT], dtype='datetime64[ns]')], ignore_index=True)
+    return pd.Series(parsed.take(codes).to_numpy(), index=series.index).dt.normalize()
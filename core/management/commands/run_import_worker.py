@@ -0,0 +1,62 @@
+"""
+Management command to process queued upload jobs
+"""
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+import os
+import socket
+import time
+
+
+class Command(BaseCommand):
+    help = 'Process queued attendance, manday and Excel upload jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the jobs currently queued, then exit')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--max-jobs', type=int, default=0, help='Exit after this many jobs (0 = no limit)')
+
+    def handle(self, *args, **options):
+        from core.services.import_job_service import ImportJobService
+
+        service = ImportJobService()
+        worker_name = f'{socket.gethostname()}:{os.getpid()}'
+        processed = 0
+
+        requeued = service.requeue_stale()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale job(s)'))
+
+        self.stdout.write(f'Import worker {worker_name} started')
+
+        try:
+            while True:
+                # Long-running process: drop connections the database may have closed
+                close_old_connections()
+
+                job = service.claim_next(worker_name)
+                if job is None:
+                    if options['once']:
+                        break
+                    # Pick up jobs of workers that died while this one was running
+                    requeued = service.requeue_stale()
+                    if requeued:
+                        self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale job(s)'))
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                self.stdout.write(f'Running job {job.id} ({job.kind}): {job.filename}')
+                job = service.run(job)
+
+                if job.status == 'completed':
+                    self.stdout.write(self.style.SUCCESS(f'✓ Job {job.id} completed'))
+                else:
+                    self.stdout.write(self.style.ERROR(f'✗ Job {job.id} failed: {job.error_message}'))
+
+                processed += 1
+                if options['max_jobs'] and processed >= options['max_jobs']:
+                    break
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping import worker')
+
+        self.stdout.write(f'Processed {processed} job(s)')
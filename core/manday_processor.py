@@ -1,12 +1,19 @@
 """
 Manday CSV/Excel processing and validation component
 """
+import itertools
 from datetime import datetime, date, time
 from decimal import Decimal, InvalidOperation
 from io import StringIO, BytesIO
 from django.utils import timezone
 from .models import Company, MandaySummaryRecord
+from .services.bulk_upsert_service import BulkUpsertService
+from .services.company_resolver import CompanyResolver
+from .services.chunked_reader_service import ChunkedReaderService
+from .date_parsing import parse_date, parse_date_series
+from .time_parsing import parse_hours
 import logging
+import time as time_module
 
 try:
     import pandas as pd
@@ -47,7 +54,23 @@ class MandayProcessor:
         'PLANTDESC': 'plantDesc',
     }
     
-    def __init__(self):
+    # Uploads above these sizes are streamed in chunks instead of loaded whole;
+    # XLSX is zip-compressed, so the same rows take far fewer bytes than CSV
+    STREAMING_THRESHOLD_BYTES = 20 * 1024 * 1024
+    XLSX_STREAMING_THRESHOLD_BYTES = 5 * 1024 * 1024
+    CHUNK_SIZE = 5000
+    
+    DATE_FORMATS = [
+        '%Y-%m-%d',      # 2025-11-21
+        '%d-%m-%Y',      # 21-11-2025
+        '%d/%m/%Y',      # 21/11/2025
+        '%Y/%m/%d',      # 2025/11/21
+        '%d.%m.%Y',      # 21.11.2025
+        '%Y.%m.%d',      # 2025.11.21
+        '%m/%d/%Y',      # 11/21/2025 (US format)
+    ]
+    
+    def __init__(self, streaming=None):
         self.errors = []
         self.success_count = 0
         self.updated_count = 0
@@ -55,6 +78,10 @@ class MandayProcessor:
         self.total_rows = 0
         self.processed_rows = 0
         self.progress_callback = None
+        self.company_resolver = CompanyResolver()
+        self.default_company = None
+        self.streaming = streaming  # None = stream only CSV/XLSX/HTML uploads above the size thresholds
+        self.chunk_reader = ChunkedReaderService()
     
     def read_file_to_dataframe(self, file):
         """
@@ -82,13 +109,8 @@ class MandayProcessor:
                 file.seek(0)
                 
                 # Check if file is actually HTML
-                if file_content.startswith(b'<'):
-                    # Read as HTML table
-                    content = file_content.decode('utf-8')
-                    tables = pd.read_html(StringIO(content))
-                    if not tables:
-                        raise Exception('No tables found in HTML file')
-                    df = tables[0]  # Use first table
+                if self.chunk_reader.is_html(file):
+                    df = self.read_html_table(file)
                 else:
                     df = pd.read_excel(BytesIO(file_content), engine='openpyxl')
             elif filename.endswith('.xls'):
@@ -100,13 +122,8 @@ class MandayProcessor:
                 file.seek(0)
                 
                 # Check if file is actually HTML (common issue with .xls files)
-                if file_content.startswith(b'<'):
-                    # Read as HTML table
-                    content = file_content.decode('utf-8')
-                    tables = pd.read_html(StringIO(content))
-                    if not tables:
-                        raise Exception('No tables found in HTML file')
-                    df = tables[0]  # Use first table
+                if self.chunk_reader.is_html(file):
+                    df = self.read_html_table(file)
                 else:
                     try:
                         df = pd.read_excel(BytesIO(file_content), engine='xlrd')
@@ -128,6 +145,68 @@ class MandayProcessor:
         except Exception as e:
             raise Exception(f'Error reading file: {str(e)}')
     
+    def read_html_table(self, file):
+        """
+        Read the first table of an HTML export saved as .xls/.xlsx
+        
+        Args:
+            file: Uploaded file object
+        
+        Returns:
+            pandas DataFrame
+        """
+        chunks = list(self.chunk_reader.iter_html_chunks(file, self.CHUNK_SIZE))
+        file.seek(0)
+        if not chunks:
+            raise Exception('No tables found in HTML file')
+        return pd.concat(chunks, ignore_index=True)
+    
+    def should_stream(self, file):
+        """
+        Decide whether an upload is read in chunks instead of as one DataFrame
+        
+        Args:
+            file: Uploaded file object
+        
+        Returns:
+            Boolean indicating if chunked reading applies
+        """
+        filename = file.name.lower()
+        if filename.endswith('.csv'):
+            threshold = self.STREAMING_THRESHOLD_BYTES
+        elif filename.endswith(('.xls', '.xlsx')) and self.chunk_reader.is_html(file):
+            # HTML exports are text, so they stream from the same size as CSV
+            threshold = self.STREAMING_THRESHOLD_BYTES
+        elif filename.endswith('.xlsx'):
+            threshold = self.XLSX_STREAMING_THRESHOLD_BYTES
+        else:
+            return False
+        if self.streaming is not None:
+            return self.streaming
+        size = getattr(file, 'size', None)
+        return size is not None and size > threshold
+    
+    def open_chunks(self, file):
+        """
+        Parse the upload once, returning its first DataFrame and an iterator over all of them
+        
+        When streaming, only the first chunk has been read so far; the iterator
+        yields it again and then continues with the live reader.
+        
+        Args:
+            file: Uploaded file object
+        
+        Returns:
+            Tuple of (first DataFrame or None if unsupported, iterator over DataFrames)
+        """
+        if not self.should_stream(file):
+            df = self.read_file_to_dataframe(file)
+            return df, iter([df])
+        
+        chunks = self.chunk_reader.iter_chunks(file, self.CHUNK_SIZE)
+        first_chunk = next(chunks, pd.DataFrame())
+        return first_chunk, itertools.chain([first_chunk], chunks)
+    
     def validate_csv(self, file):
         """
         Validate CSV/Excel file structure and headers
@@ -139,9 +218,25 @@ class MandayProcessor:
             dict with 'valid' boolean and 'errors' list
         """
         try:
-            # Try to read file as DataFrame
-            df = self.read_file_to_dataframe(file)
-            
+            df, _ = self.open_chunks(file)
+        except Exception as e:
+            return {'valid': False, 'errors': [f'Error reading file: {str(e)}']}
+        finally:
+            file.seek(0)
+        
+        return self.validate_headers(df)
+    
+    def validate_headers(self, df):
+        """
+        Validate the headers of an already parsed upload
+        
+        Args:
+            df: DataFrame (or first chunk) read from the upload, None if unsupported
+        
+        Returns:
+            dict with 'valid' boolean and 'errors' list
+        """
+        try:
             if df is None:
                 return {'valid': False, 'errors': ['Unsupported file format']}
             
@@ -194,48 +289,7 @@ class MandayProcessor:
         Returns:
             date object or None if invalid
         """
-        if date_str is None:
-            return None
-        
-        # Handle pandas NaT (Not a Time)
-        if pd.isna(date_str):
-            return None
-        
-        # If it's already a datetime object (from pandas), convert to date
-        if isinstance(date_str, pd.Timestamp):
-            parsed_date = date_str.date()
-        elif isinstance(date_str, datetime):
-            parsed_date = date_str.date()
-        elif isinstance(date_str, date):
-            parsed_date = date_str
-        else:
-            # It's a string, try to parse it
-            date_str = str(date_str).strip()
-            if not date_str:
-                return None
-            
-            parsed_date = None
-            
-            # Try multiple date formats
-            date_formats = [
-                '%Y-%m-%d',      # 2025-11-21
-                '%d-%m-%Y',      # 21-11-2025
-                '%d/%m/%Y',      # 21/11/2025
-                '%Y/%m/%d',      # 2025/11/21
-                '%d.%m.%Y',      # 21.11.2025
-                '%Y.%m.%d',      # 2025.11.21
-                '%m/%d/%Y',      # 11/21/2025 (US format)
-            ]
-            
-            for date_format in date_formats:
-                try:
-                    parsed_date = datetime.strptime(date_str, date_format).date()
-                    break
-                except ValueError:
-                    continue
-            
-            if parsed_date is None:
-                return None
+        parsed_date = parse_date(date_str, self.DATE_FORMATS)
         
         # Check if date is in the future
         if parsed_date and parsed_date > date.today():
@@ -243,6 +297,20 @@ class MandayProcessor:
         
         return parsed_date
     
+    def parse_date_column(self, series):
+        """
+        Vectorized counterpart of validate_date for a whole column
+        
+        Args:
+            series: pandas Series of date strings or datetime values
+        
+        Returns:
+            Series of date objects, None where invalid or in the future
+        """
+        parsed = parse_date_series(series, self.DATE_FORMATS)
+        valid = parsed.notna() & (parsed <= pd.Timestamp(date.today()))
+        return parsed.dt.date.astype(object).where(valid, None)
+    
     def validate_time_to_decimal(self, value, field_name):
         """
         Validate time value in HH:MM format and convert to decimal hours
@@ -254,46 +322,7 @@ class MandayProcessor:
         Returns:
             Decimal object representing hours or None if invalid
         """
-        if value is None or (isinstance(value, str) and not value.strip()):
-            return None
-        
-        # Handle pandas NaN
-        if pd.isna(value):
-            return None
-        
-        value_str = str(value).strip()
-        
-        # Check if it's in HH:MM format
-        if ':' in value_str:
-            try:
-                parts = value_str.split(':')
-                if len(parts) != 2:
-                    return None
-                
-                hours = int(parts[0])
-                minutes = int(parts[1])
-                
-                # Validate ranges
-                if hours < 0 or minutes < 0 or minutes >= 60:
-                    return None
-                
-                # Convert to decimal hours
-                decimal_hours = Decimal(hours) + (Decimal(minutes) / Decimal(60))
-                return decimal_hours
-            except (ValueError, InvalidOperation):
-                return None
-        else:
-            # Try to parse as decimal
-            try:
-                decimal_value = Decimal(value_str)
-                
-                # Check if value is negative
-                if decimal_value < 0:
-                    return None
-                
-                return decimal_value
-            except (ValueError, InvalidOperation, TypeError):
-                return None
+        return parse_hours(value)
     
     def decimal_hours_to_time(self, decimal_hours):
         """
@@ -358,7 +387,7 @@ class MandayProcessor:
         except (ValueError, InvalidOperation, TypeError):
             return None
     
-    def process_row(self, row, row_number, user):
+    def process_row(self, row, row_number, user, punch_date=None):
         """
         Process and validate a single CSV/Excel row
         
@@ -366,6 +395,8 @@ class MandayProcessor:
             row: Dictionary containing row data
             row_number: Row number for error reporting
             user: User performing the upload
+            punch_date: punchDate as already parsed by parse_date_column;
+                parsed from the row when None
         
         Returns:
             tuple (success, error_message, data_dict)
@@ -391,7 +422,7 @@ class MandayProcessor:
             return (False, '; '.join(errors), None)
         
         # Validate date
-        date_value = self.validate_date(row['punchDate'])
+        date_value = punch_date if punch_date is not None else self.validate_date(row['punchDate'])
         if date_value is None:
             errors.append(f"Row {row_number}: Invalid date format or future date in 'punchDate' field")
         
@@ -417,13 +448,9 @@ class MandayProcessor:
         ep_no_str = str(row['epNo']).strip()
         
         # Try to find the employee's company from their attendance records
-        from .models import AttendanceRecord
-        existing_attendance = AttendanceRecord.objects.filter(ep_no=ep_no_str).first()
+        company = self.company_resolver.company_for_ep_no(ep_no_str)
         
-        if existing_attendance:
-            # Use the company from the employee's attendance record
-            company = existing_attendance.company
-        else:
+        if not company:
             # No attendance record found - use admin's company or fail
             if user.role == 'admin':
                 if not user.company:
@@ -432,9 +459,7 @@ class MandayProcessor:
                 logger.warning(f"Employee {ep_no_str} not found in attendance records. Using admin's company: {company.name}")
             else:
                 # Root users can create/use any company
-                company = user.company if user.company else Company.objects.first()
-                if not company:
-                    company = Company.objects.create(name="Default Company")
+                company = user.company if user.company else self.get_default_company()
                 logger.warning(f"Employee {ep_no_str} not found in attendance records. Using default company: {company.name}")
         
         # Convert decimal hours to time object for regularMandayHr
@@ -462,6 +487,14 @@ class MandayProcessor:
         
         return (True, None, data)
     
+    def get_default_company(self):
+        """Return the fallback company for root uploads, looked up once per upload"""
+        if self.default_company is None:
+            self.default_company = Company.objects.first()
+            if not self.default_company:
+                self.default_company = Company.objects.create(name="Default Company")
+        return self.default_company
+    
     def create_or_update_record(self, data):
         """
         Create new or update existing manday record
@@ -486,6 +519,31 @@ class MandayProcessor:
         except Exception as e:
             raise Exception(f"Error saving record: {str(e)}")
     
+    def save_batch(self, upsert_service, records):
+        """
+        Write a batch of validated rows with one bulk insert and one bulk update
+        
+        The batch is written inside a single transaction by the upsert service.
+        
+        Args:
+            upsert_service: BulkUpsertService bound to MandaySummaryRecord
+            records: List of data dictionaries produced by process_row
+        """
+        started = time_module.perf_counter()
+        try:
+            created, updated = upsert_service.upsert(records)
+            self.success_count += created
+            self.updated_count += updated
+            logger.info(
+                f'Saved manday batch of {len(records)} rows in {time_module.perf_counter() - started:.3f}s '
+                f'(created={created}, updated={updated})'
+            )
+        except Exception as e:
+            logger.error(f'Manday batch save error after {time_module.perf_counter() - started:.3f}s: {str(e)}')
+            self.error_count += len(records)
+            if len(self.errors) < 100:
+                self.errors.append(f'Error saving {len(records)} records: {str(e)}')
+    
     def normalize_column_name(self, col_name):
         """Normalize column name for matching"""
         return str(col_name).strip().upper()
@@ -529,6 +587,65 @@ class MandayProcessor:
         
         return column_mapping
     
+    def process_chunk(self, df, user, upsert_service, first_row_number=2, batch_size=1000):
+        """
+        Validate and save one DataFrame of uploaded rows
+        
+        Args:
+            df: DataFrame as read from the upload
+            user: User performing the upload
+            upsert_service: BulkUpsertService bound to MandaySummaryRecord
+            first_row_number: Row number of the first DataFrame row for error reporting
+            batch_size: Number of valid rows written per upsert
+        """
+        # Map columns (only process matching columns)
+        column_mapping = self.map_columns(df.columns.tolist())
+        
+        # Create a new DataFrame with only mapped columns
+        mapped_df = pd.DataFrame(index=df.index)
+        for df_col, expected_col in column_mapping.items():
+            mapped_df[expected_col] = df[df_col]
+        
+        # Resolve every employee's company with one query instead of one per row
+        if 'epNo' in mapped_df.columns:
+            self.company_resolver.prefetch_ep_numbers(
+                mapped_df['epNo'].dropna().astype(str).str.strip().unique()
+            )
+        
+        # Dates are parsed for the whole column; process_row only retries the rows this rejects
+        if 'punchDate' in mapped_df.columns:
+            punch_dates = self.parse_date_column(mapped_df['punchDate']).tolist()
+        else:
+            punch_dates = [None] * len(mapped_df)
+        
+        records_to_create = []
+        rows = zip(mapped_df.to_dict('records'), punch_dates)
+        for row_number, (row, punch_date) in enumerate(rows, start=first_row_number):
+            success, error_msg, data = self.process_row(row, row_number, user, punch_date)
+            
+            if success:
+                records_to_create.append(data)
+            else:
+                self.error_count += 1
+                if len(self.errors) < 100:
+                    self.errors.append(error_msg)
+            
+            self.processed_rows += 1
+            
+            if len(records_to_create) >= batch_size:
+                self.save_batch(upsert_service, records_to_create)
+                records_to_create = []
+            
+            # Log progress
+            if self.processed_rows % 1000 == 0:
+                logger.info(f'Progress: {self.processed_rows}/{self.total_rows} rows ({int(self.processed_rows/max(self.total_rows, 1)*100)}%)')
+                if self.progress_callback:
+                    self.progress_callback(self.processed_rows, self.total_rows)
+        
+        # Save remaining records
+        if records_to_create:
+            self.save_batch(upsert_service, records_to_create)
+    
     def process_csv(self, file, user):
         """
         Process entire CSV/Excel file
@@ -544,47 +661,35 @@ class MandayProcessor:
         self.success_count = 0
         self.updated_count = 0
         self.error_count = 0
+        self.company_resolver = CompanyResolver()
+        self.default_company = None
         
-        # Validate file structure
-        validation_result = self.validate_csv(file)
-        if not validation_result['valid']:
-            return {
-                'success': False,
-                'errors': validation_result['errors'],
-                'success_count': 0,
-                'updated_count': 0,
-                'error_count': len(validation_result['errors']),
-                'total_rows': 0,
-                'processed_rows': 0
-            }
+        streaming = self.should_stream(file)
         
-        # Read file into DataFrame
+        # Parse the upload once; the header check and processing share the same frames
         try:
-            df = self.read_file_to_dataframe(file)
+            if streaming:
+                # Scan before the reader opens, since the scan moves the file position
+                self.total_rows = self.chunk_reader.count_rows(file)
+            df, chunks = self.open_chunks(file)
         except Exception as e:
+            validation_result = {'valid': False, 'errors': [f'Error reading file: {str(e)}']}
+        else:
+            validation_result = self.validate_headers(df)
+        
+        if not validation_result['valid']:
             return {
                 'success': False,
-                'errors': [str(e)],
+                'errors': validation_result['errors'],
                 'success_count': 0,
                 'updated_count': 0,
-                'error_count': 1,
+                'error_count': len(validation_result['errors']),
                 'total_rows': 0,
                 'processed_rows': 0
             }
         
-        # Map columns (only process matching columns)
-        column_mapping = self.map_columns(df.columns.tolist())
-        
-        # Create a new DataFrame with only mapped columns
-        mapped_df = pd.DataFrame()
-        for df_col, expected_col in column_mapping.items():
-            mapped_df[expected_col] = df[df_col]
-        
-        # Convert DataFrame to list of dictionaries
-        rows = mapped_df.to_dict('records')
-        
-        # Set total rows for progress tracking
-        self.total_rows = len(rows)
+        if not streaming:
+            self.total_rows = len(df)
         self.processed_rows = 0
         
         # Import logger for progress updates
@@ -592,38 +697,25 @@ class MandayProcessor:
         logger = logging.getLogger(__name__)
         
         # Log initial progress
-        logger.info(f'Starting to process {self.total_rows} manday rows')
+        logger.info(f'Starting to process {self.total_rows} manday rows' + (' in chunks' if streaming else ''))
         
-        # Process rows
-        records_to_create = []
-        batch_size = 1000
+        # Process rows, writing validated rows in batches
+        upsert_service = BulkUpsertService(MandaySummaryRecord, ('ep_no', 'punch_date'))
         
-        for row_number, row in enumerate(rows, start=2):
-            success, error_msg, data = self.process_row(row, row_number, user)
-            
-            if success:
-                try:
-                    created, updated = self.create_or_update_record(data)
-                    if created:
-                        self.success_count += 1
-                    else:
-                        self.updated_count += 1
-                except Exception as e:
-                    self.error_count += 1
-                    if len(self.errors) < 100:  # Limit error storage
-                        self.errors.append(str(e))
-            else:
-                self.error_count += 1
-                if len(self.errors) < 100:
-                    self.errors.append(error_msg)
-            
-            self.processed_rows += 1
-            
-            # Log progress
-            if self.processed_rows % 1000 == 0:
-                logger.info(f'Progress: {self.processed_rows}/{self.total_rows} rows ({int(self.processed_rows/self.total_rows*100)}%)')
-                if self.progress_callback:
-                    self.progress_callback(self.processed_rows, self.total_rows)
+        # Each chunk is mapped, validated and written before the next one is read
+        first_row_number = 2
+        try:
+            for chunk in chunks:
+                self.process_chunk(chunk, user, upsert_service, first_row_number)
+                first_row_number += len(chunk)
+        except Exception as e:
+            logger.error(f'Error reading file at row {first_row_number}: {str(e)}')
+            self.error_count += 1
+            self.errors.append(f'Error reading file at row {first_row_number}: {str(e)}')
+        
+        # The streamed row count is an estimate; report what was actually read
+        if streaming:
+            self.total_rows = self.processed_rows
         
         # Final progress
         if self.progress_callback:
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_importjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importjob',
+            name='kind',
+            field=models.CharField(choices=[('attendance', 'Attendance Upload'), ('manday', 'Manday Summary Upload'), ('excel', 'Excel Import'), ('excel_batch', 'Excel Batch Import')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_importjob_excel_batch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='row_hash',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='file_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='File Hash'),
+        ),
+        migrations.AddField(
+            model_name='uploadlog',
+            name='file_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_content_fingerprints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('attendance', 'Attendance Upload'), ('manday', 'Manday Summary Upload'), ('excel', 'Excel Import'), ('excel_batch', 'Excel Batch Import')], max_length=20)),
+                ('file_hash', models.CharField(max_length=64)),
+                ('part', models.CharField(blank=True, max_length=255)),
+                ('row_offset', models.IntegerField(default=0)),
+                ('success_count', models.IntegerField(default=0)),
+                ('updated_count', models.IntegerField(default=0)),
+                ('error_count', models.IntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_checkpoints', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'import_checkpoints',
+                'unique_together': {('user', 'kind', 'file_hash', 'part')},
+            },
+        ),
+    ]
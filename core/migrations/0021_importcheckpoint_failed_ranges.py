@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_importjob_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importcheckpoint',
+            name='failed_ranges',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
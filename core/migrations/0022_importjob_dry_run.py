@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_importcheckpoint_failed_ranges'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='dry_run',
+            field=models.BooleanField(default=False),
+        ),
+    ]
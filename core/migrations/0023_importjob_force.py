@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_importjob_dry_run'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='force',
+            field=models.BooleanField(default=False),
+        ),
+    ]
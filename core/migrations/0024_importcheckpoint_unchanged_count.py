@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_importjob_force'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importcheckpoint',
+            name='unchanged_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -112,6 +112,9 @@ class AttendanceRecord(models.Model):
     requested_eic_name = models.CharField(max_length=255, blank=True, verbose_name='Requested EIC Name')
     ot_request_status = models.CharField(max_length=20, blank=True, verbose_name='OT Request Status')
     
+    # Hash of the imported values last written by a bulk import; re-imports skip rows that match
+    row_hash = models.CharField(max_length=32, blank=True, editable=False)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -128,6 +131,15 @@ class AttendanceRecord(models.Model):
     def __str__(self):
         return f"{self.ep_no} - {self.ep_name} ({self.date})"
     
+    def save(self, *args, **kwargs):
+        # An edit outside the bulk importers no longer matches the imported hash,
+        # so the next upload of this row must be written again
+        self.row_hash = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'row_hash' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['row_hash']
+        super().save(*args, **kwargs)
+    
     def get_display_name(self):
         """Get the proper employee name, preferring Employee table over fallback format"""
         # If the current name is not a fallback format and not empty, use it
@@ -196,6 +208,7 @@ class UploadLog(models.Model):
     updated_count = models.IntegerField(default=0)
     error_count = models.IntegerField(default=0)
     error_messages = models.TextField(blank=True)
+    file_hash = models.CharField(max_length=64, blank=True, db_index=True)
 
     class Meta:
         ordering = ['-uploaded_at']
@@ -833,6 +846,7 @@ class ImportLog(models.Model):
     error_rows = models.IntegerField(verbose_name='Error Rows')
     status = models.CharField(max_length=20, verbose_name='Status')
     error_report_path = models.CharField(max_length=500, blank=True, verbose_name='Error Report Path')
+    file_hash = models.CharField(max_length=64, blank=True, db_index=True, verbose_name='File Hash')
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -848,6 +862,135 @@ class ImportLog(models.Model):
         return f"{self.filename} - {self.status} ({self.created_at})"
 
 
+class ImportJob(models.Model):
+    """Queued upload, processed outside the request by the run_import_worker command"""
+    KIND_CHOICES = [
+        ('attendance', 'Attendance Upload'),
+        ('manday', 'Manday Summary Upload'),
+        ('excel', 'Excel Import'),
+        ('excel_batch', 'Excel Batch Import'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='import_jobs'
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    filename = models.CharField(max_length=255)
+    file_path = models.CharField(max_length=500)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    # Preview only: the result holds the diff the import would make, and nothing is written
+    dry_run = models.BooleanField(default=False)
+    # Import even if the same file already went through cleanly; unchanged rows are still skipped
+    force = models.BooleanField(default=False)
+    
+    # Filled in by the worker
+    worker = models.CharField(max_length=100, blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    error_message = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed by the worker while the job runs; a stale heartbeat means the worker died
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'import_jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['user', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} - {self.filename} ({self.status})"
+
+
+class ImportCheckpoint(models.Model):
+    """Progress of an import that has not finished, so a rerun of the same file can resume"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='import_checkpoints'
+    )
+    kind = models.CharField(max_length=20, choices=ImportJob.KIND_CHOICES)
+    file_hash = models.CharField(max_length=64)
+    # Sheet name for workbooks imported sheet by sheet; blank otherwise
+    part = models.CharField(max_length=255, blank=True)
+    
+    # Rows [0, row_offset) of the file are committed
+    row_offset = models.IntegerField(default=0)
+    success_count = models.IntegerField(default=0)
+    updated_count = models.IntegerField(default=0)
+    unchanged_count = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    # [start, stop) row ranges before row_offset whose chunk failed; retried on resume
+    failed_ranges = models.JSONField(default=list, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'import_checkpoints'
+        unique_together = ['user', 'kind', 'file_hash', 'part']
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.file_hash[:12]} at row {self.row_offset}"
+
+
+class ChunkedUpload(models.Model):
+    """Large upload sent in fixed-size chunks, so a dropped connection resumes instead of restarting"""
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+    ]
+    
+    upload_id = models.CharField(max_length=32, unique=True)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='chunked_uploads'
+    )
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    chunk_size = models.IntegerField()
+    received_bytes = models.BigIntegerField(default=0)
+    file_hash = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    job = models.ForeignKey(
+        ImportJob,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='chunked_uploads'
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'chunked_uploads'
+        ordering = ['-created_at']
+    
+    @property
+    def next_chunk(self):
+        """Index of the next chunk the server expects"""
+        return self.received_bytes // self.chunk_size
+    
+    def __str__(self):
+        return f"{self.filename} ({self.received_bytes}/{self.total_size} bytes)"
+
+
 class ExportLog(models.Model):
     """Export log for data exports"""
     user = models.ForeignKey(
@@ -0,0 +1,211 @@
+"""
+BatchImportService for importing several Excel files or sheets in one job
+
+Parsing, normalization and database-free validation of each file run in a
+ProcessPoolExecutor sized to the CPU count. The calling process is the only
+one that touches the database: it finishes validation and imports each sheet
+as the prepared results come back.
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import List, Optional
+
+import pandas as pd
+
+from core.services.data_validator_service import DataValidatorService, ValidationReport
+from core.services.file_parser_service import FileParserService, FileType
+from core.services.fingerprint_service import FingerprintService
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PreparedSheet:
+    """A parsed, normalized and validated sheet, ready to import"""
+    name: str
+    file_type: str = ''
+    df: Optional[pd.DataFrame] = None
+    validation_report: Optional[ValidationReport] = None
+    error: str = ''
+    file_hash: str = ''
+
+
+def _init_worker():
+    """Make Django usable in pool workers started with the spawn method"""
+    import django
+    django.setup()
+
+
+def prepare_file(file_path):
+    """
+    Parse, normalize and validate every sheet of a file
+
+    Runs in a pool worker, so it must not use the database.
+
+    Args:
+        file_path: Path to an .xls/.xlsx file
+
+    Returns:
+        List of PreparedSheet
+    """
+    file_parser = FileParserService()
+    validator = DataValidatorService()
+    filename = os.path.basename(file_path)
+    file_hash = FingerprintService().file_hash(file_path)
+
+    sheets, error = file_parser.parse_file_sheets(file_path)
+    if error:
+        return [PreparedSheet(filename, error=error)]
+
+    prepared = []
+    for sheet_name, df in sheets:
+        name = f'{filename} [{sheet_name}]' if len(sheets) > 1 else filename
+        file_type = file_parser.detect_file_type(df)
+        if file_type == FileType.UNKNOWN:
+            prepared.append(PreparedSheet(name, file_type.value, error='Could not detect file type'))
+            continue
+
+        df = file_parser.normalize_data(df, file_type)
+        report = validator.validate_batch(df, file_type.value, check_database=False)
+        prepared.append(PreparedSheet(name, file_type.value, df, report, file_hash=file_hash))
+
+    return prepared
+
+
+class BatchImportService:
+    """Service for importing many files/sheets with parallel parsing and a single DB writer"""
+
+    def __init__(self, max_workers=None):
+        """
+        Args:
+            max_workers: Pool size; defaults to the CPU count (capped at the number of files)
+        """
+        self.max_workers = max_workers
+        # Optional callable(processed_rows, total_rows, current_ep) passed to each sheet's importer
+        self.import_progress_callback = None
+        # Import sheets even when they repeat an earlier clean import
+        self.force = False
+
+    def run(self, file_paths: List[str], user, session_id: str, progress_callback=None) -> List[dict]:
+        """
+        Import every sheet of every file
+
+        Args:
+            file_paths: Paths of the uploaded files
+            user: User performing the import
+            session_id: Session ID for import progress tracking
+            progress_callback: Optional callable(processed_files, total_files)
+
+        Returns:
+            List of per-sheet result dicts
+        """
+        if not file_paths:
+            return []
+
+        workers = self.max_workers or min(os.cpu_count() or 1, len(file_paths))
+        results = []
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = {pool.submit(prepare_file, path): path for path in file_paths}
+            for done, future in enumerate(as_completed(futures), start=1):
+                try:
+                    sheets = future.result()
+                except Exception as e:
+                    logger.error(f"Preparing {futures[future]} failed: {e}")
+                    sheets = [PreparedSheet(os.path.basename(futures[future]), error=str(e))]
+
+                # Imports run here, one sheet at a time, while the pool keeps parsing
+                for sheet in sheets:
+                    results.append(self.import_sheet(sheet, user, session_id))
+
+                if progress_callback:
+                    progress_callback(done, len(file_paths))
+
+        return results
+
+    def import_sheet(self, sheet: PreparedSheet, user, session_id: str) -> dict:
+        """
+        Finish validating a prepared sheet against the database and import it
+
+        Args:
+            sheet: PreparedSheet from prepare_file
+            user: User performing the import
+            session_id: Session ID for import progress tracking
+
+        Returns:
+            Result dict for the sheet
+        """
+        from core.services.checkpoint_service import CheckpointService
+        from core.models import ImportLog
+        from core.services.data_importer_service import DataImporterService
+        from core.services.import_job_service import ImportJobService
+        from core.services.permission_service import PermissionService
+
+        if sheet.error:
+            return {'name': sheet.name, 'success': False, 'error': sheet.error}
+
+        file_type = FileType(sheet.file_type)
+        if not PermissionService().can_upload(user, file_type):
+            return {
+                'name': sheet.name,
+                'success': False,
+                'error': f'You do not have permission to upload {file_type.value} files'
+            }
+
+        importer = DataImporterService()
+        importer.progress_callback = self.import_progress_callback
+        previous = None if self.force else importer.find_repeat_import(user, sheet.file_hash, filename=sheet.name)
+        if previous is not None:
+            result = importer.log_repeat_import(
+                user, sheet.name, file_type, len(sheet.df), sheet.file_hash, previous
+            )
+            return {
+                'name': sheet.name,
+                'success': True,
+                'skipped': True,
+                'file_type': file_type.value,
+                'total_rows': result.total_rows,
+                'imported_rows': 0,
+                'import_duplicate_rows': result.duplicate_rows,
+                'import_log_id': result.import_log_id,
+                'error': ''
+            }
+
+        report = DataValidatorService().validate_database(sheet.df, sheet.validation_report)
+        # Downloadable under the sheet's name, as single uploads are under their filename
+        error_report_path = ImportJobService().save_error_report(user.id, sheet.name, report)
+        checkpoints = CheckpointService()
+        checkpoint = checkpoints.load(user, 'excel_batch', sheet.file_hash, part=sheet.name)
+        result = importer.import_batch(
+            df=sheet.df,
+            file_type=file_type,
+            user=user,
+            filename=sheet.name,
+            session_id=session_id,
+            file_hash=sheet.file_hash,
+            checkpoint=checkpoint
+        )
+        if result.success:
+            checkpoints.clear(checkpoint)
+
+        logger.info(f"Batch import of {sheet.name}: {result.imported_rows} imported, {result.duplicate_rows} duplicates")
+
+        if result.import_log_id and error_report_path:
+            ImportLog.objects.filter(id=result.import_log_id).update(error_report_path=error_report_path)
+
+        return {
+            'name': sheet.name,
+            'success': result.success,
+            'file_type': file_type.value,
+            'total_rows': report.total_rows,
+            'valid_rows': report.valid_rows,
+            'invalid_rows': report.invalid_rows,
+            'duplicate_rows': len(report.duplicates),
+            'has_errors': report.invalid_rows > 0,
+            'imported_rows': result.imported_rows,
+            'import_duplicate_rows': result.duplicate_rows,
+            'import_log_id': result.import_log_id,
+            'error': result.error_message
+        }
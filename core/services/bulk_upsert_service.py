@@ -0,0 +1,185 @@
+"""
+BulkUpsertService for set-based create/update of records keyed on a unique pair
+"""
+import logging
+from django.db import transaction
+from django.utils import timezone
+
+from core.services.fingerprint_service import FingerprintService
+
+logger = logging.getLogger(__name__)
+
+
+class BulkUpsertService:
+    """Service for inserting and updating many rows with a handful of SQL statements"""
+
+    # Stay safely under SQLite's 999 variable limit when filtering on key values
+    KEY_CHUNK_SIZE = 900
+
+    def __init__(self, model, key_fields, hash_field=None):
+        """
+        Args:
+            model: Django model class to write into
+            key_fields: Pair of field names forming the model's unique_together key
+            hash_field: Optional field storing a hash of each row; existing
+                records whose stored hash matches are not rewritten
+        """
+        self.model = model
+        self.key_fields = tuple(key_fields)
+        self.hash_field = hash_field
+
+    def get_key(self, row):
+        """Build the unique key tuple for a row dict"""
+        return tuple(row[field] for field in self.key_fields)
+
+    def fetch_existing_keys(self, keys):
+        """
+        Look up which keys already exist in the database
+
+        Filters on the first key field in chunks and on the range of the
+        second key field, so the cost is one query per KEY_CHUNK_SIZE distinct
+        values instead of one query per row.
+
+        Args:
+            keys: Iterable of key tuples
+
+        Returns:
+            dict mapping existing key tuple -> primary key
+        """
+        return {key: pk for key, (pk, _) in self.fetch_existing(keys).items()}
+
+    def fetch_existing(self, keys):
+        """
+        Like fetch_existing_keys, also returning each record's stored row hash
+
+        Returns:
+            dict mapping existing key tuple -> (primary key, row hash or None)
+        """
+        wanted = set(keys)
+        if not wanted:
+            return {}
+
+        first_field, second_field = self.key_fields
+        first_values = sorted({key[0] for key in wanted})
+        second_values = [key[1] for key in wanted]
+        second_range = (min(second_values), max(second_values))
+
+        columns = ['pk', first_field, second_field]
+        if self.hash_field:
+            columns.append(self.hash_field)
+
+        existing = {}
+        for start in range(0, len(first_values), self.KEY_CHUNK_SIZE):
+            chunk = first_values[start:start + self.KEY_CHUNK_SIZE]
+            queryset = self.model.objects.filter(**{
+                f'{first_field}__in': chunk,
+                f'{second_field}__range': second_range,
+            }).order_by().values_list(*columns)
+
+            for pk, first_value, second_value, *stored_hash in queryset:
+                key = (first_value, second_value)
+                if key in wanted:
+                    existing[key] = (pk, stored_hash[0] if stored_hash else None)
+
+        return existing
+
+    def upsert(self, rows):
+        """
+        Create new rows and update existing ones in a single transaction
+
+        Rows repeating a key within the batch are merged so later values win,
+        matching what sequential create/update calls would store. Existing
+        records only have the fields present in their row written, so rows
+        may carry different field sets.
+
+        With a hash_field, each row is stored with a hash of its values and
+        existing records whose stored hash matches are left alone; they are
+        counted as neither created nor updated.
+
+        Args:
+            rows: List of dicts of model field values, each including the key fields
+
+        Returns:
+            tuple (created_count, updated_count)
+        """
+        if not rows:
+            return (0, 0)
+
+        latest_rows = {}
+        occurrences = {}
+        for row in rows:
+            key = self.get_key(row)
+            latest_rows[key] = {**latest_rows[key], **row} if key in latest_rows else row
+            occurrences[key] = occurrences.get(key, 0) + 1
+
+        if self.hash_field:
+            fingerprints = FingerprintService()
+            for key, row in latest_rows.items():
+                latest_rows[key] = {**row, self.hash_field: fingerprints.row_hash(row)}
+
+        existing = self.fetch_existing(latest_rows.keys())
+
+        now = timezone.now()
+        auto_now_fields = [
+            field.name for field in self.model._meta.concrete_fields
+            if getattr(field, 'auto_now', False)
+        ]
+
+        to_create = []
+        # Existing records grouped by the fields their rows set
+        to_update = {}
+        unchanged_keys = set()
+        for key, row in latest_rows.items():
+            if key in existing:
+                pk, stored_hash = existing[key]
+                if self.hash_field and stored_hash == row[self.hash_field]:
+                    unchanged_keys.add(key)
+                    continue
+                record = self.model(pk=pk, **row)
+                for field_name in auto_now_fields:
+                    setattr(record, field_name, now)
+                update_fields = tuple(sorted(name for name in row if name not in self.key_fields))
+                to_update.setdefault(update_fields, []).append(record)
+            else:
+                to_create.append(self.model(**row))
+
+        with transaction.atomic():
+            if to_create:
+                self.model.objects.bulk_create(to_create)
+            for update_fields, records in to_update.items():
+                self.model.objects.bulk_update(records, list(update_fields) + auto_now_fields)
+
+        updated_count = sum(len(records) for records in to_update.values())
+        # Rows merged into another row of the batch count as updates, unless nothing was written
+        repeated_count = sum(
+            count - 1 for key, count in occurrences.items() if key not in unchanged_keys
+        )
+        return (len(to_create), updated_count + repeated_count)
+
+    def insert_missing(self, rows):
+        """
+        Insert rows whose key is not stored yet, leaving existing records untouched
+
+        When a key repeats within the batch the first row is kept. Conflicts
+        are ignored on insert, so a concurrent import of the same keys cannot
+        fail the batch.
+
+        Args:
+            rows: List of dicts of model field values, each including the key fields
+
+        Returns:
+            Tuple of (created_count, skipped_count)
+        """
+        if not rows:
+            return (0, 0)
+
+        first_rows = {}
+        for row in rows:
+            first_rows.setdefault(self.get_key(row), row)
+
+        existing = self.fetch_existing_keys(first_rows.keys())
+        to_create = [self.model(**row) for key, row in first_rows.items() if key not in existing]
+        if to_create:
+            self.model.objects.bulk_create(to_create, ignore_conflicts=True)
+
+        return (len(to_create), len(rows) - len(to_create))
@@ -0,0 +1,76 @@
+"""
+CheckpointService for resuming interrupted imports
+
+An import records how many rows of the file it has committed, together with
+its running counts, in the same transaction as each chunk it writes. If the
+process dies, the next import of a file with the same fingerprint starts
+from that row instead of from the top.
+"""
+import logging
+
+from core.models import ImportCheckpoint
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointService:
+    """Service for loading, advancing and clearing import checkpoints"""
+
+    # Error messages kept on a checkpoint, matching the processors' own cap
+    MAX_ERRORS = 100
+
+    def load(self, user, kind, file_hash, part=''):
+        """
+        Get the checkpoint for a file, creating an empty one if there is none
+
+        Args:
+            user: User performing the import
+            kind: One of ImportJob.KIND_CHOICES
+            file_hash: FingerprintService.file_hash of the upload
+            part: Sheet name for workbooks imported sheet by sheet
+
+        Returns:
+            ImportCheckpoint
+        """
+        checkpoint, created = ImportCheckpoint.objects.get_or_create(
+            user=user, kind=kind, file_hash=file_hash, part=part
+        )
+        if not created and checkpoint.row_offset:
+            logger.info(f'Resuming {kind} import of {file_hash[:12]} {part} from row {checkpoint.row_offset}')
+        return checkpoint
+
+    def advance(self, checkpoint, row_offset, success_count=0, updated_count=0, error_count=0, errors=None,
+                failed_ranges=None, unchanged_count=0):
+        """
+        Record that the first row_offset rows are committed
+
+        Call inside the transaction that wrote the rows, so the checkpoint
+        never runs ahead of the data.
+
+        Args:
+            checkpoint: ImportCheckpoint from load
+            row_offset: Number of file rows processed so far
+            success_count: Records created so far
+            updated_count: Records updated so far
+            error_count: Rows rejected so far
+            errors: Error messages so far
+            failed_ranges: [start, stop) row ranges before row_offset that
+                were not committed and must be retried
+            unchanged_count: Rows skipped so far because their record already matched
+        """
+        checkpoint.row_offset = row_offset
+        checkpoint.success_count = success_count
+        checkpoint.updated_count = updated_count
+        checkpoint.unchanged_count = unchanged_count
+        checkpoint.error_count = error_count
+        checkpoint.errors = list(errors or [])[:self.MAX_ERRORS]
+        checkpoint.failed_ranges = [list(row_range) for row_range in failed_ranges or []]
+        checkpoint.save(update_fields=[
+            'row_offset', 'success_count', 'updated_count', 'unchanged_count', 'error_count', 'errors',
+            'failed_ranges', 'updated_at'
+        ])
+
+    def clear(self, checkpoint):
+        """Delete a checkpoint once its import has finished"""
+        if checkpoint is not None and checkpoint.pk:
+            checkpoint.delete()
@@ -0,0 +1,430 @@
+"""
+ChunkedReaderService for reading large uploads in fixed-size chunks
+
+Each reader yields pandas DataFrames of at most chunk_size rows, so callers
+can validate and write one chunk before the next one is read and peak memory
+does not grow with the file size.
+"""
+import logging
+import re
+import zipfile
+
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+try:
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkedReaderService:
+    """Service for streaming uploads into DataFrame chunks"""
+
+    DEFAULT_CHUNK_SIZE = 5000
+
+    # Block size used when scanning a file without parsing it
+    SCAN_BLOCK_SIZE = 1024 * 1024
+
+    # The <dimension> element sits near the top of a worksheet's XML
+    DIMENSION_SCAN_BYTES = 4096
+    SHEET_XML_PATTERN = re.compile(r'^xl/worksheets/sheet\d+\.xml$')
+    DIMENSION_PATTERN = re.compile(r'<(?:\w+:)?dimension\s+ref="([^"]+)"')
+
+    # Portal exports saved as .xls/.xlsx are often HTML tables; the markup starts
+    # within the first bytes, after an optional BOM and whitespace
+    HTML_SNIFF_BYTES = 1024
+    HTML_ROW_PATTERN = re.compile(rb'<tr[\s>]', re.IGNORECASE)
+    HTML_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+    def iter_csv_chunks(self, file, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Read a CSV upload in chunks of chunk_size rows
+
+        Args:
+            file: Uploaded file object or binary file-like object
+            chunk_size: Maximum number of rows per chunk
+
+        Yields:
+            DataFrame chunks with stripped column names
+        """
+        file.seek(0)
+        reader = pd.read_csv(file, chunksize=chunk_size, encoding='utf-8')
+        try:
+            for chunk in reader:
+                chunk.columns = chunk.columns.str.strip()
+                yield chunk
+        finally:
+            reader.close()
+
+    def count_csv_rows(self, file):
+        """
+        Estimate the number of data rows in a CSV upload by counting line breaks
+
+        Used for progress reporting only; quoted values containing line breaks
+        make the estimate slightly high.
+
+        Args:
+            file: Uploaded file object or binary file-like object
+
+        Returns:
+            Estimated number of data rows (header excluded)
+        """
+        file.seek(0)
+        line_count = 0
+        last_block = b''
+        while True:
+            block = file.read(self.SCAN_BLOCK_SIZE)
+            if not block:
+                break
+            line_count += block.count(b'\n')
+            last_block = block
+        file.seek(0)
+
+        # A final line without a trailing newline still holds a row
+        if last_block and not last_block.endswith(b'\n'):
+            line_count += 1
+
+        return max(line_count - 1, 0)
+
+    def iter_xlsx_chunks(self, file, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Read the active sheet of an XLSX upload in chunks of chunk_size rows
+
+        Uses openpyxl read-only mode, which streams rows from the sheet XML
+        instead of building the whole workbook object model. The first row is
+        the header; blank rows are kept only when a data row follows them,
+        matching pd.read_excel.
+
+        Args:
+            file: Uploaded file object, binary file-like object or file path
+            chunk_size: Maximum number of rows per chunk
+
+        Yields:
+            DataFrame chunks with stripped column names
+        """
+        if not OPENPYXL_AVAILABLE:
+            raise Exception('Excel support requires the openpyxl package')
+
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            yield from self._iter_worksheet_chunks(workbook.active, chunk_size)
+        finally:
+            workbook.close()
+
+    def iter_xlsx_sheets(self, file, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Read every sheet of an XLSX upload, each in chunks, in read-only mode
+
+        Each sheet's chunk iterator must be consumed before moving on to the
+        next sheet.
+
+        Args:
+            file: Uploaded file object, binary file-like object or file path
+            chunk_size: Maximum number of rows per chunk
+
+        Yields:
+            Tuples of (sheet name, iterator over DataFrame chunks)
+        """
+        if not OPENPYXL_AVAILABLE:
+            raise Exception('Excel support requires the openpyxl package')
+
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            for worksheet in workbook.worksheets:
+                yield worksheet.title, self._iter_worksheet_chunks(worksheet, chunk_size)
+        finally:
+            workbook.close()
+
+    def count_xlsx_rows(self, file):
+        """
+        Estimate the number of data rows in an XLSX upload from the sheet dimensions
+
+        Reads only the <dimension> element at the top of the first worksheet's
+        XML, so neither shared strings nor cells are parsed.
+
+        Args:
+            file: Uploaded file object, binary file-like object or file path
+
+        Returns:
+            Estimated number of data rows (header excluded), 0 if the sheet
+            does not record its dimensions
+        """
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        try:
+            with zipfile.ZipFile(file) as archive:
+                sheets = sorted(
+                    (name for name in archive.namelist() if self.SHEET_XML_PATTERN.match(name)),
+                    key=lambda name: int(re.search(r'\d+', name).group())
+                )
+                if not sheets:
+                    return 0
+                with archive.open(sheets[0]) as sheet:
+                    head = sheet.read(self.DIMENSION_SCAN_BYTES).decode('utf-8', 'ignore')
+        except zipfile.BadZipFile:
+            return 0
+        finally:
+            if hasattr(file, 'seek'):
+                file.seek(0)
+
+        match = self.DIMENSION_PATTERN.search(head)
+        row_numbers = re.findall(r'\d+', match.group(1)) if match else []
+        if not row_numbers:
+            return 0
+        return max(int(row_numbers[-1]) - 1, 0)
+
+    def is_html(self, file):
+        """
+        Check whether a file is markup rather than a spreadsheet
+
+        Args:
+            file: Uploaded file object, binary file-like object or file path
+
+        Returns:
+            True if the file starts with a tag
+        """
+        if hasattr(file, 'read'):
+            file.seek(0)
+            head = file.read(self.HTML_SNIFF_BYTES)
+            file.seek(0)
+        else:
+            with open(file, 'rb') as f:
+                head = f.read(self.HTML_SNIFF_BYTES)
+        return head.lstrip(b'\xef\xbb\xbf \t\r\n').startswith(b'<')
+
+    def iter_html_chunks(self, file, chunk_size=DEFAULT_CHUNK_SIZE, table_number=1):
+        """
+        Read one table of an HTML export in chunks of chunk_size rows
+
+        Rows are taken from lxml's iterparse as each <tr> closes and are freed
+        straight after, so the document tree never holds more than the current
+        row. The first row of the table is the header. Cell text and value
+        types are handled as pd.read_html does: whitespace runs collapse to a
+        single space, colspan repeats the cell, and numbers with thousands
+        separators become numeric.
+
+        Args:
+            file: Uploaded file object, binary file-like object or file path
+            chunk_size: Maximum number of rows per chunk
+            table_number: 1-based position of the table among top-level tables
+
+        Yields:
+            DataFrame chunks with stripped column names
+        """
+        for number, chunks in self.iter_html_tables(file, chunk_size):
+            if number == table_number:
+                yield from chunks
+                return
+            for _ in chunks:
+                pass
+
+    def iter_html_tables(self, file, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Read every top-level table of an HTML export, each in chunks
+
+        Each table's chunk iterator must be consumed before moving on to the
+        next table.
+
+        Args:
+            file: Uploaded file object, binary file-like object or file path
+            chunk_size: Maximum number of rows per chunk
+
+        Yields:
+            Tuples of (1-based table number, iterator over DataFrame chunks)
+        """
+        rows = self._iter_html_rows(file)
+        pending = next(rows, None)
+        while pending is not None:
+            number = pending[0]
+
+            def table_chunks(first=pending):
+                nonlocal pending
+                header = self._html_header(first[1])
+                chunk = []
+                pending = None
+                for row in rows:
+                    if row[0] != number:
+                        pending = row
+                        break
+                    chunk.append(row[1])
+                    if len(chunk) >= chunk_size:
+                        yield self._html_frame(header, chunk)
+                        chunk = []
+                if chunk:
+                    yield self._html_frame(header, chunk)
+
+            yield number, table_chunks()
+
+    def count_html_rows(self, file):
+        """
+        Estimate the number of data rows in an HTML export by counting <tr> tags
+
+        Used for progress reporting only; every table's rows are counted.
+
+        Args:
+            file: Uploaded file object or binary file-like object
+
+        Returns:
+            Estimated number of data rows (header excluded)
+        """
+        file.seek(0)
+        row_count = 0
+        tail = b''
+        while True:
+            block = file.read(self.SCAN_BLOCK_SIZE)
+            if not block:
+                break
+            # Carry over the end of the previous block so a tag split across blocks is counted once
+            data = tail + block
+            row_count += len(self.HTML_ROW_PATTERN.findall(data)) - len(self.HTML_ROW_PATTERN.findall(tail))
+            tail = data[-3:]
+        file.seek(0)
+        return max(row_count - 1, 0)
+
+    def iter_chunks(self, file, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Read a CSV, XLSX or HTML-as-Excel upload in chunks, chosen by file extension and content"""
+        filename = file.name.lower()
+        if filename.endswith(('.xls', '.xlsx')) and self.is_html(file):
+            return self.iter_html_chunks(file, chunk_size)
+        if filename.endswith('.xlsx'):
+            return self.iter_xlsx_chunks(file, chunk_size)
+        return self.iter_csv_chunks(file, chunk_size)
+
+    def count_rows(self, file):
+        """Estimate the number of data rows in a CSV, XLSX or HTML-as-Excel upload"""
+        filename = file.name.lower()
+        if filename.endswith(('.xls', '.xlsx')) and self.is_html(file):
+            return self.count_html_rows(file)
+        if filename.endswith('.xlsx'):
+            return self.count_xlsx_rows(file)
+        return self.count_csv_rows(file)
+
+    def _iter_worksheet_chunks(self, worksheet, chunk_size):
+        """Yield a read-only worksheet's rows as DataFrame chunks, the first row being the header"""
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = self._xlsx_columns(header)
+        width = len(columns)
+
+        chunk = []
+        blank_rows = 0
+        for row in rows:
+            if all(value is None for value in row):
+                blank_rows += 1
+                continue
+            if blank_rows:
+                chunk.extend([(None,) * width] * blank_rows)
+                blank_rows = 0
+            chunk.append(tuple(row[:width]) + (None,) * (width - len(row)))
+            if len(chunk) >= chunk_size:
+                yield self._xlsx_frame(chunk[:chunk_size], columns)
+                chunk = chunk[chunk_size:]
+        if chunk:
+            yield self._xlsx_frame(chunk, columns)
+
+    def _xlsx_columns(self, header):
+        """Build column names from a header row, naming blank cells like pandas does"""
+        columns = []
+        for index, value in enumerate(header):
+            columns.append(str(value).strip() if value is not None else f'Unnamed: {index}')
+        # Drop trailing unnamed columns left by formatting beyond the data
+        while columns and columns[-1].startswith('Unnamed: ') and header[len(columns) - 1] is None:
+            columns.pop()
+        return columns
+
+    def _xlsx_frame(self, rows, columns):
+        """Build a DataFrame from worksheet value tuples"""
+        return pd.DataFrame.from_records(rows, columns=columns).infer_objects()
+
+    def _iter_html_rows(self, file, encoding=None):
+        """
+        Parse an HTML document incrementally, yielding the cells of each table row
+
+        Rows of tables nested inside a cell belong to that cell's text and are
+        not yielded on their own.
+
+        Yields:
+            Tuples of (1-based top-level table number, list of cell texts)
+        """
+        if not LXML_AVAILABLE:
+            raise Exception('HTML table support requires the lxml package')
+
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        if encoding is None:
+            encoding = self._html_encoding(file)
+
+        depth = 0
+        table_number = 0
+        events = etree.iterparse(
+            file, events=('start', 'end'), tag=('table', 'tr'), html=True, encoding=encoding
+        )
+        for event, element in events:
+            if element.tag == 'table':
+                depth += 1 if event == 'start' else -1
+                if event == 'start' and depth == 1:
+                    table_number += 1
+                if event == 'end' and depth == 0:
+                    self._free_html_element(element)
+                continue
+            if event == 'start' or depth != 1:
+                continue
+
+            cells = []
+            for cell in element.iterchildren('td', 'th'):
+                text = self.HTML_WHITESPACE_PATTERN.sub(' ', ''.join(cell.itertext())).strip()
+                try:
+                    span = max(int(cell.get('colspan', 1)), 1)
+                except ValueError:
+                    span = 1
+                cells.extend([text or None] * span)
+            self._free_html_element(element)
+            if cells:
+                yield table_number, cells
+
+    def _html_encoding(self, file):
+        """Use the document's declared charset if it has one, otherwise UTF-8 like CSV uploads"""
+        if hasattr(file, 'read'):
+            head = file.read(self.HTML_SNIFF_BYTES)
+            file.seek(0)
+        else:
+            with open(file, 'rb') as f:
+                head = f.read(self.HTML_SNIFF_BYTES)
+        return None if b'charset' in head.lower() else 'utf-8'
+
+    def _free_html_element(self, element):
+        """Drop a processed element and the already-processed siblings before it"""
+        element.clear(keep_tail=True)
+        parent = element.getparent()
+        if parent is not None:
+            while element.getprevious() is not None:
+                del parent[0]
+
+    def _html_header(self, cells):
+        """Header cells as pandas column labels, with blanks named by TextParser"""
+        return [cell if cell is not None else '' for cell in cells]
+
+    def _html_frame(self, header, rows):
+        """Build a DataFrame from HTML row cells, inferring types as pd.read_html does"""
+        width = len(header)
+        rows = [row[:width] + [None] * (width - len(row)) for row in rows]
+        with TextParser([header] + rows, header=0, thousands=',') as parser:
+            df = parser.read()
+        df.columns = df.columns.str.strip()
+        return df
@@ -0,0 +1,236 @@
+"""
+ChunkedUploadService for receiving large workbooks in resumable chunks
+
+A client opens an upload with the file's name and size, PUTs fixed-size
+chunks in order, and finalizes it. Each chunk is streamed from the request
+straight onto the end of a partial file, so no worker ever holds more than
+one read block in memory. After a dropped connection the client asks for the
+upload's state and carries on from next_chunk. Finalizing moves the file into
+place and queues it for the import worker, which parses it from disk.
+"""
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+from core.models import ChunkedUpload
+from core.services.fingerprint_service import FingerprintService
+from core.services.import_job_service import ImportJobService
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkedUploadError(Exception):
+    """Raised for a chunk or finalize request the upload cannot accept"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ChunkedUploadService:
+    """Service for opening, appending to and finalizing chunked uploads"""
+
+    CHUNK_SIZE = 5 * 1024 * 1024  # 5MB
+    MAX_SIZE = 500 * 1024 * 1024  # 500MB
+
+    # Bytes copied from the request per read
+    READ_BLOCK_SIZE = 64 * 1024
+
+    ALLOWED_EXTENSIONS = ('.xls', '.xlsx')
+
+    # Running SHA-256 per upload, updated as chunks are appended. Chunks that reach a
+    # different worker than the previous one leave it behind, and finalize falls back
+    # to hashing the file from disk.
+    _hashers = {}
+    MAX_HASHERS = 100
+
+    # One lock per upload, so threads of a worker append its chunks one at a time;
+    # the row lock taken with it does the same across workers
+    _locks = {}
+    _locks_guard = threading.Lock()
+
+    @contextmanager
+    def _locked(self, upload):
+        """Hold the upload's thread and row locks, with upload refreshed from the database"""
+        with self._locks_guard:
+            if len(self._locks) >= self.MAX_HASHERS:
+                for upload_id, lock in list(self._locks.items()):
+                    if not lock.locked():
+                        del self._locks[upload_id]
+            lock = self._locks.setdefault(upload.upload_id, threading.Lock())
+
+        with lock, transaction.atomic():
+            ChunkedUpload.objects.select_for_update().filter(pk=upload.pk).first()
+            upload.refresh_from_db()
+            yield upload
+
+    def partial_path(self, upload):
+        """Path of the file being assembled for an upload"""
+        return os.path.join(
+            settings.MEDIA_ROOT, ImportJobService.EXCEL_UPLOAD_SUBDIR, str(upload.user_id),
+            'chunked', f'{upload.upload_id}.part'
+        )
+
+    def final_path(self, upload):
+        """Path of a finalized upload, where the other Excel endpoints expect it"""
+        return os.path.join(
+            settings.MEDIA_ROOT, ImportJobService.EXCEL_UPLOAD_SUBDIR, str(upload.user_id),
+            os.path.basename(upload.filename)
+        )
+
+    def start(self, user, filename, total_size):
+        """
+        Open a chunked upload
+
+        Args:
+            user: User performing the upload
+            filename: Original filename
+            total_size: Size of the whole file in bytes
+
+        Returns:
+            The new ChunkedUpload
+        """
+        filename = os.path.basename(filename or '')
+        if not filename.endswith(self.ALLOWED_EXTENSIONS):
+            raise ChunkedUploadError('Only .xls and .xlsx files are supported')
+        if total_size <= 0:
+            raise ChunkedUploadError('File is empty')
+        if total_size > self.MAX_SIZE:
+            raise ChunkedUploadError(f'File size exceeds maximum limit of {self.MAX_SIZE // (1024 * 1024)}MB')
+
+        upload = ChunkedUpload.objects.create(
+            upload_id=uuid.uuid4().hex,
+            user=user,
+            filename=filename,
+            total_size=total_size,
+            chunk_size=self.CHUNK_SIZE
+        )
+
+        path = self.partial_path(upload)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'wb').close()
+
+        with self._locks_guard:
+            if len(self._hashers) >= self.MAX_HASHERS:
+                self._hashers.clear()
+            self._hashers[upload.upload_id] = (0, hashlib.sha256())
+
+        logger.info(f'Chunked upload {upload.upload_id} opened: {filename} ({total_size} bytes) by {user.username}')
+        return upload
+
+    def append_chunk(self, upload, index, stream):
+        """
+        Append chunk number index, read from stream
+
+        Chunks must arrive in order. Sending a chunk that was already received
+        again is accepted and ignored, so a client that lost the response can
+        simply retry. Requests for the same upload are handled one at a time,
+        and the chunk is checked against the stored offset before the file or
+        the running hash is touched.
+
+        Args:
+            upload: ChunkedUpload in the uploading state
+            index: Zero-based chunk number
+            stream: File-like object with a read(size) method, e.g. the request
+
+        Returns:
+            The updated ChunkedUpload
+        """
+        with self._locked(upload):
+            if upload.status != 'uploading':
+                raise ChunkedUploadError('Upload is already finalized', status=409)
+
+            offset = index * upload.chunk_size
+            if offset < upload.received_bytes:
+                return upload
+            if offset > upload.received_bytes:
+                raise ChunkedUploadError(f'Expected chunk {upload.next_chunk}, got chunk {index}', status=409)
+
+            expected = min(upload.chunk_size, upload.total_size - offset)
+            hashed_bytes, hasher = self._hashers.get(upload.upload_id, (None, None))
+            if hashed_bytes != offset:
+                hasher = None
+
+            written = 0
+            path = self.partial_path(upload)
+            with open(path, 'r+b') as destination:
+                # Drop anything a previous, interrupted attempt at this chunk left behind
+                destination.truncate(offset)
+                destination.seek(offset)
+                while written < expected:
+                    block = stream.read(min(self.READ_BLOCK_SIZE, expected - written))
+                    if not block:
+                        break
+                    destination.write(block)
+                    if hasher is not None:
+                        hasher.update(block)
+                    written += len(block)
+
+                if written != expected or stream.read(1):
+                    destination.truncate(offset)
+                    self._hashers.pop(upload.upload_id, None)
+                    raise ChunkedUploadError(f'Chunk {index} must be exactly {expected} bytes')
+
+            upload.received_bytes = offset + written
+            upload.save(update_fields=['received_bytes', 'updated_at'])
+
+            if hasher is not None:
+                self._hashers[upload.upload_id] = (offset + written, hasher)
+            else:
+                self._hashers.pop(upload.upload_id, None)
+
+        return upload
+
+    def finalize(self, upload, expected_hash='', force=False):
+        """
+        Check the upload is complete and queue it for import
+
+        Args:
+            upload: ChunkedUpload with every chunk received
+            expected_hash: Optional SHA-256 hex digest sent by the client
+            force: Import even if the file repeats an earlier clean import
+
+        Returns:
+            The queued ImportJob
+        """
+        with self._locked(upload):
+            if upload.status != 'uploading':
+                raise ChunkedUploadError('Upload is already finalized', status=409)
+            if upload.received_bytes != upload.total_size:
+                raise ChunkedUploadError(
+                    f'Upload is incomplete: {upload.received_bytes} of {upload.total_size} bytes received', status=409
+                )
+
+            partial_path = self.partial_path(upload)
+            hashed_bytes, hasher = self._hashers.pop(upload.upload_id, (None, None))
+            if hashed_bytes == upload.total_size:
+                file_hash = hasher.hexdigest()
+            else:
+                file_hash = FingerprintService().file_hash(partial_path)
+
+            if expected_hash and expected_hash.lower() != file_hash:
+                raise ChunkedUploadError('Checksum mismatch; the file was corrupted in transit')
+
+            final_path = self.final_path(upload)
+            os.replace(partial_path, final_path)
+
+            job = ImportJobService().enqueue_path(
+                upload.user, 'excel', final_path, os.path.basename(final_path), force=force
+            )
+
+            upload.file_hash = file_hash
+            upload.status = 'complete'
+            upload.job = job
+            upload.save(update_fields=['file_hash', 'status', 'job', 'updated_at'])
+
+        with self._locks_guard:
+            self._locks.pop(upload.upload_id, None)
+
+        logger.info(f'Chunked upload {upload.upload_id} finalized as import job {job.id}')
+        return job
@@ -0,0 +1,108 @@
+"""
+CompanyResolver for resolving companies once per upload
+"""
+from django.db.models import Max
+from core.models import Company, AttendanceRecord
+
+
+class CompanyResolver:
+    """Resolves company names and employee numbers to Company rows with bulk queries"""
+
+    # Stay safely under SQLite's 999 variable limit
+    CHUNK_SIZE = 900
+
+    def __init__(self, create_missing=True):
+        """
+        Args:
+            create_missing: Create companies for names not stored yet; when
+                False they resolve to unsaved Company objects instead, so a
+                dry run can build its rows without writing
+        """
+        self.create_missing = create_missing
+        self._by_name = {}
+        self._by_ep_no = {}
+
+    def prefetch_names(self, names):
+        """
+        Load or create the companies for a set of names
+
+        Existing companies are fetched with one query per chunk and the
+        missing ones are created with a single bulk insert.
+
+        Args:
+            names: Iterable of company names
+
+        Returns:
+            dict mapping company name -> Company
+        """
+        wanted = {name for name in names if name}
+        pending = sorted(wanted - set(self._by_name))
+
+        for start in range(0, len(pending), self.CHUNK_SIZE):
+            chunk = pending[start:start + self.CHUNK_SIZE]
+            for company in Company.objects.filter(name__in=chunk):
+                self._by_name[company.name] = company
+
+        missing = [name for name in pending if name not in self._by_name]
+        if missing and not self.create_missing:
+            for name in missing:
+                self._by_name[name] = Company(name=name)
+        elif missing:
+            # Another upload may create the same company concurrently
+            Company.objects.bulk_create([Company(name=name) for name in missing], ignore_conflicts=True)
+            for start in range(0, len(missing), self.CHUNK_SIZE):
+                chunk = missing[start:start + self.CHUNK_SIZE]
+                for company in Company.objects.filter(name__in=chunk):
+                    self._by_name[company.name] = company
+
+        return {name: self._by_name[name] for name in wanted if name in self._by_name}
+
+    def company_for_name(self, name):
+        """Return the Company for a name, creating it if needed and allowed"""
+        if name not in self._by_name:
+            self.prefetch_names([name])
+        return self._by_name.get(name)
+
+    def prefetch_ep_numbers(self, ep_nos):
+        """
+        Find each employee's company from their attendance records
+
+        When an employee appears under several companies, the company of their
+        most recent attendance record wins.
+
+        Args:
+            ep_nos: Iterable of employee numbers
+
+        Returns:
+            dict mapping employee number -> Company for employees with attendance records
+        """
+        wanted = {ep_no for ep_no in ep_nos if ep_no}
+        pending = sorted(wanted - set(self._by_ep_no))
+
+        latest = {}
+        for start in range(0, len(pending), self.CHUNK_SIZE):
+            chunk = pending[start:start + self.CHUNK_SIZE]
+            rows = (
+                AttendanceRecord.objects.filter(ep_no__in=chunk)
+                .order_by()
+                .values('ep_no', 'company_id')
+                .annotate(latest_date=Max('date'))
+            )
+            for row in rows:
+                current = latest.get(row['ep_no'])
+                if current is None or row['latest_date'] > current[1]:
+                    latest[row['ep_no']] = (row['company_id'], row['latest_date'])
+
+        companies = Company.objects.in_bulk({company_id for company_id, _ in latest.values()})
+        for ep_no in pending:
+            company_id = latest.get(ep_no, (None, None))[0]
+            # Cache misses too, so unknown employees are not looked up again
+            self._by_ep_no[ep_no] = companies.get(company_id)
+
+        return {ep_no: self._by_ep_no[ep_no] for ep_no in wanted if self._by_ep_no.get(ep_no)}
+
+    def company_for_ep_no(self, ep_no):
+        """Return the Company from an employee's attendance records, or None"""
+        if ep_no not in self._by_ep_no:
+            self.prefetch_ep_numbers([ep_no])
+        return self._by_ep_no.get(ep_no)
@@ -1,21 +1,29 @@
 """
 Data Importer Service for Excel File Upload Integration
 
-This service imports validated data into the database with transaction management.
+This service imports validated data into the database in chunked transactions.
 """
+from datetime import date, datetime
+import numpy as np
 import pandas as pd
-from django.db import transaction
-from django.core.cache import cache
 from typing import Dict, List, Tuple, Callable, Optional
 from dataclasses import dataclass
 import logging
 
+from django.db import transaction
+
 from core.models import (
     Employee, Contractor, Plant,
     PunchRecord, DailySummary, OvertimeRequest, PartialDayRequest, RegularizationRequest,
     ImportLog, User
 )
 from core.services.file_parser_service import FileType
+from core.services.progress_service import ProgressService
+from core.services.bulk_upsert_service import BulkUpsertService
+from core.services.checkpoint_service import CheckpointService
+from core.services.company_resolver import CompanyResolver
+from core.services.import_diff_service import ImportDiffService
+from core.time_parsing import format_hhmm, parse_time
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +38,8 @@ class ImportResult:
     error_rows: int
     error_message: str = ""
     import_log_id: int = None
+    skipped: bool = False  # Identical to an earlier import, so nothing was written
+    diff: dict = None  # ImportDiff.to_dict() of a dry run, which writes nothing
 
 
 @dataclass
@@ -48,27 +58,75 @@ class DataImporterService:
     
     BATCH_SIZE = 1000  # Number of records to process in each batch
     
+    # Overtime request specific AttendanceRecord fields -> possible column names
+    ATTENDANCE_OT_FIELDS = {
+        'actual_overstay': ['actual_overstay', 'actual overstay', 'actualoverstay'],
+        'requested_overtime': ['requested_overtime', 'requested overtime', 'requestedovertime'],
+        'approved_overtime': ['approved_overtime', 'approved overtime', 'approvedovertime'],
+        'requested_regular_manday_hours': ['requested_regular_manday_hours', 'requested regular manday hours'],
+        'approved_regular_manday_hours': ['approved_regular_manday_hours', 'approved regular manday hours'],
+        'contractor_ot_remarks': ['contractor_ot_remarks', 'contractor ot remarks', 'ot remarks'],
+        'contractor_ot_reason': ['contractor_ot_reason', 'contractor ot reason', 'ot reason'],
+        'requested_eic_code': ['requested_eic_code', 'requested eic code', 'eic code'],
+        'requested_eic_name': ['requested_eic_name', 'requested eic name', 'eic name'],
+        'ot_request_status': ['ot_request_status', 'ot request status', 'request status'],
+    }
+    
+    # Time fields -> possible column names
+    ATTENDANCE_TIME_FIELDS = {
+        'punch1_in': ['punch1 in', 'punch1_in', 'in', 'in_time'],
+        'punch2_out': ['punch2 out', 'punch2_out', 'out', 'out_time'],
+        'punch3_in': ['punch3 in', 'punch3_in', 'in (2)', 'in_time_2'],
+        'punch4_out': ['punch4 out', 'punch4_out', 'out (2)', 'out_time_2'],
+        'punch5_in': ['punch5 in', 'punch5_in', 'in (3)', 'in_time_3'],
+        'punch6_out': ['punch6 out', 'punch6_out', 'out (3)', 'out_time_3'],
+        'overstay': ['overstay'],
+        'overtime': ['overtime'],
+        'regular_hours': ['regular_hours', 'regular hours', 'overtime_to_mandays', 'overtime to mandays'],
+        'hours_worked': ['hours_worked', 'hours worked', 'hours', 'hrs'],
+    }
+    
+    # Time fields stored as time objects -> AttendanceRecord fields
+    ATTENDANCE_TIME_FIELD_MAP = {
+        'punch1_in': 'in_time',
+        'punch2_out': 'out_time',
+        'punch3_in': 'in_time_2',
+        'punch4_out': 'out_time_2',
+        'punch5_in': 'in_time_3',
+        'punch6_out': 'out_time_3',
+        'overtime': 'overtime',
+    }
+    
     def __init__(self):
         """Initialize importer service"""
-        pass
+        self.progress = ProgressService()
+        # Optional callable(processed_rows, total_rows, current_ep), called after each chunk
+        self.progress_callback = None
+        # Messages for the chunks the last import_attendance_records call failed to write
+        self.chunk_errors = []
     
     def _update_progress(self, session_id: str, progress: ImportProgress):
         """
-        Update import progress in cache for real-time tracking
+        Publish import progress for real-time tracking
+        
+        Writes are throttled by ProgressService, so this can be called for
+        every row.
         
         Args:
             session_id: Session ID for this import
             progress: Progress information
         """
-        cache_key = f"import_progress_{session_id}"
-        cache.set(cache_key, {
+        self.progress.publish(self._progress_channel(session_id), {
             'total_rows': progress.total_rows,
             'processed_rows': progress.processed_rows,
             'imported_rows': progress.imported_rows,
             'duplicate_rows': progress.duplicate_rows,
             'current_ep': progress.current_ep,
             'status': progress.status
-        }, timeout=300)  # 5 minutes
+        })
+    
+    def _progress_channel(self, session_id: str) -> str:
+        return f"excel_{session_id}"
     
     def get_progress(self, session_id: str) -> Optional[Dict]:
         """
@@ -80,13 +138,88 @@ class DataImporterService:
         Returns:
             Progress dictionary or None
         """
-        cache_key = f"import_progress_{session_id}"
-        return cache.get(cache_key)
+        return self.progress.get(self._progress_channel(session_id))
+    
+    def stream_progress(self, session_id: str):
+        """
+        Stream import progress as Server-Sent Events
+        
+        Args:
+            session_id: Session ID for this import
+            
+        Returns:
+            Generator of SSE-formatted strings
+        """
+        return self.progress.stream(self._progress_channel(session_id))
+    
+    def find_repeat_import(self, user: User, file_hash: str, filename: str = None) -> Optional[ImportLog]:
+        """
+        Find an earlier completed import of a file with identical content
+        
+        Args:
+            user: User performing the import
+            file_hash: FingerprintService.file_hash of the upload
+            filename: Also require this ImportLog filename, for workbooks
+                whose sheets are logged separately under one file hash
+            
+        Returns:
+            The most recent matching ImportLog, or None
+        """
+        if not file_hash:
+            return None
+        queryset = ImportLog.objects.filter(user=user, file_hash=file_hash, status='completed')
+        if filename is not None:
+            queryset = queryset.filter(filename=filename)
+        return queryset.first()
+    
+    def log_repeat_import(self, user: User, filename: str, file_type: FileType, total_rows: int, file_hash: str, previous: ImportLog) -> ImportResult:
+        """
+        Record an upload skipped because it repeats an earlier import
+        
+        Args:
+            user: User performing the import
+            filename: Name of the uploaded file
+            file_type: Type of file being imported
+            total_rows: Rows in the upload (0 if it was never parsed)
+            file_hash: FingerprintService.file_hash of the upload
+            previous: ImportLog of the earlier import
+            
+        Returns:
+            ImportResult reporting every row as a duplicate
+        """
+        import_log = ImportLog.objects.create(
+            user=user,
+            filename=filename,
+            file_type=file_type.value if isinstance(file_type, FileType) else file_type,
+            total_rows=total_rows,
+            imported_rows=0,
+            duplicate_rows=total_rows,
+            error_rows=0,
+            status='skipped',
+            file_hash=file_hash
+        )
+        logger.info(f"Skipped {filename}: identical to import {previous.id} ({previous.filename})")
+        return ImportResult(
+            success=True,
+            total_rows=total_rows,
+            imported_rows=0,
+            duplicate_rows=total_rows,
+            error_rows=0,
+            import_log_id=import_log.id,
+            skipped=True
+        )
     
-    @transaction.atomic
-    def import_batch(self, df: pd.DataFrame, file_type: FileType, user: User, filename: str, session_id: str = None) -> ImportResult:
+    def import_batch(self, df: pd.DataFrame, file_type: FileType, user: User, filename: str, session_id: str = None, file_hash: str = '', checkpoint=None, dry_run: bool = False) -> ImportResult:
         """
-        Import DataFrame into AttendanceRecord model with rollback on error
+        Import DataFrame into AttendanceRecord model
+        
+        Records are committed chunk by chunk, so if the import fails part-way
+        the chunks already written stay in place and the ImportLog is marked
+        failed.
+        
+        A dry run converts the rows the same way and compares them with the
+        stored records instead of writing them; no ImportLog is created and
+        the result's diff holds the created/updated/unchanged counts.
         
         Args:
             df: DataFrame to import
@@ -94,11 +227,18 @@ class DataImporterService:
             user: User performing the import
             filename: Name of the uploaded file
             session_id: Optional session ID for progress tracking
+            file_hash: Optional FingerprintService.file_hash of the upload, stored
+                on the ImportLog so later identical uploads can be skipped
+            checkpoint: Optional ImportCheckpoint to resume from and advance
+            dry_run: Preview the import without writing
             
         Returns:
             ImportResult with statistics
         """
-        from core.models import AttendanceRecord, Company
+        if dry_run:
+            return self.preview_batch(df, user)
+        
+        import_log = None
         
         try:
             # Create import log entry
@@ -110,7 +250,8 @@ class DataImporterService:
                 imported_rows=0,
                 duplicate_rows=0,
                 error_rows=0,
-                status='processing'
+                status='processing',
+                file_hash=file_hash
             )
             
             # Initialize progress tracking
@@ -125,15 +266,33 @@ class DataImporterService:
                 self._update_progress(session_id, progress)
             
             # Import directly to AttendanceRecord with progress tracking
-            imported_count, duplicate_count = self.import_attendance_records(df, user, session_id)
+            imported_count, duplicate_count = self.import_attendance_records(df, user, session_id, checkpoint)
             
-            # Update import log
+            # Update import log; an import with failed chunks stays resumable from its checkpoint
             import_log.imported_rows = imported_count
             import_log.duplicate_rows = duplicate_count
             import_log.error_rows = len(df) - imported_count - duplicate_count
-            import_log.status = 'completed'
+            import_log.status = 'failed' if self.chunk_errors else 'completed'
             import_log.save()
             
+            if self.chunk_errors:
+                if session_id:
+                    progress.processed_rows = len(df)
+                    progress.imported_rows = imported_count
+                    progress.duplicate_rows = duplicate_count
+                    progress.status = 'error'
+                    self._update_progress(session_id, progress)
+                
+                return ImportResult(
+                    success=False,
+                    total_rows=len(df),
+                    imported_rows=imported_count,
+                    duplicate_rows=duplicate_count,
+                    error_rows=import_log.error_rows,
+                    error_message='; '.join(self.chunk_errors),
+                    import_log_id=import_log.id
+                )
+            
             # Update final progress
             if session_id:
                 progress.processed_rows = len(df)
@@ -167,7 +326,39 @@ class DataImporterService:
                 )
                 self._update_progress(session_id, progress)
             
-            # Transaction will be rolled back automatically
+            if import_log is not None:
+                import_log.status = 'failed'
+                import_log.save()
+            
+            return ImportResult(
+                success=False,
+                total_rows=len(df),
+                imported_rows=0,
+                duplicate_rows=0,
+                error_rows=len(df),
+                error_message=str(e),
+                import_log_id=import_log.id if import_log is not None else None
+            )
+    
+    def preview_batch(self, df: pd.DataFrame, user: User) -> ImportResult:
+        """
+        Work out what import_batch would do with a DataFrame, without writing
+        
+        Args:
+            df: DataFrame to import
+            user: User performing the import
+            
+        Returns:
+            ImportResult whose diff holds the created/updated/unchanged counts
+            and a sample of the changed fields
+        """
+        from core.models import AttendanceRecord
+        
+        diff_service = ImportDiffService(AttendanceRecord, ('ep_no', 'date'), hash_field='row_hash')
+        try:
+            created, existing = self.import_attendance_records(df, user, diff_service=diff_service)
+        except Exception as e:
+            logger.error(f"Import preview failed: {e}")
             return ImportResult(
                 success=False,
                 total_rows=len(df),
@@ -176,20 +367,48 @@ class DataImporterService:
                 error_rows=len(df),
                 error_message=str(e)
             )
+        
+        diff = diff_service.diff
+        logger.info(f"Import preview: {diff.created} new, {diff.updated} changed, {diff.unchanged} unchanged")
+        return ImportResult(
+            success=True,
+            total_rows=len(df),
+            imported_rows=created,
+            duplicate_rows=existing,
+            error_rows=len(df) - created - existing,
+            diff=diff.to_dict()
+        )
     
-    def import_attendance_records(self, df: pd.DataFrame, user: User, session_id: str = None) -> Tuple[int, int]:
+    def import_attendance_records(self, df: pd.DataFrame, user: User, session_id: str = None, checkpoint=None, diff_service=None) -> Tuple[int, int]:
         """
         Import attendance records to AttendanceRecord model with progress tracking
         
+        Each column is converted once per distinct value, and every chunk of
+        BATCH_SIZE rows is written with BulkUpsertService (one key lookup,
+        one bulk insert, bulk updates) in its own transaction.
+        
+        With a checkpoint, rows before its row_offset are not written again,
+        and the checkpoint is advanced in each chunk's transaction. A chunk
+        that fails is recorded in chunk_errors and in the checkpoint's
+        failed_ranges, which a resumed import retries before carrying on.
+        
         Args:
             df: DataFrame containing attendance data
             user: User performing the import
             session_id: Optional session ID for progress tracking
+            checkpoint: Optional ImportCheckpoint for this upload
+            diff_service: Optional ImportDiffService; rows are compared with the
+                stored records through it instead of being written, and no
+                companies are created
             
         Returns:
             Tuple of (imported_count, duplicate_count)
         """
-        from core.models import AttendanceRecord, Company
+        from core.models import AttendanceRecord
+        
+        self.chunk_errors = []
+        if diff_service is not None:
+            checkpoint = None
         
         # Column mappings
         ep_col = self._find_column(df, ['ep_no', 'ep no', 'epno'])
@@ -216,258 +435,209 @@ class DataImporterService:
             logger.error("Missing required columns: EP_NO or DATE")
             return 0, 0
         
-        imported = 0
-        duplicates = 0
         total_rows = len(df)
         
-        for idx, row in df.iterrows():
-            ep_no = row.get(ep_col)
-            punchdate = row.get(date_col)
+        # Key columns: rows without an EP number or a parseable date are skipped
+        ep_nos = self._map_distinct(df[ep_col], str)
+        dates = self._map_distinct(df[date_col], self._parse_import_date)
+        valid = df[ep_col].notna().to_numpy() & (dates != None)
+        unparsed_dates = int((df[date_col].notna().to_numpy() & (dates == None)).sum())
+        if unparsed_dates:
+            logger.error(f"Skipped {unparsed_dates} rows with unparseable dates in '{date_col}'")
+        
+        # Company
+        if company_col:
+            present = df[company_col].notna().to_numpy()
+            # Blank cells count as missing, like NaN
+            company_names = np.where(present, self._map_distinct(df[company_col], lambda value: str(value).strip() or 'Unknown'), 'Unknown')
+        else:
+            company_names = np.full(total_rows, 'Unknown', dtype=object)
+        
+        # Check company access for admin users
+        if user.role == 'admin':
+            if not user.company:
+                logger.warning(f"Admin user {user.username} has no company assigned")
+                valid[:] = False
+            else:
+                denied = valid & (company_names != user.company.name)
+                if denied.any():
+                    logger.warning(f"Access denied: {int(denied.sum())} rows do not match admin's company '{user.company.name}'")
+                valid &= ~denied
+        
+        companies = CompanyResolver(create_missing=diff_service is None).prefetch_names(company_names[valid])
+        
+        # Each entry is (field, values, present); fields are only written where present is True
+        field_columns = []
+        
+        if name_col:
+            names = self._map_distinct(df[name_col], str)
+            field_columns.append(('ep_name', np.where(df[name_col].notna().to_numpy(), names, None), None))
+        field_columns.append(('shift', self._text_column(df, shift_col, ''), None))
+        field_columns.append(('status', self._text_column(df, status_col, 'P'), None))
+        if company_col:
+            field_columns.append(('cont_code', company_names, None))
+        
+        # Add ARC Summary specific fields
+        for field_name, col in (('trade', trade_col), ('contract', contract_col), ('regular_manday_hr', regular_hr_col), ('ot', ot_col)):
+            if col:
+                field_columns.append((field_name, self._map_distinct(df[col], str), df[col].notna().to_numpy()))
+        if mandays_col:
+            mandays = self._map_distinct(df[mandays_col], self._parse_float)
+            field_columns.append(('mandays', mandays, mandays != None))
+        
+        # Add Overtime request specific fields
+        for field_name, possible_cols in self.ATTENDANCE_OT_FIELDS.items():
+            col = self._find_column(df, possible_cols)
+            if col:
+                field_columns.append((field_name, self._map_distinct(df[col], str), df[col].notna().to_numpy()))
+        
+        # Parse time fields with support for (N) indicator and hours > 24
+        overstay_col = None
+        for source_field, possible_cols in self.ATTENDANCE_TIME_FIELDS.items():
+            col = self._find_column(df, possible_cols)
+            if not col:
+                continue
+            present = df[col].notna().to_numpy()
+            if source_field == 'overstay':
+                # Overstay is a CharField, format as HH:MM (not HH:MM:SS)
+                overstay_col = col
+            elif source_field in ('hours_worked', 'regular_hours'):
+                # Hours worked / regular hours - store as string in HH:MM format
+                field_name = 'hours' if source_field == 'hours_worked' else 'overtime_to_mandays'
+                values = self._map_distinct(df[col], format_hhmm)
+                field_columns.append((field_name, values, present))
+            elif source_field in self.ATTENDANCE_TIME_FIELD_MAP:
+                values = self._map_distinct(df[col], parse_time)
+                field_columns.append((self.ATTENDANCE_TIME_FIELD_MAP[source_field], values, present))
+        
+        if overstay_col:
+            overstay = self._map_distinct(df[overstay_col], format_hhmm)
+            field_columns.append(('overstay', np.where(overstay == None, '', overstay), None))
+        else:
+            field_columns.append(('overstay', np.full(total_rows, '', dtype=object), None))
+        
+        # Write chunk by chunk; each chunk commits on its own so the SQLite
+        # write lock is released between chunks. Rows whose content hash matches
+        # the stored record are not rewritten
+        upsert_service = diff_service or BulkUpsertService(AttendanceRecord, ('ep_no', 'date'), hash_field='row_hash')
+        checkpoints = CheckpointService()
+        imported = checkpoint.success_count if checkpoint else 0
+        duplicates = checkpoint.updated_count if checkpoint else 0
+        row_offset = checkpoint.row_offset if checkpoint else 0
+        
+        # Chunks that failed in an earlier run are retried first, then the rest of the file
+        retries = [tuple(row_range) for row_range in checkpoint.failed_ranges] if checkpoint else []
+        chunks = retries + [
+            (start, min(start + self.BATCH_SIZE, total_rows))
+            for start in range(row_offset, total_rows, self.BATCH_SIZE)
+        ]
+        failed_ranges = []
+        
+        for position, (start, stop) in enumerate(chunks):
+            # Failed ranges still waiting for their retry stay on the checkpoint
+            pending = failed_ranges + retries[position + 1:]
+            
+            try:
+                records = []
+                for i in np.flatnonzero(valid[start:stop]) + start:
+                    record = {
+                        'ep_no': ep_nos[i],
+                        'date': dates[i],
+                        'company': companies[company_names[i]],
+                        'ep_name': f'Employee {ep_nos[i]}',
+                    }
+                    for field_name, values, present in field_columns:
+                        if present is None or present[i]:
+                            value = values[i]
+                            if field_name != 'ep_name' or value is not None:
+                                record[field_name] = value
+                    records.append(record)
+                
+                with transaction.atomic():
+                    created, updated = upsert_service.upsert(records)
+                    if checkpoint is not None:
+                        checkpoints.advance(
+                            checkpoint, max(row_offset, stop),
+                            success_count=imported + created,
+                            updated_count=duplicates + len(records) - created,
+                            failed_ranges=pending
+                        )
+                imported += created
+                # Existing records count as duplicates whether or not they changed
+                duplicates += len(records) - created
+            except Exception as e:
+                logger.error(f"Error importing rows {start + 1}-{stop}: {e}")
+                self.chunk_errors.append(f"Rows {start + 1}-{stop}: {e}")
+                failed_ranges.append((start, stop))
+                if checkpoint is not None:
+                    checkpoints.advance(
+                        checkpoint, max(row_offset, stop),
+                        success_count=imported,
+                        updated_count=duplicates,
+                        failed_ranges=failed_ranges + retries[position + 1:]
+                    )
+            row_offset = max(row_offset, stop)
             
-            # Update progress every 10 rows or on first/last row
-            if session_id and (idx % 10 == 0 or idx == 0 or idx == total_rows - 1):
+            # Publish progress; ProgressService throttles the actual writes
+            last_ep = df[ep_col].iat[stop - 1]
+            current_ep = str(last_ep) if pd.notna(last_ep) else ""
+            if session_id:
                 progress = ImportProgress(
                     total_rows=total_rows,
-                    processed_rows=idx + 1,
+                    processed_rows=row_offset,
                     imported_rows=imported,
                     duplicate_rows=duplicates,
-                    current_ep=str(ep_no) if pd.notna(ep_no) else "",
+                    current_ep=current_ep,
                     status='processing'
                 )
                 self._update_progress(session_id, progress)
-            
-            if pd.notna(ep_no) and pd.notna(punchdate):
-                try:
-                    # Parse date
-                    if isinstance(punchdate, str):
-                        punchdate = pd.to_datetime(punchdate).date()
-                    elif isinstance(punchdate, pd.Timestamp):
-                        punchdate = punchdate.date()
-                    
-                    # Get company
-                    company_name = row.get(company_col, 'Unknown') if company_col else 'Unknown'
-                    if pd.notna(company_name):
-                        company_name = str(company_name).strip()
-                    else:
-                        company_name = 'Unknown'
-                    
-                    # Check company access for admin users
-                    if user.role == 'admin':
-                        if not user.company:
-                            logger.warning(f"Admin user {user.username} has no company assigned")
-                            continue
-                        if user.company.name != company_name:
-                            logger.warning(f"Access denied: Company '{company_name}' does not match admin's company '{user.company.name}'")
-                            continue
-                    
-                    company, _ = Company.objects.get_or_create(name=company_name)
-                    
-                    # Prepare record data
-                    record_data = {
-                        'ep_name': str(row.get(name_col, f'Employee {ep_no}')) if name_col else f'Employee {ep_no}',
-                        'company': company,
-                        'shift': str(row.get(shift_col, '')) if shift_col and pd.notna(row.get(shift_col)) else '',
-                        'status': str(row.get(status_col, 'P')) if status_col and pd.notna(row.get(status_col)) else 'P',
-                        'overstay': '',
-                    }
-                    
-                    # Add ARC Summary specific fields
-                    if company_col:
-                        record_data['cont_code'] = str(company_name)
-                    if trade_col and pd.notna(row.get(trade_col)):
-                        record_data['trade'] = str(row.get(trade_col))
-                    if contract_col and pd.notna(row.get(contract_col)):
-                        record_data['contract'] = str(row.get(contract_col))
-                    if mandays_col and pd.notna(row.get(mandays_col)):
-                        try:
-                            record_data['mandays'] = float(row.get(mandays_col))
-                        except (ValueError, TypeError):
-                            pass
-                    if regular_hr_col and pd.notna(row.get(regular_hr_col)):
-                        record_data['regular_manday_hr'] = str(row.get(regular_hr_col))
-                    if ot_col and pd.notna(row.get(ot_col)):
-                        record_data['ot'] = str(row.get(ot_col))
-                    
-                    # Add Overtime request specific fields
-                    ot_fields = {
-                        'actual_overstay': ['actual_overstay', 'actual overstay', 'actualoverstay'],
-                        'requested_overtime': ['requested_overtime', 'requested overtime', 'requestedovertime'],
-                        'approved_overtime': ['approved_overtime', 'approved overtime', 'approvedovertime'],
-                        'requested_regular_manday_hours': ['requested_regular_manday_hours', 'requested regular manday hours'],
-                        'approved_regular_manday_hours': ['approved_regular_manday_hours', 'approved regular manday hours'],
-                        'contractor_ot_remarks': ['contractor_ot_remarks', 'contractor ot remarks', 'ot remarks'],
-                        'contractor_ot_reason': ['contractor_ot_reason', 'contractor ot reason', 'ot reason'],
-                        'requested_eic_code': ['requested_eic_code', 'requested eic code', 'eic code'],
-                        'requested_eic_name': ['requested_eic_name', 'requested eic name', 'eic name'],
-                        'ot_request_status': ['ot_request_status', 'ot request status', 'request status'],
-                    }
-                    
-                    for field_name, possible_cols in ot_fields.items():
-                        col = self._find_column(df, possible_cols)
-                        if col and pd.notna(row.get(col)):
-                            record_data[field_name] = str(row.get(col))
-                    
-                    # Parse time fields with support for (N) indicator and hours > 24
-                    time_field_mappings = {
-                        'punch1_in': ['punch1 in', 'punch1_in', 'in', 'in_time'],
-                        'punch2_out': ['punch2 out', 'punch2_out', 'out', 'out_time'],
-                        'punch3_in': ['punch3 in', 'punch3_in', 'in (2)', 'in_time_2'],
-                        'punch4_out': ['punch4 out', 'punch4_out', 'out (2)', 'out_time_2'],
-                        'punch5_in': ['punch5 in', 'punch5_in', 'in (3)', 'in_time_3'],
-                        'punch6_out': ['punch6 out', 'punch6_out', 'out (3)', 'out_time_3'],
-                        'overstay': ['overstay'],
-                        'overtime': ['overtime'],
-                        'regular_hours': ['regular_hours', 'regular hours', 'overtime_to_mandays', 'overtime to mandays'],
-                        'hours_worked': ['hours_worked', 'hours worked', 'hours', 'hrs'],
-                    }
-                    
-                    # Map to AttendanceRecord fields
-                    attendance_field_mapping = {
-                        'punch1_in': 'in_time',
-                        'punch2_out': 'out_time',
-                        'punch3_in': 'in_time_2',
-                        'punch4_out': 'out_time_2',
-                        'punch5_in': 'in_time_3',
-                        'punch6_out': 'out_time_3',
-                        'overtime': 'overtime',
-                        'regular_hours': 'overtime_to_mandays',
-                    }
-                    
-                    for source_field, possible_cols in time_field_mappings.items():
-                        col = self._find_column(df, possible_cols)
-                        if col and pd.notna(row.get(col)):
-                            if source_field == 'overstay':
-                                # Overstay is a CharField, format as HH:MM (not HH:MM:SS)
-                                overstay_value = self._format_time_as_hhmm(row.get(col))
-                                record_data['overstay'] = overstay_value if overstay_value else ''
-                            elif source_field == 'hours_worked':
-                                # Hours worked - store as string in HH:MM format
-                                hours_value = self._format_time_as_hhmm(row.get(col))
-                                record_data['hours'] = hours_value if hours_value else ''
-                            elif source_field == 'regular_hours':
-                                # Regular hours - store as string
-                                regular_value = self._format_time_as_hhmm(row.get(col))
-                                record_data['overtime_to_mandays'] = regular_value if regular_value else ''
-                            else:
-                                time_value = self._parse_time(row.get(col))
-                                
-                                # Map to AttendanceRecord field
-                                if source_field in attendance_field_mapping:
-                                    record_data[attendance_field_mapping[source_field]] = time_value
-                    
-                    # Check if record already exists
-                    if AttendanceRecord.objects.filter(ep_no=str(ep_no), date=punchdate).exists():
-                        duplicates += 1
-                        # Update existing record
-                        AttendanceRecord.objects.filter(ep_no=str(ep_no), date=punchdate).update(**record_data)
-                    else:
-                        # Create new record
-                        AttendanceRecord.objects.create(
-                            ep_no=str(ep_no),
-                            date=punchdate,
-                            **record_data
-                        )
-                        imported += 1
-                    
-                except Exception as e:
-                    logger.error(f"Error importing record for EP {ep_no} on {punchdate}: {e}")
+            if self.progress_callback:
+                self.progress_callback(row_offset, total_rows, current_ep)
         
         logger.info(f"Imported {imported} attendance records, updated {duplicates} duplicates")
         return imported, duplicates
     
-    def _format_time_as_hhmm(self, time_value):
+    def _map_distinct(self, series: pd.Series, func: Callable) -> np.ndarray:
         """
-        Format time value as HH:MM string (without seconds)
+        Apply func once per distinct non-null value and broadcast the results
         
         Args:
-            time_value: Time string or value to format
+            series: Column to convert
+            func: Conversion for a single value
             
         Returns:
-            String in HH:MM format or None
+            Object array aligned with series; None where the value is null
         """
-        if pd.isna(time_value):
-            return None
-        
-        time_str = str(time_value).strip()
-        
-        # Handle "0" as no time
-        if time_str in ['0', '0.0', '']:
-            return None
-        
-        # Remove (N) indicator if present
-        if '(' in time_str and ')' in time_str:
-            time_str = time_str.split('(')[0].strip()
-        
-        # Parse time manually
-        parts = time_str.split(':')
-        if len(parts) < 2:
-            return None
-        
+        codes, uniques = pd.factorize(series)
+        results = np.empty(len(uniques) + 1, dtype=object)
+        results[:len(uniques)] = [func(value) for value in uniques]
+        results[-1] = None  # code -1 marks nulls
+        return results[codes]
+    
+    def _text_column(self, df: pd.DataFrame, col: Optional[str], default: str) -> np.ndarray:
+        """Stringify an optional column, using default where it is missing or null"""
+        if not col:
+            return np.full(len(df), default, dtype=object)
+        values = self._map_distinct(df[col], str)
+        return np.where(df[col].notna().to_numpy(), values, default)
+    
+    def _parse_import_date(self, value):
+        """Convert a date cell to a date, or None if it cannot be parsed"""
         try:
-            hours = int(parts[0])
-            minutes = int(parts[1])
-            
-            # Validate minutes
-            if minutes < 0 or minutes > 59:
-                return None
-            
-            # Normalize hours > 23 using modulo 24
-            if hours >= 24:
-                hours = hours % 24
-            elif hours < 0:
-                return None
-            
-            # Return formatted as HH:MM
-            return f"{hours:02d}:{minutes:02d}"
-        except (ValueError, TypeError):
+            if isinstance(value, str):
+                return pd.to_datetime(value).date()
+            if isinstance(value, datetime):
+                return value.date()
+            if isinstance(value, date):
+                return value
+            return pd.to_datetime(value).date()
+        except (ValueError, TypeError, OverflowError):
             return None
     
-    def _parse_time(self, time_value):
-        """
-        Parse time value with support for (N) indicator and hours > 24
-        
-        Args:
-            time_value: Time string or value to parse
-            
-        Returns:
-            time object or None
-        """
-        if pd.isna(time_value):
-            return None
-        
-        time_str = str(time_value).strip()
-        
-        # Handle "0" as no time
-        if time_str in ['0', '0.0', '']:
-            return None
-        
-        # Remove (N) indicator if present
-        if '(' in time_str and ')' in time_str:
-            time_str = time_str.split('(')[0].strip()
-        
-        # Parse time manually to support hours > 24
-        parts = time_str.split(':')
-        if len(parts) < 2:
-            return None
-        
+    def _parse_float(self, value):
+        """Convert a cell to float, or None if it is not numeric"""
         try:
-            from datetime import time as dt_time
-            
-            hours = int(parts[0])
-            minutes = int(parts[1])
-            seconds = int(parts[2]) if len(parts) >= 3 else 0
-            
-            # Validate minutes and seconds
-            if minutes < 0 or minutes > 59 or seconds < 0 or seconds > 59:
-                return None
-            
-            # Normalize hours > 23 using modulo 24
-            if hours >= 24:
-                hours = hours % 24
-            elif hours < 0:
-                return None
-            
-            return dt_time(hours, minutes, seconds)
+            return float(value)
         except (ValueError, TypeError):
             return None
     
@@ -563,47 +733,18 @@ class DataImporterService:
         Returns:
             Tuple of (imported_count, duplicate_count)
         """
-        ep_col = self._find_column(df, ['ep_no', 'ep no'])
-        date_col = self._find_column(df, ['punchdate', 'punch_date'])
-        
-        if not ep_col or not date_col:
-            return 0, 0
-        
-        imported = 0
-        duplicates = 0
-        
-        for _, row in df.iterrows():
-            ep_no = row[ep_col]
-            punchdate = row[date_col]
-            
-            if pd.notna(ep_no) and pd.notna(punchdate):
-                try:
-                    employee = Employee.objects.get(ep_no=str(ep_no))
-                    
-                    # Check if record already exists
-                    if PunchRecord.objects.filter(employee=employee, punchdate=punchdate).exists():
-                        duplicates += 1
-                        continue
-                    
-                    # Create new record
-                    PunchRecord.objects.create(
-                        employee=employee,
-                        punchdate=punchdate,
-                        shift=row.get('shift', ''),
-                        punch1_in=row.get('punch1_in'),
-                        punch2_out=row.get('punch2_out'),
-                        punch3_in=row.get('punch3_in'),
-                        punch4_out=row.get('punch4_out'),
-                        punch5_in=row.get('punch5_in'),
-                        punch6_out=row.get('punch6_out'),
-                        hours_worked=row.get('hours_worked'),
-                        overstay=row.get('overstay'),
-                        status=row.get('status', 'P')
-                    )
-                    imported += 1
-                    
-                except Employee.DoesNotExist:
-                    logger.warning(f"Employee {ep_no} not found")
+        imported, duplicates = self._import_employee_records(df, PunchRecord, ['ep_no', 'ep no'], {
+            'shift': ('shift', ''),
+            'punch1_in': ('punch1_in', None),
+            'punch2_out': ('punch2_out', None),
+            'punch3_in': ('punch3_in', None),
+            'punch4_out': ('punch4_out', None),
+            'punch5_in': ('punch5_in', None),
+            'punch6_out': ('punch6_out', None),
+            'hours_worked': ('hours_worked', None),
+            'overstay': ('overstay', None),
+            'status': ('status', 'P'),
+        })
         
         logger.info(f"Imported {imported} punch records, skipped {duplicates} duplicates")
         return imported, duplicates
@@ -618,41 +759,12 @@ class DataImporterService:
         Returns:
             Tuple of (imported_count, duplicate_count)
         """
-        ep_col = self._find_column(df, ['ep_no', 'epno'])
-        date_col = self._find_column(df, ['punchdate', 'punch_date'])
-        
-        if not ep_col or not date_col:
-            return 0, 0
-        
-        imported = 0
-        duplicates = 0
-        
-        for _, row in df.iterrows():
-            ep_no = row[ep_col]
-            punchdate = row[date_col]
-            
-            if pd.notna(ep_no) and pd.notna(punchdate):
-                try:
-                    employee = Employee.objects.get(ep_no=str(ep_no))
-                    
-                    # Check if record already exists
-                    if DailySummary.objects.filter(employee=employee, punchdate=punchdate).exists():
-                        duplicates += 1
-                        continue
-                    
-                    # Create new record
-                    DailySummary.objects.create(
-                        employee=employee,
-                        punchdate=punchdate,
-                        mandays=row.get('mandays', 0),
-                        regular_manday_hr=row.get('regular_manday_hr'),
-                        ot=row.get('ot', 0),
-                        location_status=row.get('location_status', '')
-                    )
-                    imported += 1
-                    
-                except Employee.DoesNotExist:
-                    logger.warning(f"Employee {ep_no} not found")
+        imported, duplicates = self._import_employee_records(df, DailySummary, ['ep_no', 'epno'], {
+            'mandays': ('mandays', 0),
+            'regular_manday_hr': ('regular_manday_hr', None),
+            'ot': ('ot', 0),
+            'location_status': ('location_status', ''),
+        })
         
         logger.info(f"Imported {imported} daily summaries, skipped {duplicates} duplicates")
         return imported, duplicates
@@ -667,41 +779,12 @@ class DataImporterService:
         Returns:
             Tuple of (imported_count, duplicate_count)
         """
-        ep_col = self._find_column(df, ['ep_no', 'ep no'])
-        date_col = self._find_column(df, ['punchdate', 'punch_date'])
-        
-        if not ep_col or not date_col:
-            return 0, 0
-        
-        imported = 0
-        duplicates = 0
-        
-        for _, row in df.iterrows():
-            ep_no = row[ep_col]
-            punchdate = row[date_col]
-            
-            if pd.notna(ep_no) and pd.notna(punchdate):
-                try:
-                    employee = Employee.objects.get(ep_no=str(ep_no))
-                    
-                    # Check if record already exists
-                    if OvertimeRequest.objects.filter(employee=employee, punchdate=punchdate).exists():
-                        duplicates += 1
-                        continue
-                    
-                    # Create new record
-                    OvertimeRequest.objects.create(
-                        employee=employee,
-                        punchdate=punchdate,
-                        actual_overstay=row.get('actual_overstay'),
-                        requested_overtime=row.get('requested_overtime'),
-                        approved_overtime=row.get('approved_overtime'),
-                        status=row.get('ot_request_status', 'Pending')
-                    )
-                    imported += 1
-                    
-                except Employee.DoesNotExist:
-                    logger.warning(f"Employee {ep_no} not found")
+        imported, duplicates = self._import_employee_records(df, OvertimeRequest, ['ep_no', 'ep no'], {
+            'actual_overstay': ('actual_overstay', None),
+            'requested_overtime': ('requested_overtime', None),
+            'approved_overtime': ('approved_overtime', None),
+            'status': ('ot_request_status', 'Pending'),
+        })
         
         logger.info(f"Imported {imported} overtime requests, skipped {duplicates} duplicates")
         return imported, duplicates
@@ -716,42 +799,13 @@ class DataImporterService:
         Returns:
             Tuple of (imported_count, duplicate_count)
         """
-        ep_col = self._find_column(df, ['ep_no', 'ep no'])
-        date_col = self._find_column(df, ['punchdate', 'punch_date'])
-        
-        if not ep_col or not date_col:
-            return 0, 0
-        
-        imported = 0
-        duplicates = 0
-        
-        for _, row in df.iterrows():
-            ep_no = row[ep_col]
-            punchdate = row[date_col]
-            
-            if pd.notna(ep_no) and pd.notna(punchdate):
-                try:
-                    employee = Employee.objects.get(ep_no=str(ep_no))
-                    
-                    # Check if record already exists
-                    if PartialDayRequest.objects.filter(employee=employee, punchdate=punchdate).exists():
-                        duplicates += 1
-                        continue
-                    
-                    # Create new record
-                    PartialDayRequest.objects.create(
-                        employee=employee,
-                        punchdate=punchdate,
-                        actual_pd_hours=row.get('actual_pd_hours'),
-                        requested_pd_hours=row.get('requested_pd_hours'),
-                        approved_pd_hours=row.get('approved_pd_hours'),
-                        manday_conversion=row.get('manday_conversion', 0),
-                        status=row.get('pd_request_status', 'Pending')
-                    )
-                    imported += 1
-                    
-                except Employee.DoesNotExist:
-                    logger.warning(f"Employee {ep_no} not found")
+        imported, duplicates = self._import_employee_records(df, PartialDayRequest, ['ep_no', 'ep no'], {
+            'actual_pd_hours': ('actual_pd_hours', None),
+            'requested_pd_hours': ('requested_pd_hours', None),
+            'approved_pd_hours': ('approved_pd_hours', None),
+            'manday_conversion': ('manday_conversion', 0),
+            'status': ('pd_request_status', 'Pending'),
+        })
         
         logger.info(f"Imported {imported} partial day requests, skipped {duplicates} duplicates")
         return imported, duplicates
@@ -766,44 +820,73 @@ class DataImporterService:
         Returns:
             Tuple of (imported_count, duplicate_count)
         """
-        ep_col = self._find_column(df, ['ep_no', 'ep no'])
+        imported, duplicates = self._import_employee_records(df, RegularizationRequest, ['ep_no', 'ep no'], {
+            'old_punch_in': ('old_punch_in', None),
+            'old_punch_out': ('old_punch_out', None),
+            'new_punch_in': ('new_punch_in', None),
+            'new_punch_out': ('new_punch_out', None),
+            'status': ('request_status', 'Pending'),
+        })
+        
+        logger.info(f"Imported {imported} regularization requests, skipped {duplicates} duplicates")
+        return imported, duplicates
+    
+    def _import_employee_records(self, df: pd.DataFrame, model, ep_names: List[str], field_columns: Dict) -> Tuple[int, int]:
+        """
+        Insert rows of a model keyed on (employee, punchdate), skipping existing keys
+        
+        Employees are loaded with one in_bulk query, existing keys are looked
+        up once per chunk of BATCH_SIZE rows and new rows are written with
+        bulk_create, so the number of queries grows with chunks, not rows.
+        
+        Args:
+            df: DataFrame to import
+            model: Model with unique_together (employee, punchdate)
+            ep_names: Possible names of the EP number column
+            field_columns: dict model field -> (column name, default for missing/blank cells)
+            
+        Returns:
+            Tuple of (imported_count, duplicate_count)
+        """
+        ep_col = self._find_column(df, ep_names)
         date_col = self._find_column(df, ['punchdate', 'punch_date'])
         
         if not ep_col or not date_col:
             return 0, 0
         
+        ep_nos = self._map_distinct(df[ep_col], str)
+        punchdates = self._map_distinct(df[date_col], self._parse_import_date)
+        valid = (ep_nos != None) & (punchdates != None)
+        
+        employees = Employee.objects.in_bulk(set(ep_nos[valid]))
+        unknown = set(ep_nos[valid]) - set(employees)
+        if unknown:
+            logger.warning(f"{len(unknown)} employees not found: {', '.join(sorted(unknown)[:10])}")
+            valid &= np.isin(ep_nos, list(unknown), invert=True)
+        
+        columns = [
+            (field_name, df[col].to_numpy(dtype=object) if col in df.columns else None, default)
+            for field_name, (col, default) in field_columns.items()
+        ]
+        
+        loader = BulkUpsertService(model, ('employee_id', 'punchdate'))
         imported = 0
         duplicates = 0
         
-        for _, row in df.iterrows():
-            ep_no = row[ep_col]
-            punchdate = row[date_col]
+        for start in range(0, len(df), self.BATCH_SIZE):
+            stop = min(start + self.BATCH_SIZE, len(df))
+            rows = []
+            for i in np.flatnonzero(valid[start:stop]) + start:
+                row = {'employee_id': ep_nos[i], 'punchdate': punchdates[i]}
+                for field_name, values, default in columns:
+                    value = values[i] if values is not None else default
+                    row[field_name] = default if pd.isna(value) else value
+                rows.append(row)
             
-            if pd.notna(ep_no) and pd.notna(punchdate):
-                try:
-                    employee = Employee.objects.get(ep_no=str(ep_no))
-                    
-                    # Check if record already exists
-                    if RegularizationRequest.objects.filter(employee=employee, punchdate=punchdate).exists():
-                        duplicates += 1
-                        continue
-                    
-                    # Create new record
-                    RegularizationRequest.objects.create(
-                        employee=employee,
-                        punchdate=punchdate,
-                        old_punch_in=row.get('old_punch_in'),
-                        old_punch_out=row.get('old_punch_out'),
-                        new_punch_in=row.get('new_punch_in'),
-                        new_punch_out=row.get('new_punch_out'),
-                        status=row.get('request_status', 'Pending')
-                    )
-                    imported += 1
-                    
-                except Employee.DoesNotExist:
-                    logger.warning(f"Employee {ep_no} not found")
+            created, skipped = loader.insert_missing(rows)
+            imported += created
+            duplicates += skipped
         
-        logger.info(f"Imported {imported} regularization requests, skipped {duplicates} duplicates")
         return imported, duplicates
     
     def _find_column(self, df: pd.DataFrame, possible_names: List[str]) -> str:
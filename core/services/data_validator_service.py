@@ -1,11 +1,14 @@
 """Data Validator Service for Excel File Upload Integration"""
 import re
+import numpy as np
 import pandas as pd
-from datetime import datetime
+from datetime import date, datetime
 from typing import List, Dict
 from dataclasses import dataclass
 import logging
 
+from core.date_parsing import parse_date_series, parse_date_text
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -39,14 +42,31 @@ class ValidationReport:
             'duplicates': self.duplicates
         }
 
+    def write_error_report(self, path):
+        """Write the errors as a Row/Column/Value/Error CSV, built column by column"""
+        pd.DataFrame({
+            'Row': [e.row_number for e in self.errors],
+            'Column': [e.column_name for e in self.errors],
+            'Value': [e.value for e in self.errors],
+            'Error': [e.error_message for e in self.errors],
+        }).to_csv(path, index=False)
+
 class DataValidatorService:
     """Service for validating uploaded data - supports hours > 24"""
     
+    DATE_FORMATS = ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y')
+    
+    # Stay safely under SQLite's 999 variable limit when filtering on EP numbers
+    KEY_CHUNK_SIZE = 900
+    
     def __init__(self):
         # Patterns defined in __init__ to avoid regex escaping issues
         self.EP_NO_PATTERN = re.compile(r'^(PP|VP)\d{10}' + r'$')
         # Allow 1-3 digits for hours (supports 25:30, 48:00, 100:00)
         self.TIME_PATTERN = re.compile(r'^\d{1,3}:\d{2}(:\d{2})?(\s*\([A-Z]\))?' + r'$')
+        # Range checks applied to values already matching TIME_PATTERN
+        self.TIME_MINUTES_PATTERN = re.compile(r'\d{1,3}:[0-5]\d')
+        self.TIME_SECONDS_PATTERN = re.compile(r'\d{1,3}:\d{2}(?!:)|\d{1,3}:\d{2}:[0-5]\d')
 
 
     def validate_ep_no(self, ep_no):
@@ -61,15 +81,12 @@ class DataValidatorService:
         if not date_str or pd.isna(date_str):
             return ValidationResult(False, "Date is required")
         date_str = str(date_str).strip()
-        for fmt in ['%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y']:
-            try:
-                parsed = datetime.strptime(date_str, fmt)
-                if parsed.date() > datetime.now().date():
-                    return ValidationResult(False, f"Future date: {date_str}")
-                return ValidationResult(True)
-            except ValueError:
-                continue
-        return ValidationResult(False, f"Invalid date: {date_str}")
+        parsed = parse_date_text(date_str, self.DATE_FORMATS)
+        if parsed is None:
+            return ValidationResult(False, f"Invalid date: {date_str}")
+        if parsed > date.today():
+            return ValidationResult(False, f"Future date: {date_str}")
+        return ValidationResult(True)
 
     def validate_time(self, time_str):
         """Validate time - supports HH:MM, HH:MM:SS, with (N), hours > 24"""
@@ -111,57 +128,133 @@ class DataValidatorService:
                     errors.append(ValidationError(idx + 2, contractor_col, str(code), f"Contractor {code} not found"))
         return errors
 
-    def validate_batch(self, df, file_type):
+    def validate_batch(self, df, file_type, check_database=True):
+        """
+        Validate a normalized DataFrame
+
+        With check_database=False the foreign key and stored-duplicate checks
+        are skipped, so the call never touches the database (e.g. in a pool
+        worker); validate_database adds them afterwards.
+        """
         if df is None or df.empty:
             return ValidationReport(0, 0, 0, [], [])
         errors = []
         total = len(df)
         ep_col = self._find_column(df, ['ep_no', 'ep no', 'epno'])
         if ep_col:
-            for idx, val in df[ep_col].items():
-                r = self.validate_ep_no(val)
-                if not r.is_valid:
-                    errors.append(ValidationError(idx + 2, ep_col, str(val), r.error_message))
+            errors.extend(self._column_errors(df[[ep_col]], self._check_ep_nos, "EP NO is required"))
         date_col = self._find_column(df, ['punchdate', 'punch_date', 'date'])
         if date_col:
-            for idx, val in df[date_col].items():
-                r = self.validate_date(val)
-                if not r.is_valid:
-                    errors.append(ValidationError(idx + 2, date_col, str(val), r.error_message))
+            errors.extend(self._column_errors(df[[date_col]], self._check_dates, "Date is required"))
         time_cols = [c for c in df.columns if any(k in c.lower() for k in ['time', 'hours', 'in', 'out', 'overstay', 'overtime'])]
-        for tc in time_cols:
-            for idx, val in df[tc].items():
-                r = self.validate_time(val)
-                if not r.is_valid:
-                    errors.append(ValidationError(idx + 2, tc, str(val), r.error_message))
+        if time_cols:
+            errors.extend(self._column_errors(df[time_cols], self._check_times, None))
+        if not check_database:
+            return self._report(total, errors, [])
         errors.extend(self.validate_foreign_keys(df))
-        dups = self.detect_duplicates(df)
+        return self._report(total, errors, self.detect_duplicates(df))
+
+    def validate_database(self, df, report):
+        """Add the foreign key and stored-duplicate checks to a report built with check_database=False"""
+        if df is None or df.empty:
+            return report
+        errors = report.errors + self.validate_foreign_keys(df)
+        return self._report(report.total_rows, errors, self.detect_duplicates(df))
+
+    def _report(self, total, errors, dups):
         invalid = len(set(e.row_number for e in errors))
         return ValidationReport(total, total - invalid, invalid, errors, dups)
 
+    def _column_errors(self, frame, check, null_message):
+        """
+        Validate columns with a vectorized check and build errors for the failing cells only
+
+        The check runs once per distinct value across all the given columns and
+        its messages are broadcast back to the cells. Same rules as
+        validate_ep_no/validate_date/validate_time; errors come column by column.
+        """
+        # Column-major so errors are ordered by column, then row
+        values = frame.to_numpy(dtype=object).ravel(order='F')
+        codes, uniques = pd.factorize(values)
+        messages = np.append(check(pd.Series(uniques, dtype=object)).to_numpy(dtype=object), null_message)[codes]
+        n_rows = len(frame)
+        return [
+            ValidationError(frame.index[i % n_rows] + 2, frame.columns[i // n_rows], str(values[i]), messages[i])
+            for i in np.flatnonzero(pd.notna(messages))
+        ]
+
+    def _blank_and_text(self, values):
+        """Mask of empty/falsy values and the stripped text of the rest"""
+        blank = values.isna() | values.eq(False) | values.eq('')
+        return blank, values.astype(str).str.strip()
+
+    def _check_ep_nos(self, values):
+        blank, text = self._blank_and_text(values)
+        messages = pd.Series(None, index=values.index, dtype=object)
+        invalid = ~blank & ~text.str.fullmatch(self.EP_NO_PATTERN)
+        messages[invalid] = "Invalid EP NO: " + text[invalid]
+        messages[blank] = "EP NO is required"
+        return messages
+
+    def _check_dates(self, values):
+        blank, text = self._blank_and_text(values)
+        parsed = parse_date_series(text.where(~blank), self.DATE_FORMATS)
+        messages = pd.Series(None, index=values.index, dtype=object)
+        invalid = ~blank & parsed.isna()
+        future = parsed > pd.Timestamp(date.today())
+        messages[invalid] = "Invalid date: " + text[invalid]
+        messages[future] = "Future date: " + text[future]
+        messages[blank] = "Date is required"
+        return messages
+
+    def _check_times(self, values):
+        blank, text = self._blank_and_text(values)
+        empty = blank | text.isin(['', '0', '0.0'])
+        matched = text.str.fullmatch(self.TIME_PATTERN)
+        good_minutes = text.str.match(self.TIME_MINUTES_PATTERN)
+        good_seconds = text.str.match(self.TIME_SECONDS_PATTERN)
+        messages = pd.Series(None, index=values.index, dtype=object)
+        bad_seconds = matched & ~good_seconds
+        invalid = ~matched | ~good_minutes
+        messages[bad_seconds] = "Invalid seconds: " + text[bad_seconds]
+        messages[invalid] = "Invalid time: " + text[invalid]
+        messages[empty] = None
+        return messages
+
     def detect_duplicates(self, df):
+        """Rows repeating an (ep_no, date) pair in the file or already stored in any request table"""
         from core.models import PunchRecord, DailySummary, OvertimeRequest, PartialDayRequest, RegularizationRequest
-        dups = []
         ep_col = self._find_column(df, ['ep_no', 'ep no', 'epno'])
         date_col = self._find_column(df, ['punchdate', 'punch_date', 'date'])
         if not ep_col or not date_col:
-            return dups
-        df_dups = df[df.duplicated(subset=[ep_col, date_col], keep=False)]
-        if not df_dups.empty:
-            dups.extend(df_dups.index.tolist())
-        for idx, row in df.iterrows():
-            ep, dt = row[ep_col], row[date_col]
-            if pd.notna(ep) and pd.notna(dt):
-                exists = (
-                    PunchRecord.objects.filter(employee__ep_no=ep, punchdate=dt).exists() or
-                    DailySummary.objects.filter(employee__ep_no=ep, punchdate=dt).exists() or
-                    OvertimeRequest.objects.filter(employee__ep_no=ep, punchdate=dt).exists() or
-                    PartialDayRequest.objects.filter(employee__ep_no=ep, punchdate=dt).exists() or
-                    RegularizationRequest.objects.filter(employee__ep_no=ep, punchdate=dt).exists()
-                )
-                if exists and idx not in dups:
-                    dups.append(idx)
-        return dups
+            return []
+        is_dup = df.duplicated(subset=[ep_col, date_col], keep=False)
+        dates = df[date_col].map({v: self._to_date(v) for v in df[date_col].dropna().unique()})
+        keys = pd.DataFrame({'ep_no': df[ep_col].where(df[ep_col].isna(), df[ep_col].astype(str)), 'punchdate': dates}).dropna()
+        if not keys.empty:
+            ep_nos = sorted(keys['ep_no'].unique())
+            date_range = (keys['punchdate'].min(), keys['punchdate'].max())
+            existing = set()
+            for model in (PunchRecord, DailySummary, OvertimeRequest, PartialDayRequest, RegularizationRequest):
+                for start in range(0, len(ep_nos), self.KEY_CHUNK_SIZE):
+                    existing.update(model.objects.filter(
+                        employee_id__in=ep_nos[start:start + self.KEY_CHUNK_SIZE], punchdate__range=date_range
+                    ).order_by().values_list('employee_id', 'punchdate'))
+            if existing:
+                stored = pd.DataFrame(list(existing), columns=['ep_no', 'punchdate'])
+                merged = keys.rename_axis('row').reset_index().merge(stored, on=['ep_no', 'punchdate'], how='inner')
+                is_dup |= df.index.isin(merged['row'])
+        return df.index[is_dup].tolist()
+
+    def _to_date(self, value):
+        if isinstance(value, date) and not isinstance(value, datetime):
+            return value
+        if not isinstance(value, str):
+            try:
+                return pd.Timestamp(value).date()
+            except (ValueError, TypeError):
+                return None
+        return parse_date_text(value.strip(), self.DATE_FORMATS)
 
     def _find_column(self, df, names):
         cols = {c.lower(): c for c in df.columns}
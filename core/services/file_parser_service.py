@@ -4,11 +4,20 @@ File Parser Service for Excel File Upload Integration
 This service handles parsing of different Excel formats (HTML XLS, binary XLS, XLSX)
 and normalizes data for validation and import.
 """
+import io
+import os
+import re
+import zipfile
+import numpy as np
 import pandas as pd
+from dataclasses import dataclass
 from enum import Enum
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 import logging
 
+from core.services.chunked_reader_service import ChunkedReaderService
+from core.time_parsing import parse_time_series
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,12 +28,25 @@ class FileType(Enum):
     OVERTIME = "overtime"
     PARTIAL_DAY = "partial_day"
     REGULARIZATION = "regularization"
+    CRYSTAL_REPORT = "crystal_report"
     UNKNOWN = "unknown"
 
 
+@dataclass
+class CrystalLayout:
+    """Where the parts of a Crystal Reports monthly attendance grid are, by grid position"""
+    label_row: int  # EP NO, EP NAME, ... and one date per day block
+    field_row: int  # Shift, Plant In, Plant Out, Status under every date
+    employee_columns: List[int]
+    block_starts: List[int]
+
+
 class FileParserService:
     """Service for parsing Excel files and detecting file types"""
     
+    # XLSX files above this size are read with the streaming read-only reader
+    XLSX_STREAMING_THRESHOLD_BYTES = 5 * 1024 * 1024
+    
     # Column patterns for file type detection
     FILE_TYPE_PATTERNS = {
         FileType.PUNCHRECORD: [
@@ -48,6 +70,33 @@ class FileParserService:
         ]
     }
     
+    # Normalized names of columns holding times or durations
+    TIME_COLUMNS = frozenset([
+        'in', 'out', 'in_time', 'out_time',
+        'in_(2)', 'out_(2)', 'in_time_2', 'out_time_2',
+        'in_(3)', 'out_(3)', 'in_time_3', 'out_time_3',
+        'early_in', 'late_come', 'early_out',
+        'hours', 'hrs', 'hours_worked', 'regular_hours', 'overtime_to_mandays',
+        'overstay', 'overtime', 'actual_overstay', 'requested_overtime', 'approved_overtime',
+        'requested_regular_hours', 'approved_regular_hours',
+        'requested_regular_manday_hours', 'approved_regular_manday_hours',
+        'actual_pd_hours', 'requested_pd_hours', 'approved_pd_hours',
+        'old_punch_in', 'old_punch_out', 'new_punch_in', 'new_punch_out',
+    ])
+    PUNCH_COLUMN_PATTERN = re.compile(r'^punch\d+_(in|out)$')
+    
+    # Crystal Reports monthly grid: employee columns, then one block of these
+    # columns per day, labelled with the date in the row above. Blocks are found
+    # by their first field; the report's own labels are not reliable past it
+    # (one export spells Status as "Stutus")
+    CRYSTAL_BLOCK_FIELDS = ('shift', 'plant in', 'plant out', 'status')
+    # Long-format names; the plant columns hold plant codes, and names containing
+    # "in"/"out" would be validated as times
+    CRYSTAL_OUTPUT_COLUMNS = ('SHIFT', 'ENTRY PLANT', 'EXIT PLANT', 'STATUS')
+    CRYSTAL_SCAN_ROWS = 10
+    # Employee rows; the report also lists badge numbers without an EP number
+    CRYSTAL_EP_PREFIXES = ('PP', 'VP')
+    
     def parse_file(self, file_path: str) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
         """
         Parse Excel file and return DataFrame
@@ -64,7 +113,7 @@ class FileParserService:
             # Try parsing as HTML first (for .xls files that are actually HTML)
             if file_path.endswith('.xls'):
                 try:
-                    df = pd.read_html(file_path)[0]
+                    df = self._read_html_streaming(file_path)
                     logger.info(f"Successfully parsed {file_path} as HTML")
                     return df, None
                 except Exception as html_error:
@@ -92,7 +141,15 @@ class FileParserService:
             # Parse XLSX files
             elif file_path.endswith('.xlsx'):
                 try:
-                    df = pd.read_excel(file_path, engine='openpyxl')
+                    try:
+                        if os.path.getsize(file_path) > self.XLSX_STREAMING_THRESHOLD_BYTES:
+                            df = self._read_xlsx_streaming(file_path)
+                        else:
+                            df = pd.read_excel(file_path, engine='openpyxl')
+                    except ValueError as style_error:
+                        if 'stylesheet' not in str(style_error):
+                            raise
+                        df = pd.read_excel(self._without_styles(file_path), engine='openpyxl')
                     logger.info(f"Successfully parsed {file_path} as XLSX")
                     return df, None
                 except Exception as xlsx_error:
@@ -117,6 +174,143 @@ class FileParserService:
             logger.error(f"Unexpected error parsing file: {e}")
             return None, f"Unexpected error: {str(e)}"
     
+    def parse_file_sheets(self, file_path: str) -> Tuple[List[Tuple[str, pd.DataFrame]], Optional[str]]:
+        """
+        Parse every sheet of an Excel file, or every table of an HTML XLS export
+        
+        Args:
+            file_path: Path to the Excel file
+            
+        Returns:
+            Tuple of ([(sheet_name, DataFrame), ...], error_message); empty sheets are skipped
+        """
+        try:
+            if file_path.endswith('.xls'):
+                try:
+                    sheets = self._read_html_tables_streaming(file_path)
+                except Exception as html_error:
+                    logger.debug(f"HTML parsing failed: {html_error}, trying binary format")
+                    sheets = pd.read_excel(file_path, engine='xlrd', sheet_name=None)
+            elif file_path.endswith('.xlsx'):
+                try:
+                    sheets = self._read_xlsx_sheets_streaming(file_path)
+                except ValueError as style_error:
+                    if 'stylesheet' not in str(style_error):
+                        raise
+                    sheets = self._read_xlsx_sheets_streaming(self._without_styles(file_path))
+            else:
+                return [], "Unsupported file format. Only .xls and .xlsx files are supported."
+        except Exception as e:
+            logger.error(f"Failed to parse sheets of {file_path}: {e}")
+            return [], f"Failed to parse file: {str(e)}"
+        
+        return [(str(name), df) for name, df in sheets.items() if not df.empty], None
+    
+    def _without_styles(self, file_path: str) -> io.BytesIO:
+        """
+        Copy an XLSX file without its stylesheet
+        
+        Crystal Reports exports write font attributes openpyxl rejects; the
+        cell values do not depend on the styles, and openpyxl reads a workbook
+        without a stylesheet fine.
+        
+        Args:
+            file_path: Path to the XLSX file
+            
+        Returns:
+            In-memory XLSX file
+        """
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(file_path) as source, zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as target:
+            for item in source.infolist():
+                if item.filename != 'xl/styles.xml':
+                    target.writestr(item, source.read(item.filename))
+        buffer.seek(0)
+        return buffer
+    
+    def _read_xlsx_streaming(self, file_path: str) -> pd.DataFrame:
+        """
+        Read a large XLSX file row by row in read-only mode
+        
+        Avoids building the full openpyxl workbook model, which dominates
+        memory and time on large exports.
+        
+        Args:
+            file_path: Path to the XLSX file
+            
+        Returns:
+            DataFrame with all rows of the active sheet
+        """
+        chunks = list(ChunkedReaderService().iter_xlsx_chunks(file_path))
+        if not chunks:
+            return pd.DataFrame()
+        return pd.concat(chunks, ignore_index=True)
+    
+    def _read_xlsx_sheets_streaming(self, file) -> dict:
+        """
+        Read every sheet of an XLSX file row by row in read-only mode
+        
+        Args:
+            file: Path to the XLSX file, or the file-like copy from _without_styles
+            
+        Returns:
+            Dict of {sheet_name: DataFrame}; sheets without a header row are left out
+        """
+        sheets = {}
+        for name, chunks in ChunkedReaderService().iter_xlsx_sheets(file):
+            chunks = list(chunks)
+            sheets[name] = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+        return sheets
+    
+    def _read_html_streaming(self, file_path: str) -> pd.DataFrame:
+        """
+        Read the first table of an HTML export saved as .xls
+        
+        Rows are parsed incrementally instead of through a full DOM, which
+        for large exports costs several times the file size in memory.
+        
+        Args:
+            file_path: Path to the .xls file
+            
+        Returns:
+            DataFrame with all rows of the first table
+            
+        Raises:
+            ValueError: If the file is not HTML or holds no table
+        """
+        reader = ChunkedReaderService()
+        if not reader.is_html(file_path):
+            raise ValueError("File is not HTML")
+        chunks = list(reader.iter_html_chunks(file_path))
+        if not chunks:
+            raise ValueError("No tables found")
+        return pd.concat(chunks, ignore_index=True)
+    
+    def _read_html_tables_streaming(self, file_path: str) -> dict:
+        """
+        Read every table of an HTML export saved as .xls
+        
+        Args:
+            file_path: Path to the .xls file
+            
+        Returns:
+            Dict of {'Table <n>': DataFrame}
+            
+        Raises:
+            ValueError: If the file is not HTML or holds no table
+        """
+        reader = ChunkedReaderService()
+        if not reader.is_html(file_path):
+            raise ValueError("File is not HTML")
+        tables = {}
+        for number, chunks in reader.iter_html_tables(file_path):
+            chunks = list(chunks)
+            if chunks:
+                tables[f'Table {number}'] = pd.concat(chunks, ignore_index=True)
+        if not tables:
+            raise ValueError("No tables found")
+        return tables
+    
     def detect_file_type(self, df: pd.DataFrame) -> FileType:
         """
         Detect file type based on column structure
@@ -130,6 +324,10 @@ class FileParserService:
         if df is None or df.empty:
             return FileType.UNKNOWN
         
+        if self.find_crystal_layout(df) is not None:
+            logger.info("Detected file type: crystal_report")
+            return FileType.CRYSTAL_REPORT
+        
         # Get column names (case-insensitive comparison)
         columns = [str(col).strip() for col in df.columns]
         columns_lower = [col.lower() for col in columns]
@@ -164,7 +362,7 @@ class FileParserService:
             return df
         
         # Make a copy to avoid modifying original
-        df = df.copy()
+        df = self.reshape_crystal_report(df) if file_type == FileType.CRYSTAL_REPORT else df.copy()
         
         # Normalize column names
         df.columns = [self._normalize_column_name(col) for col in df.columns]
@@ -176,12 +374,9 @@ class FileParserService:
                 df[col] = self._normalize_dates(df[col])
         
         # Normalize times
-        time_columns = [col for col in df.columns if any(
-            keyword in col.lower() for keyword in ['time', 'hours', 'overstay', 'overtime', 'in', 'out']
-        )]
+        time_columns = [col for col in df.columns if self.is_time_column(col)]
         for col in time_columns:
-            if col in df.columns:
-                df[col] = self._normalize_times(df[col])
+            df[col] = self._normalize_times(df[col])
         
         # Handle NaN values
         df = df.fillna('')
@@ -189,6 +384,90 @@ class FileParserService:
         logger.info(f"Normalized {len(df)} rows for file type {file_type.value}")
         return df
     
+    def _grid(self, df: pd.DataFrame) -> np.ndarray:
+        """Cell values of a frame as read, with its header as the first row"""
+        return np.vstack([df.columns.to_numpy(dtype=object), df.to_numpy(dtype=object)])
+    
+    def find_crystal_layout(self, df: pd.DataFrame) -> Optional[CrystalLayout]:
+        """
+        Locate the header rows and day blocks of a Crystal Reports attendance grid
+        
+        Args:
+            df: DataFrame as parsed, with the report's first row as its header
+            
+        Returns:
+            CrystalLayout, or None if the frame is not a Crystal report
+        """
+        head = self._grid(df.head(self.CRYSTAL_SCAN_ROWS))
+        labels = pd.DataFrame(head).apply(lambda column: column.astype(str).str.strip().str.lower())
+        
+        label_rows = np.flatnonzero(labels[0].to_numpy() == 'ep no')
+        if not len(label_rows):
+            return None
+        label_row = int(label_rows[0])
+        
+        width = len(self.CRYSTAL_BLOCK_FIELDS)
+        dated = pd.notna(head[label_row, :len(labels.columns) - width + 1])
+        for field_row in range(label_row + 1, len(labels)):
+            fields = labels.iloc[field_row].to_numpy()
+            # A block starts under every date whose first field is the shift
+            block_starts = np.flatnonzero(dated & (fields[:len(dated)] == self.CRYSTAL_BLOCK_FIELDS[0])).tolist()
+            if block_starts:
+                employee_columns = [
+                    column for column in range(block_starts[0]) if pd.notna(head[label_row, column])
+                ]
+                return CrystalLayout(label_row, field_row, employee_columns, block_starts)
+        
+        return None
+    
+    def reshape_crystal_report(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Turn a Crystal Reports grid into one row per employee and day
+        
+        The day blocks are gathered into a 3-D array (employee, day, field)
+        and flattened with numpy; employee columns are repeated and dates
+        tiled to match. Days with no shift, plant or status are dropped, as
+        are rows whose first cell is not an EP number.
+        
+        Args:
+            df: DataFrame as parsed, with the report's first row as its header
+            
+        Returns:
+            DataFrame with the employee columns, DATE, SHIFT, ENTRY PLANT, EXIT PLANT and STATUS
+        """
+        layout = self.find_crystal_layout(df)
+        if layout is None:
+            return df.copy()
+        
+        grid = self._grid(df)
+        data = grid[layout.field_row + 1:]
+        first_cells = pd.Series(data[:, 0], dtype=object)
+        is_employee = first_cells.astype(str).str.strip().str.startswith(self.CRYSTAL_EP_PREFIXES).to_numpy()
+        skipped = int((~is_employee & first_cells.notna().to_numpy()).sum())
+        if skipped:
+            logger.info(f"Skipped {skipped} Crystal report rows without an EP number")
+        data = data[is_employee]
+        
+        starts = np.array(layout.block_starts)
+        width = len(self.CRYSTAL_BLOCK_FIELDS)
+        blocks = data[:, starts[:, None] + np.arange(width)]  # (employees, days, fields)
+        days = len(starts)
+        
+        employees = data[:, layout.employee_columns]
+        long = pd.DataFrame(
+            np.repeat(employees, days, axis=0),
+            columns=[str(grid[layout.label_row, column]).strip() for column in layout.employee_columns]
+        )
+        long['DATE'] = np.tile(grid[layout.label_row, starts], len(data))
+        values = blocks.reshape(-1, width)
+        for position, name in enumerate(self.CRYSTAL_OUTPUT_COLUMNS):
+            long[name] = values[:, position]
+        
+        has_data = pd.DataFrame(values).notna().any(axis=1).to_numpy()
+        long = long[has_data].reset_index(drop=True)
+        logger.info(f"Reshaped Crystal report: {len(data)} employees x {days} days -> {len(long)} rows")
+        return long
+    
     def _normalize_column_name(self, col_name: str) -> str:
         """
         Normalize column name to consistent format
@@ -231,7 +510,9 @@ class FileParserService:
         """
         Normalize times to HH:MM:SS format, preserving (N) day indicators
         
-        Supports formats: HH:MM, HH:MM:SS, HH:MM (N), HH:MM (N):SS
+        Supports formats: HH:MM, HH:MM:SS, HH:MM (N), HH:MM (N):SS and hours
+        above 24. Each distinct value is parsed once by time_parsing; values
+        that are not times are kept as their stripped text.
         
         Args:
             time_series: Series containing times
@@ -240,55 +521,24 @@ class FileParserService:
             Normalized time series
         """
         try:
-            # Convert to string and handle various time formats
-            def normalize_time(val):
-                if pd.isna(val) or val == '':
-                    return ''
-                
-                val_str = str(val).strip()
-                
-                # Handle "0" as valid empty value
-                if val_str == '0' or val_str == '0.0':
-                    return ''
-                
-                # Extract day indicator (N) if present
-                day_indicator = ''
-                clean_val = val_str
-                if '(' in val_str and ')' in val_str:
-                    # Extract the (N) part
-                    start_idx = val_str.index('(')
-                    end_idx = val_str.index(')') + 1
-                    day_indicator = val_str[start_idx:end_idx]
-                    # Remove (N) for time parsing
-                    before_paren = val_str[:start_idx].strip()
-                    after_paren = val_str[end_idx:].strip()
-                    if after_paren.startswith(':'):
-                        clean_val = before_paren + after_paren
-                    else:
-                        clean_val = before_paren
-                
-                # If already in HH:MM or HH:MM:SS format, normalize
-                if ':' in clean_val:
-                    parts = clean_val.split(':')
-                    if len(parts) == 2:
-                        normalized = f"{parts[0].zfill(2)}:{parts[1].zfill(2)}:00"
-                    elif len(parts) == 3:
-                        normalized = f"{parts[0].zfill(2)}:{parts[1].zfill(2)}:{parts[2].zfill(2)}"
-                    else:
-                        return val_str
-                    
-                    # Append day indicator if present
-                    if day_indicator:
-                        return f"{normalized} {day_indicator}"
-                    return normalized
-                
-                return val_str
-            
-            return time_series.apply(normalize_time)
+            normalized = parse_time_series(time_series)['normalized']
+            return normalized.rename(time_series.name)
         except Exception as e:
             logger.warning(f"Time normalization failed: {e}")
             return time_series
     
+    def is_time_column(self, col_name: str) -> bool:
+        """
+        Check whether a normalized column name holds time values
+        
+        Args:
+            col_name: Column name as produced by _normalize_column_name
+            
+        Returns:
+            True for known time/duration columns
+        """
+        return col_name in self.TIME_COLUMNS or bool(self.PUNCH_COLUMN_PATTERN.match(col_name))
+    
     def get_preview_data(self, df: pd.DataFrame, num_rows: int = 10) -> pd.DataFrame:
         """
         Get preview of first N rows
@@ -0,0 +1,55 @@
+"""
+FingerprintService for recognising repeat uploads and unchanged rows
+"""
+import hashlib
+
+
+class FingerprintService:
+    """Service for hashing uploaded files and imported rows"""
+
+    # Bytes read per step when hashing a file
+    BLOCK_SIZE = 1024 * 1024
+
+    def file_hash(self, file):
+        """
+        SHA-256 of a file's content
+
+        Args:
+            file: Path, or file object opened in binary mode; a file object
+                is rewound afterwards so it can still be parsed
+
+        Returns:
+            Hex digest string
+        """
+        digest = hashlib.sha256()
+        if isinstance(file, (str, bytes)) or hasattr(file, '__fspath__'):
+            with open(file, 'rb') as f:
+                for block in iter(lambda: f.read(self.BLOCK_SIZE), b''):
+                    digest.update(block)
+            return digest.hexdigest()
+
+        file.seek(0)
+        for block in iter(lambda: file.read(self.BLOCK_SIZE), b''):
+            digest.update(block.encode() if isinstance(block, str) else block)
+        file.seek(0)
+        return digest.hexdigest()
+
+    def row_hash(self, row):
+        """
+        Hash of a row dict's field names and values, independent of key order
+
+        Model instances (e.g. a Company foreign key) are hashed by primary
+        key, everything else by its string form.
+
+        Args:
+            row: Dict of model field values
+
+        Returns:
+            32-character hex digest string
+        """
+        parts = []
+        for name in sorted(row):
+            value = row[name]
+            value = getattr(value, 'pk', value)
+            parts.append(f'{name}={value}')
+        return hashlib.blake2b('\x1f'.join(parts).encode(), digest_size=16).hexdigest()
@@ -0,0 +1,189 @@
+"""
+ImportDiffService for previewing what an import would change
+
+It takes the place of BulkUpsertService/StagingMergeService in an import
+run: rows are validated and converted exactly as for a real import, but
+each batch is only compared against the stored records. Keys and row
+hashes are loaded in bulk for the batch's (ep_no, date) range, and each row
+is classed as new, changed or unchanged from set lookups, so nothing is
+written.
+"""
+import logging
+from dataclasses import dataclass, field
+
+from django.core.exceptions import ValidationError
+
+from core.services.bulk_upsert_service import BulkUpsertService
+from core.services.fingerprint_service import FingerprintService
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ImportDiff:
+    """Counts of the rows an import would create, update and leave unchanged"""
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    # Sample of stored records the import would change, with old and new field values
+    changes: list = field(default_factory=list)
+
+    def to_dict(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'changes': self.changes
+        }
+
+
+class ImportDiffService:
+    """Drop-in for the upsert services that counts changes instead of writing them"""
+
+    # Changed records described field by field
+    SAMPLE_SIZE = 20
+
+    def __init__(self, model, key_fields, hash_field=None, sample_size=SAMPLE_SIZE):
+        """
+        Args:
+            model: Django model class the import writes into
+            key_fields: Pair of field names forming the model's unique_together key
+            hash_field: Optional field storing a hash of each row, as passed
+                to the upsert service the real import uses
+            sample_size: Number of changed records to describe
+        """
+        self.model = model
+        self.key_fields = tuple(key_fields)
+        self.hash_field = hash_field
+        self.sample_size = sample_size
+        self.loader = BulkUpsertService(model, key_fields, hash_field)
+        self.diff = ImportDiff()
+        # Row hash of every key an earlier batch of this run would have written
+        self._written = {}
+
+    def get_key(self, row):
+        """Build the unique key tuple for a row dict"""
+        return tuple(row[field_name] for field_name in self.key_fields)
+
+    def upsert(self, rows):
+        """
+        Count what BulkUpsertService.upsert would do with rows, without writing
+
+        Keys written by an earlier batch of the same run are compared with
+        that batch's rows rather than with the database.
+
+        Args:
+            rows: List of dicts of model field values, each including the key fields
+
+        Returns:
+            Tuple of (created_count, updated_count), as upsert would return them
+        """
+        if not rows:
+            return (0, 0)
+
+        latest_rows = {}
+        occurrences = {}
+        for row in rows:
+            key = self.get_key(row)
+            latest_rows[key] = {**latest_rows[key], **row} if key in latest_rows else row
+            occurrences[key] = occurrences.get(key, 0) + 1
+
+        fingerprints = FingerprintService()
+        hashes = {key: fingerprints.row_hash(row) for key, row in latest_rows.items()}
+
+        stored = self.loader.fetch_existing(key for key in latest_rows if key not in self._written)
+
+        created_keys = set()
+        unchanged_keys = set()
+        changed = {}
+        for key, row_hash in hashes.items():
+            if key in self._written:
+                previous_hash = self._written[key]
+            elif key in stored:
+                previous_hash = stored[key][1]
+            else:
+                created_keys.add(key)
+                continue
+
+            if self.hash_field and previous_hash == row_hash:
+                unchanged_keys.add(key)
+            elif key in stored:
+                changed[key] = stored[key][0]
+
+        self._written.update(hashes)
+
+        if len(self.diff.changes) < self.sample_size and changed:
+            self._sample_changes(latest_rows, changed)
+
+        updated = len(latest_rows) - len(created_keys) - len(unchanged_keys)
+        # Rows merged into another row of the batch count as updates, unless nothing was written
+        updated += sum(count - 1 for key, count in occurrences.items() if key not in unchanged_keys)
+
+        self.diff.created += len(created_keys)
+        self.diff.updated += updated
+        self.diff.unchanged += len(rows) - len(created_keys) - updated
+        return (len(created_keys), updated)
+
+    def insert_missing(self, rows):
+        """
+        Count what BulkUpsertService.insert_missing would do with rows, without writing
+
+        Returns:
+            Tuple of (created_count, skipped_count)
+        """
+        if not rows:
+            return (0, 0)
+
+        keys = {self.get_key(row) for row in rows}
+        stored = self.loader.fetch_existing_keys(key for key in keys if key not in self._written)
+        new_keys = {key for key in keys if key not in stored and key not in self._written}
+        self._written.update((key, None) for key in keys)
+
+        self.diff.created += len(new_keys)
+        self.diff.unchanged += len(rows) - len(new_keys)
+        return (len(new_keys), len(rows) - len(new_keys))
+
+    def _sample_changes(self, rows, changed):
+        """Describe up to sample_size changed records field by field"""
+        pks = list(changed.values())[:self.sample_size - len(self.diff.changes)]
+        relations = [
+            model_field.name for model_field in self.model._meta.concrete_fields
+            if model_field.is_relation
+        ]
+        records = self.model.objects.select_related(*relations).in_bulk(pks)
+
+        for key, pk in changed.items():
+            record = records.get(pk)
+            if record is None:
+                continue
+            fields = {}
+            for name, value in rows[key].items():
+                if name in self.key_fields or name == self.hash_field:
+                    continue
+                old = getattr(record, name)
+                if self._differs(name, old, value):
+                    fields[name] = {'old': self._display(old), 'new': self._display(value)}
+            if fields:
+                self.diff.changes.append({
+                    'key': dict(zip(self.key_fields, map(self._display, key))),
+                    'fields': fields
+                })
+            if len(self.diff.changes) >= self.sample_size:
+                break
+
+    def _differs(self, name, old, new):
+        """Compare a stored value with an incoming one after the model field's own conversion"""
+        model_field = self.model._meta.get_field(name)
+        if model_field.is_relation:
+            return getattr(old, 'pk', old) != getattr(new, 'pk', new) or getattr(new, 'pk', True) is None
+        try:
+            new = model_field.to_python(new)
+        except ValidationError:
+            pass
+        return old != new
+
+    def _display(self, value):
+        """JSON-friendly form of a field value"""
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        return str(value)
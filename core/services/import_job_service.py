@@ -0,0 +1,558 @@
+"""
+ImportJobService for running uploads outside the HTTP request
+
+Upload views save the file and enqueue an ImportJob; the run_import_worker
+management command claims queued jobs one at a time and runs the matching
+processor, publishing progress on the job's channel and writing the final
+UploadLog/ImportLog itself. Attendance and Excel imports keep an
+ImportCheckpoint keyed on the file's hash, so a job requeued after its worker
+died, or a re-upload of the same file, carries on from the last committed row.
+Attendance and Excel dry-run jobs go through the same processors but only
+compare the rows with the stored records, and store what the import would
+change as their result.
+"""
+import json
+import logging
+import os
+import shutil
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import ImportJob, ImportLog, UploadLog
+from core.services.checkpoint_service import CheckpointService
+from core.services.fingerprint_service import FingerprintService
+from core.services.progress_service import ProgressService
+
+logger = logging.getLogger(__name__)
+
+
+class ImportJobError(Exception):
+    """Raised by a job runner for failures that should be shown to the uploader"""
+    pass
+
+
+class ImportJobService:
+    """Service for enqueueing, claiming and running import jobs"""
+
+    # Uploaded files wait here (under MEDIA_ROOT) until their job has run
+    UPLOAD_SUBDIR = 'import_jobs'
+
+    # Running jobs whose heartbeat is older than this belong to a worker that died
+    LEASE = timedelta(minutes=15)
+
+    # Minimum time between two heartbeat writes for the same job
+    HEARTBEAT_INTERVAL = timedelta(seconds=30)
+
+    # Excel uploads and their validation error reports live here (under MEDIA_ROOT)
+    EXCEL_UPLOAD_SUBDIR = 'excel_uploads'
+
+    def enqueue(self, user, kind, uploaded_file, dry_run=False, force=False):
+        """
+        Save an uploaded file and queue it for the worker
+
+        Args:
+            user: User performing the upload
+            kind: One of ImportJob.KIND_CHOICES
+            uploaded_file: Django UploadedFile
+            dry_run: Only work out what the import would change
+            force: Import even if the file repeats an earlier clean import
+
+        Returns:
+            The queued ImportJob
+        """
+        upload_dir = os.path.join(settings.MEDIA_ROOT, self.UPLOAD_SUBDIR, str(user.id))
+        os.makedirs(upload_dir, exist_ok=True)
+
+        # Prefix keeps two uploads of the same filename apart
+        file_path = os.path.join(upload_dir, f'{uuid.uuid4().hex}_{os.path.basename(uploaded_file.name)}')
+        with open(file_path, 'wb') as destination:
+            for chunk in uploaded_file.chunks():
+                destination.write(chunk)
+
+        return self.enqueue_path(user, kind, file_path, uploaded_file.name, dry_run=dry_run, force=force)
+
+    def enqueue_files(self, user, kind, uploaded_files, force=False):
+        """
+        Save several uploaded files into one directory and queue them as a single job
+
+        Args:
+            user: User performing the upload
+            kind: One of ImportJob.KIND_CHOICES
+            uploaded_files: List of Django UploadedFile
+            force: Import even if a sheet repeats an earlier clean import
+
+        Returns:
+            The queued ImportJob; its file_path is the directory
+        """
+        upload_dir = os.path.join(settings.MEDIA_ROOT, self.UPLOAD_SUBDIR, str(user.id), uuid.uuid4().hex)
+        os.makedirs(upload_dir, exist_ok=True)
+
+        for uploaded_file in uploaded_files:
+            with open(os.path.join(upload_dir, os.path.basename(uploaded_file.name)), 'wb') as destination:
+                for chunk in uploaded_file.chunks():
+                    destination.write(chunk)
+
+        filename = ', '.join(os.path.basename(f.name) for f in uploaded_files)
+        return self.enqueue_path(user, kind, upload_dir, filename[:255], force=force)
+
+    def enqueue_path(self, user, kind, file_path, filename, dry_run=False, force=False):
+        """
+        Queue a file that is already on disk
+
+        Args:
+            user: User performing the upload
+            kind: One of ImportJob.KIND_CHOICES
+            file_path: Path of the saved upload
+            filename: Original filename shown in logs
+            dry_run: Only work out what the import would change; a saved
+                Excel upload is then kept for the import that follows
+            force: Import even if the file repeats an earlier clean import
+
+        Returns:
+            The queued ImportJob
+        """
+        job = ImportJob.objects.create(
+            user=user, kind=kind, filename=filename, file_path=file_path, dry_run=dry_run, force=force
+        )
+        ProgressService().publish(self.progress_channel(job.id), {
+            'processed': 0, 'total': 0, 'status': 'queued', 'percentage': 0
+        })
+        logger.info(f'Queued {kind} {"dry-run " if dry_run else ""}import job {job.id}: {filename} by {user.username}')
+        return job
+
+    def claim_next(self, worker_name):
+        """
+        Claim the oldest queued job
+
+        The claim is a conditional UPDATE, so when several workers race for
+        the same job exactly one of them gets it.
+
+        Args:
+            worker_name: Identifier recorded on the claimed job
+
+        Returns:
+            The claimed ImportJob, or None if the queue is empty
+        """
+        while True:
+            job_id = (
+                ImportJob.objects.filter(status='queued')
+                .order_by('created_at', 'id')
+                .values_list('id', flat=True)
+                .first()
+            )
+            if job_id is None:
+                return None
+
+            now = timezone.now()
+            claimed = ImportJob.objects.filter(pk=job_id, status='queued').update(
+                status='running', worker=worker_name, started_at=now, heartbeat_at=now
+            )
+            if claimed:
+                return ImportJob.objects.select_related('user').get(pk=job_id)
+
+    def heartbeat(self, job):
+        """
+        Renew the lease of a running job
+
+        Called from the job's progress callbacks; the write is skipped when
+        the last one is less than HEARTBEAT_INTERVAL old. Only the worker that
+        holds the job can renew it.
+
+        Args:
+            job: ImportJob being run by this process
+        """
+        now = timezone.now()
+        if job.heartbeat_at and now - job.heartbeat_at < self.HEARTBEAT_INTERVAL:
+            return
+        ImportJob.objects.filter(pk=job.pk, status='running', worker=job.worker).update(heartbeat_at=now)
+        job.heartbeat_at = now
+
+    def requeue_stale(self):
+        """
+        Put jobs abandoned by a dead worker back in the queue
+
+        A job is abandoned once its heartbeat is older than LEASE, however
+        long it has been running.
+
+        Returns:
+            Number of jobs requeued
+        """
+        cutoff = timezone.now() - self.LEASE
+        return ImportJob.objects.filter(status='running').filter(
+            Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+        ).update(status='queued', worker='', started_at=None, heartbeat_at=None)
+
+    def progress_callback(self, job, progress):
+        """
+        Build a processor progress_callback that publishes on the job's channel
+        and renews the job's lease
+
+        Args:
+            job: ImportJob being run
+            progress: ProgressService to publish through
+
+        Returns:
+            Callable taking (processed, total, current_ep=None)
+        """
+        publish = progress.processor_callback(self.progress_channel(job.id))
+
+        def progress_callback(processed, total, current_ep=None):
+            self.heartbeat(job)
+            publish(processed, total, current_ep)
+        return progress_callback
+
+    def run(self, job):
+        """
+        Run a claimed job and record its outcome
+
+        Args:
+            job: ImportJob in the running state
+
+        Returns:
+            The finished ImportJob
+        """
+        runners = {
+            'attendance': self._run_attendance,
+            'manday': self._run_manday,
+            'excel': self._run_excel,
+            'excel_batch': self._run_excel_batch,
+        }
+        progress = ProgressService()
+
+        try:
+            result = runners[job.kind](job, progress)
+            # Values such as timestamps and numpy scalars are stored as text
+            job.result = json.loads(json.dumps(result, default=str))
+            job.status = 'completed'
+        except Exception as e:
+            logger.exception(f'Import job {job.id} failed')
+            job.status = 'failed'
+            job.error_message = str(e)
+            job.result = {'success': False, 'error': str(e)}
+            progress.publish(self.progress_channel(job.id), {
+                'processed': 0, 'total': 0, 'status': 'failed', 'percentage': 0, 'error': str(e)
+            })
+
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'result', 'error_message', 'finished_at'])
+
+        # A previewed Excel upload stays where the confirm and process endpoints expect it
+        if job.dry_run and job.kind == 'excel':
+            return job
+
+        try:
+            if os.path.isdir(job.file_path):
+                shutil.rmtree(job.file_path)
+            else:
+                os.remove(job.file_path)
+        except OSError:
+            pass
+
+        return job
+
+    def error_report_path(self, user_id, session_id):
+        """Path of the validation error report saved for an Excel upload"""
+        return os.path.join(settings.MEDIA_ROOT, self.EXCEL_UPLOAD_SUBDIR, str(user_id), f'{session_id}.errors.csv')
+
+    def save_error_report(self, user_id, session_id, validation_report):
+        """
+        Save an upload's validation errors where download_error_report serves them
+
+        Args:
+            user_id: ID of the uploading user
+            session_id: Session ID the report is downloaded under
+            validation_report: ValidationReport of the upload
+
+        Returns:
+            Path of the saved report, or '' when there are no errors
+        """
+        error_report_path = self.error_report_path(user_id, session_id)
+        if validation_report.errors:
+            os.makedirs(os.path.dirname(error_report_path), exist_ok=True)
+            validation_report.write_error_report(error_report_path)
+            return error_report_path
+
+        # Drop a report left by an earlier upload under the same name
+        if os.path.exists(error_report_path):
+            os.remove(error_report_path)
+        return ''
+
+    def progress_channel(self, job_id):
+        """ProgressService channel the worker publishes a job's progress on"""
+        return f'job_{job_id}'
+
+    def _publish_complete(self, job, progress, processed=0, total=0):
+        """Publish the final progress of a job whose processor has finished"""
+        progress.publish(self.progress_channel(job.id), {
+            'processed': processed,
+            'total': total,
+            'status': 'complete',
+            'percentage': 100
+        })
+
+    def _run_attendance(self, job, progress):
+        """Process an attendance CSV/Excel upload with CSVProcessor"""
+        from core.csv_processor import CSVProcessor
+
+        if job.dry_run:
+            processor = CSVProcessor()
+            processor.progress_callback = self.progress_callback(job, progress)
+            with open(job.file_path, 'rb') as f:
+                result = processor.process_csv(File(f, name=job.filename), job.user, dry_run=True)
+            self._publish_complete(job, progress, result.get('processed_rows', 0), result.get('total_rows', 0))
+            return result
+
+        # An exact repeat of an upload that went through cleanly has nothing new to write,
+        # unless the upload is forced
+        file_hash = FingerprintService().file_hash(job.file_path)
+        previous = None
+        if not job.force:
+            previous = UploadLog.objects.filter(user=job.user, file_hash=file_hash, error_count=0).first()
+        if previous is not None:
+            upload_log = UploadLog.objects.create(
+                user=job.user,
+                filename=job.filename,
+                file_hash=file_hash,
+                error_messages=f'Skipped: identical to {previous.filename} uploaded at {previous.uploaded_at:%Y-%m-%d %H:%M}'
+            )
+            self._publish_complete(job, progress)
+            logger.info(f'Skipped {job.filename} by {job.user.username}: identical to upload {previous.id}')
+            return {
+                'success': True,
+                'skipped': True,
+                'success_count': 0,
+                'updated_count': 0,
+                'error_count': 0,
+                'errors': [],
+                'upload_log_id': upload_log.id
+            }
+
+        checkpoints = CheckpointService()
+        checkpoint = checkpoints.load(job.user, job.kind, file_hash)
+
+        processor = CSVProcessor()
+        processor.progress_callback = self.progress_callback(job, progress)
+        with open(job.file_path, 'rb') as f:
+            result = processor.process_csv(File(f, name=job.filename), job.user, checkpoint=checkpoint)
+        # Chunks that failed to write are retried when the file is uploaded again
+        if not result.get('failed_ranges'):
+            checkpoints.clear(checkpoint)
+
+        self._publish_complete(job, progress, result.get('processed_rows', 0), result.get('total_rows', 0))
+
+        error_messages = '\n'.join(result['errors']) if result['errors'] else ''
+        upload_log = UploadLog.objects.create(
+            user=job.user,
+            filename=job.filename,
+            success_count=result['success_count'],
+            updated_count=result['updated_count'],
+            error_count=result['error_count'],
+            error_messages=error_messages,
+            file_hash=file_hash
+        )
+
+        logger.info(
+            f'CSV processing completed by {job.user.username}: '
+            f'Created={result["success_count"]}, Updated={result["updated_count"]}, '
+            f'Unchanged={result["unchanged_count"]}, Errors={result["error_count"]}'
+        )
+        if result['error_count'] > 0:
+            logger.error(f'CSV processing errors for {job.filename}: {error_messages[:200]}...')
+
+        return {
+            'success': result['success'],
+            'success_count': result['success_count'],
+            'updated_count': result['updated_count'],
+            'unchanged_count': result['unchanged_count'],
+            'error_count': result['error_count'],
+            'errors': result['errors'],
+            'upload_log_id': upload_log.id
+        }
+
+    def _run_manday(self, job, progress):
+        """Process a manday summary upload with MandayProcessor"""
+        if job.dry_run:
+            raise ImportJobError('Dry runs are not supported for manday uploads')
+
+        from core.manday_processor import MandayProcessor
+        from core.models import MandayUploadLog
+
+        processor = MandayProcessor()
+        processor.progress_callback = self.progress_callback(job, progress)
+        with open(job.file_path, 'rb') as f:
+            result = processor.process_csv(File(f, name=job.filename), job.user)
+
+        self._publish_complete(job, progress, result.get('processed_rows', 0), result.get('total_rows', 0))
+
+        error_messages = '\n'.join(result['errors']) if result['errors'] else ''
+        upload_log = MandayUploadLog.objects.create(
+            user=job.user,
+            filename=job.filename,
+            success_count=result['success_count'],
+            updated_count=result['updated_count'],
+            error_count=result['error_count'],
+            error_messages=error_messages
+        )
+
+        logger.info(
+            f'Manday CSV processing completed by {job.user.username}: '
+            f'Created={result["success_count"]}, Updated={result["updated_count"]}, Errors={result["error_count"]}'
+        )
+        if result['error_count'] > 0:
+            logger.error(f'Manday CSV processing errors for {job.filename}: {error_messages[:200]}...')
+
+        return {
+            'success': result['success'],
+            'success_count': result['success_count'],
+            'updated_count': result['updated_count'],
+            'error_count': result['error_count'],
+            'errors': result['errors'],
+            'upload_log_id': upload_log.id
+        }
+
+    def _run_excel(self, job, progress):
+        """Parse, validate and import an Excel upload through the Excel import services"""
+        from core.services.file_parser_service import FileParserService, FileType
+        from core.services.data_validator_service import DataValidatorService
+        from core.services.data_importer_service import DataImporterService
+        from core.services.permission_service import PermissionService
+
+        file_parser = FileParserService()
+        importer = DataImporterService()
+        importer.progress_callback = self.progress_callback(job, progress)
+        session_id = job.filename
+
+        # An exact repeat of a completed import is logged without being parsed again, unless forced
+        file_hash = FingerprintService().file_hash(job.file_path)
+        previous = None if job.dry_run or job.force else importer.find_repeat_import(job.user, file_hash)
+        if previous is not None:
+            result = importer.log_repeat_import(
+                job.user, session_id, previous.file_type, previous.total_rows, file_hash, previous
+            )
+            self._publish_complete(job, progress, result.total_rows, result.total_rows)
+            return {
+                'success': True,
+                'skipped': True,
+                'file_type': previous.file_type,
+                'total_rows': result.total_rows,
+                'imported_rows': 0,
+                'import_duplicate_rows': result.duplicate_rows,
+                'import_success': True,
+                'import_log_id': result.import_log_id
+            }
+
+        df, error = file_parser.parse_file(job.file_path)
+        if error:
+            raise ImportJobError(error)
+
+        file_type = file_parser.detect_file_type(df)
+        if file_type == FileType.UNKNOWN:
+            raise ImportJobError('Could not detect file type. Please ensure the file has the correct column structure.')
+
+        if not PermissionService().can_upload(job.user, file_type):
+            raise ImportJobError(f'You do not have permission to upload {file_type.value} files')
+
+        df = file_parser.normalize_data(df, file_type)
+        validation_report = DataValidatorService().validate_batch(df, file_type.value)
+        preview_df = file_parser.get_preview_data(df, 10)
+
+        # Saved so the error download never has to re-parse the upload
+        error_report_path = self.save_error_report(job.user.id, session_id, validation_report)
+
+        logger.info(f"File processed: {session_id}, type: {file_type.value}, valid: {validation_report.valid_rows}/{validation_report.total_rows}")
+
+        if job.dry_run:
+            result = importer.import_batch(
+                df=df,
+                file_type=file_type,
+                user=job.user,
+                filename=session_id,
+                dry_run=True
+            )
+        else:
+            checkpoints = CheckpointService()
+            checkpoint = checkpoints.load(job.user, job.kind, file_hash)
+            result = importer.import_batch(
+                df=df,
+                file_type=file_type,
+                user=job.user,
+                filename=session_id,
+                session_id=session_id,
+                file_hash=file_hash,
+                checkpoint=checkpoint
+            )
+            if result.success:
+                checkpoints.clear(checkpoint)
+
+            logger.info(f"Auto-import completed: {result.imported_rows} imported, {result.duplicate_rows} duplicates")
+
+            if result.import_log_id and error_report_path:
+                ImportLog.objects.filter(id=result.import_log_id).update(error_report_path=error_report_path)
+
+        # Round-trip through JSON so dates and NaN in the preview are storable
+        preview_data = json.loads(preview_df.to_json(orient='records', date_format='iso'))
+
+        summary = {
+            'success': True,
+            'file_type': file_type.value,
+            'total_rows': validation_report.total_rows,
+            'valid_rows': validation_report.valid_rows,
+            'invalid_rows': validation_report.invalid_rows,
+            'duplicate_rows': len(validation_report.duplicates),
+            'preview_data': preview_data,
+            'preview_columns': list(preview_df.columns),
+            'validation_errors': validation_report.to_dict()['errors'][:100],
+            'has_errors': validation_report.invalid_rows > 0,
+            'imported_rows': result.imported_rows,
+            'import_duplicate_rows': result.duplicate_rows,
+            'import_error_rows': result.error_rows,
+            'import_success': result.success,
+            'import_log_id': result.import_log_id,
+            'import_error_message': result.error_message
+        }
+        if job.dry_run:
+            summary['dry_run'] = True
+            summary['diff'] = result.diff
+        return summary
+
+    def _run_excel_batch(self, job, progress):
+        """Import every sheet of every file in the job's directory with BatchImportService"""
+        from core.services.batch_import_service import BatchImportService
+
+        file_paths = sorted(
+            os.path.join(job.file_path, name) for name in os.listdir(job.file_path)
+            if name.endswith(('.xls', '.xlsx'))
+        )
+        if not file_paths:
+            raise ImportJobError('No .xls or .xlsx files to import')
+
+        channel = self.progress_channel(job.id)
+        service = BatchImportService()
+        service.force = job.force
+        # Row progress of each sheet only renews the lease; the job channel reports files
+        service.import_progress_callback = lambda processed, total, current_ep=None: self.heartbeat(job)
+        results = service.run(
+            file_paths,
+            job.user,
+            session_id=f'batch_{job.id}',
+            progress_callback=self.progress_callback(job, progress)
+        )
+
+        progress.publish(channel, {
+            'processed': len(file_paths),
+            'total': len(file_paths),
+            'status': 'complete',
+            'percentage': 100
+        })
+
+        return {
+            'success': all(result['success'] for result in results),
+            'files': len(file_paths),
+            'sheets': results,
+            'imported_rows': sum(result.get('imported_rows', 0) for result in results)
+        }
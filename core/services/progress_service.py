@@ -0,0 +1,142 @@
+"""
+ProgressService for publishing upload progress to every web worker
+
+Progress is kept in the 'progress' cache, which is shared by all gunicorn
+workers and the import worker, so a poll or stream that lands on any worker
+sees the same state. Writes are throttled by time rather than by row count.
+"""
+import json
+import logging
+import time
+
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressService:
+    """Service for publishing, reading and streaming upload progress"""
+
+    CACHE_ALIAS = 'progress'
+    TIMEOUT = 3600  # 1 hour
+
+    # Minimum seconds between two writes on a channel with the same status
+    MIN_INTERVAL = 0.5
+
+    # Streams close well before gunicorn's worker timeout; EventSource reconnects
+    STREAM_POLL_INTERVAL = 0.5
+    STREAM_DURATION = 25
+    STREAM_RETRY_MS = 1000
+
+    FINAL_STATUSES = ('complete', 'completed', 'failed', 'error')
+
+    def __init__(self, min_interval=MIN_INTERVAL):
+        self.min_interval = min_interval
+        self._last_write = {}
+        self._last_status = {}
+
+    @property
+    def cache(self):
+        return caches[self.CACHE_ALIAS]
+
+    def _key(self, channel):
+        return f'upload_progress_{channel}'
+
+    def publish(self, channel, progress, force=False):
+        """
+        Publish progress for a channel
+
+        A write is skipped if the status is unchanged and the channel was
+        written less than min_interval seconds ago, so callers can report
+        after every row without flooding the cache.
+
+        Args:
+            channel: Channel name, e.g. 'job_12'
+            progress: JSON-serializable dict with at least a 'status' key
+            force: Write even if throttled
+
+        Returns:
+            True if the progress was written
+        """
+        now = time.monotonic()
+        status = progress.get('status')
+        last_write = self._last_write.get(channel)
+        if (not force and last_write is not None and status == self._last_status.get(channel)
+                and now - last_write < self.min_interval):
+            return False
+
+        try:
+            self.cache.set(self._key(channel), progress, timeout=self.TIMEOUT)
+        except Exception as e:
+            logger.error(f'Error writing progress for {channel}: {e}')
+            return False
+
+        self._last_write[channel] = now
+        self._last_status[channel] = status
+        return True
+
+    def get(self, channel):
+        """
+        Get the latest progress for a channel
+
+        Args:
+            channel: Channel name
+
+        Returns:
+            Progress dict or None
+        """
+        return self.cache.get(self._key(channel))
+
+    def stream(self, channel, duration=STREAM_DURATION, poll_interval=STREAM_POLL_INTERVAL):
+        """
+        Yield Server-Sent Events for a channel
+
+        Sends the current progress straight away and again whenever it
+        changes. The stream ends on a final status or after duration
+        seconds; clients reconnect after STREAM_RETRY_MS.
+
+        Args:
+            channel: Channel name
+            duration: Seconds to keep the stream open
+            poll_interval: Seconds between cache reads
+
+        Yields:
+            SSE-formatted strings
+        """
+        yield f'retry: {self.STREAM_RETRY_MS}\n\n'
+
+        deadline = time.monotonic() + duration
+        last_sent = None
+        while True:
+            progress = self.get(channel)
+            if progress is not None and progress != last_sent:
+                yield f'data: {json.dumps(progress)}\n\n'
+                last_sent = progress
+                if progress.get('status') in self.FINAL_STATUSES:
+                    return
+
+            if time.monotonic() >= deadline:
+                return
+            time.sleep(poll_interval)
+
+    def processor_callback(self, channel):
+        """
+        Build a progress_callback for CSVProcessor/MandayProcessor
+
+        Args:
+            channel: Channel to publish into
+
+        Returns:
+            Callable taking (processed, total, current_ep=None)
+        """
+        def progress_callback(processed, total, current_ep=None):
+            progress = {
+                'processed': processed,
+                'total': total,
+                'status': 'processing',
+                'percentage': int((processed / total) * 100) if total > 0 else 0
+            }
+            if current_ep:
+                progress['current_ep'] = current_ep
+            self.publish(channel, progress)
+        return progress_callback
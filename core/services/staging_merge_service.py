@@ -0,0 +1,203 @@
+"""
+StagingMergeService for merging rows through a temporary staging table
+"""
+import logging
+import uuid
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.services.fingerprint_service import FingerprintService
+
+logger = logging.getLogger(__name__)
+
+
+class StagingMergeService:
+    """Service for loading rows into a staging table and merging them with one INSERT ... ON CONFLICT"""
+
+    # Backends whose INSERT supports ON CONFLICT (...) DO UPDATE
+    SUPPORTED_VENDORS = ('sqlite', 'postgresql')
+
+    def __init__(self, model, key_fields, hash_field=None):
+        """
+        Args:
+            model: Django model class to write into
+            key_fields: Field names forming the model's unique_together key
+            hash_field: Optional field storing a hash of each row; existing
+                records whose stored hash matches are not rewritten
+        """
+        self.model = model
+        self.key_fields = tuple(key_fields)
+        self.hash_field = hash_field
+        self.table = model._meta.db_table
+
+    @classmethod
+    def is_supported(cls):
+        """True if the database can run the merge statement"""
+        return connection.vendor in cls.SUPPORTED_VENDORS
+
+    def get_key(self, row):
+        """Build the unique key tuple for a row dict"""
+        return tuple(row[field] for field in self.key_fields)
+
+    def upsert(self, rows):
+        """
+        Create new rows and update existing ones in a single transaction
+
+        Same contract as BulkUpsertService.upsert: rows repeating a key are
+        merged so later values win, and existing records only have the fields
+        present in their row written. Rows are bulk-loaded into a temporary
+        staging table and merged into the model's table with one set-based
+        statement per distinct field set, so the table's indexes are used
+        as-is and never rebuilt.
+
+        With a hash_field, the conflict update only fires where the stored
+        hash differs, so unchanged records keep their updated_at.
+
+        Args:
+            rows: List of dicts of model field values, each including the key fields
+
+        Returns:
+            Tuple of (created_count, updated_count)
+        """
+        if not rows:
+            return (0, 0)
+
+        latest_rows = {}
+        occurrences = {}
+        for row in rows:
+            key = self.get_key(row)
+            latest_rows[key] = {**latest_rows[key], **row} if key in latest_rows else row
+            occurrences[key] = occurrences.get(key, 0) + 1
+
+        # Hashes cover the key fields, so each one identifies its row
+        keys_by_hash = {}
+        if self.hash_field:
+            fingerprints = FingerprintService()
+            for key, row in latest_rows.items():
+                row_hash = fingerprints.row_hash(row)
+                latest_rows[key] = {**row, self.hash_field: row_hash}
+                keys_by_hash[row_hash] = key
+
+        # Rows setting the same fields are merged together
+        groups = {}
+        for row in latest_rows.values():
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+
+        created = 0
+        updated = 0
+        unchanged_keys = set()
+        with transaction.atomic():
+            for field_names, group in groups.items():
+                group_created, group_updated, unchanged_hashes = self._merge(field_names, group)
+                created += group_created
+                updated += group_updated
+                unchanged_keys.update(keys_by_hash[row_hash] for row_hash in unchanged_hashes)
+
+        # Rows merged into another row of the batch count as updates, unless nothing was written
+        repeated_count = sum(
+            count - 1 for key, count in occurrences.items() if key not in unchanged_keys
+        )
+        return (created, updated + repeated_count)
+
+    def _merge(self, field_names, rows):
+        """
+        Stage rows that all set field_names and merge them into the table
+
+        Returns:
+            Tuple of (created_count, updated_count, hashes of unchanged rows)
+        """
+        opts = self.model._meta
+        now = timezone.now()
+        quote = connection.ops.quote_name
+
+        # Rows may name a foreign key by field name or attname
+        set_fields = {opts.get_field(name).name: name for name in field_names}
+        key_names = {opts.get_field(name).name for name in self.key_fields}
+
+        # New records get every column: row values, or timestamps and field defaults
+        insert_fields = [field for field in opts.concrete_fields if not field.primary_key or field.name in set_fields]
+        auto_now_fields = [
+            field for field in insert_fields
+            if getattr(field, 'auto_now', False) and field.name not in set_fields
+        ]
+        update_fields = [
+            field for field in insert_fields
+            if field.name in set_fields and field.name not in key_names
+        ] + auto_now_fields
+
+        columns = ', '.join(quote(field.column) for field in insert_fields)
+        key_columns = [quote(opts.get_field(name).column) for name in self.key_fields]
+
+        defaults = {}
+        for field in insert_fields:
+            if field.name not in set_fields:
+                default = now if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False) else field.get_default()
+                defaults[field.name] = field.get_db_prep_save(default, connection)
+
+        params = []
+        for row in rows:
+            values = []
+            for field in insert_fields:
+                if field.name not in set_fields:
+                    values.append(defaults[field.name])
+                    continue
+                value = row[set_fields[field.name]]
+                if field.is_relation and isinstance(value, field.remote_field.model):
+                    value = value.pk
+                values.append(field.get_db_prep_save(value, connection))
+            params.append(values)
+
+        # A fresh name per merge can never match a permanent table, and qualifying the
+        # temporary schema keeps the DROP away from anything that isn't ours
+        temp_schema = 'pg_temp' if connection.vendor == 'postgresql' else 'temp'
+        staging_name = quote(f'{self.table}_staging_{uuid.uuid4().hex}')
+        staging = f'{temp_schema}.{staging_name}'
+        table = quote(self.table)
+        placeholders = ', '.join(['%s'] * len(insert_fields))
+        join_condition = ' AND '.join(f't.{column} = s.{column}' for column in key_columns)
+        # Columns a row does not set keep the stored value, so NOT NULL checks pass for
+        # existing records; only the staged defaults reach new records
+        select_columns = ', '.join(
+            f's.{quote(field.column)}' if field.name in set_fields or field in auto_now_fields
+            else f'COALESCE(t.{quote(field.column)}, s.{quote(field.column)})'
+            for field in insert_fields
+        )
+        hash_column = quote(opts.get_field(self.hash_field).column) if self.hash_field else None
+        if update_fields:
+            assignments = ', '.join(f'{quote(f.column)} = excluded.{quote(f.column)}' for f in update_fields)
+            conflict_action = f'DO UPDATE SET {assignments}'
+            if hash_column:
+                conflict_action += (
+                    f' WHERE {table}.{hash_column} IS NULL OR {table}.{hash_column} <> excluded.{hash_column}'
+                )
+        else:
+            conflict_action = 'DO NOTHING'
+
+        with connection.cursor() as cursor:
+            # Temporary tables are private to this connection, so concurrent uploads don't collide.
+            # The savepoint rolls back a failed merge, table included, so the connection stays
+            # usable and the original error propagates instead of a failing DROP
+            with transaction.atomic():
+                cursor.execute(f'CREATE TEMPORARY TABLE {staging_name} AS SELECT {columns} FROM {table} WHERE 1 = 0')
+                cursor.executemany(f'INSERT INTO {staging} ({columns}) VALUES ({placeholders})', params)
+
+                cursor.execute(f'SELECT COUNT(*) FROM {staging} s JOIN {table} t ON {join_condition}')
+                existing = cursor.fetchone()[0]
+
+                unchanged_hashes = []
+                if hash_column:
+                    cursor.execute(
+                        f'SELECT s.{hash_column} FROM {staging} s JOIN {table} t ON {join_condition} '
+                        f'WHERE t.{hash_column} = s.{hash_column}'
+                    )
+                    unchanged_hashes = [row[0] for row in cursor.fetchall()]
+
+                # WHERE true keeps SQLite from reading ON CONFLICT as a join constraint
+                cursor.execute(
+                    f'INSERT INTO {table} ({columns}) SELECT {select_columns} '
+                    f'FROM {staging} s LEFT JOIN {table} t ON {join_condition} WHERE true '
+                    f'ON CONFLICT ({", ".join(key_columns)}) {conflict_action}'
+                )
+                cursor.execute(f'DROP TABLE {staging}')
+
+        return (len(rows) - existing, existing - len(unchanged_hashes), unchanged_hashes)
@@ -0,0 +1,129 @@
+"""
+Tests for BatchImportService and batch Excel uploads
+"""
+import os
+import shutil
+import tempfile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+import openpyxl
+from core.models import User, AttendanceRecord, ImportJob, ImportLog
+from core.services.batch_import_service import BatchImportService, prepare_file
+from core.services.import_job_service import ImportJobService
+
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'progress': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-progress'},
+}
+
+HEADER = ['EP NO', 'EP NAME', 'PUNCHDATE', 'PUNCH1 IN', 'PUNCH2 OUT', 'HOURS WORKED', 'STATUS']
+
+
+def write_workbook(path, sheets):
+    """Save a workbook with one sheet per (title, rows) pair"""
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for title, rows in sheets:
+        sheet = workbook.create_sheet(title)
+        sheet.append(HEADER)
+        for row in rows:
+            sheet.append(row)
+    workbook.save(path)
+    return path
+
+
+def punch_row(ep_no, day):
+    return [ep_no, f'Employee {ep_no}', f'2024-11-{day:02d}', '09:00', '17:00', '08:00', 'P']
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BatchImportServiceTests(TestCase):
+    """Tests for parallel preparation and single-writer import of several files"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.root_user = User.objects.create_user(username='root', password='root123', role='root')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_prepare_file_reads_every_sheet(self):
+        path = write_workbook(os.path.join(self.tmp_dir, 'plant_a.xlsx'), [
+            ('Week 1', [punch_row('PP0000000001', 1)]),
+            ('Week 2', [punch_row('PP0000000001', 8), punch_row('BAD', 8)]),
+        ])
+
+        sheets = prepare_file(path)
+
+        self.assertEqual([sheet.name for sheet in sheets], ['plant_a.xlsx [Week 1]', 'plant_a.xlsx [Week 2]'])
+        self.assertEqual([sheet.file_type for sheet in sheets], ['punchrecord', 'punchrecord'])
+        self.assertEqual(sheets[1].validation_report.invalid_rows, 1)
+
+    def test_run_imports_all_files(self):
+        paths = [
+            write_workbook(os.path.join(self.tmp_dir, 'plant_a.xlsx'), [
+                ('Week 1', [punch_row('PP0000000001', 1)]),
+                ('Week 2', [punch_row('PP0000000001', 8)]),
+            ]),
+            write_workbook(os.path.join(self.tmp_dir, 'plant_b.xlsx'), [
+                ('Sheet', [punch_row('PP0000000002', 1), punch_row('PP0000000003', 1)]),
+            ]),
+        ]
+        progress = []
+
+        results = BatchImportService(max_workers=2).run(
+            paths, self.root_user, 'batch_test', progress_callback=lambda done, total: progress.append((done, total))
+        )
+
+        self.assertEqual(sorted(result['name'] for result in results),
+                         ['plant_a.xlsx [Week 1]', 'plant_a.xlsx [Week 2]', 'plant_b.xlsx'])
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(AttendanceRecord.objects.count(), 4)
+        self.assertEqual(ImportLog.objects.count(), 3)
+        self.assertEqual(progress, [(1, 2), (2, 2)])
+
+    def test_each_sheet_error_report_can_be_downloaded(self):
+        media_override = override_settings(MEDIA_ROOT=self.tmp_dir)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        path = write_workbook(os.path.join(self.tmp_dir, 'plant_a.xlsx'), [
+            ('Week 1', [punch_row('PP0000000001', 1)]),
+            ('Week 2', [punch_row('PP0000000001', 8), punch_row('BAD', 8)]),
+        ])
+
+        results = BatchImportService(max_workers=1).run([path], self.root_user, 'batch_test')
+
+        self.assertEqual([result['has_errors'] for result in results], [False, True])
+        import_log = ImportLog.objects.get(filename='plant_a.xlsx [Week 2]')
+        self.assertEqual(import_log.error_report_path, ImportJobService().error_report_path(self.root_user.id, import_log.filename))
+
+        self.client.login(username='root', password='root123')
+        response = self.client.get(reverse('core:api_excel_errors', args=['plant_a.xlsx [Week 2]']))
+        self.assertEqual(
+            b''.join(response.streaming_content).decode().splitlines(),
+            ['Row,Column,Value,Error', '3,ep_no,BAD,Invalid EP NO: BAD']
+        )
+        missing = self.client.get(reverse('core:api_excel_errors', args=['plant_a.xlsx [Week 1]']))
+        self.assertEqual(missing.status_code, 404)
+
+    def test_batch_upload_runs_as_one_job(self):
+        media_override = override_settings(MEDIA_ROOT=self.tmp_dir)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        files = []
+        for name, ep_no in (('week1.xlsx', 'PP0000000001'), ('week2.xlsx', 'PP0000000002')):
+            path = write_workbook(os.path.join(self.tmp_dir, name), [('Sheet', [punch_row(ep_no, 1)])])
+            with open(path, 'rb') as f:
+                files.append(SimpleUploadedFile(name, f.read()))
+        self.client.login(username='root', password='root123')
+
+        response = self.client.post(reverse('core:api_excel_upload_batch'), {'files': files})
+
+        self.assertEqual(response.status_code, 202)
+        service = ImportJobService()
+        job = service.run(service.claim_next('worker'))
+        self.assertEqual((job.kind, job.status, job.result['files']), ('excel_batch', 'completed', 2))
+        self.assertEqual(job.result['imported_rows'], 2)
+        self.assertFalse(os.path.exists(ImportJob.objects.get().file_path))
@@ -0,0 +1,155 @@
+"""
+Tests for BulkUpsertService and the CSVProcessor bulk write path
+"""
+from datetime import date, time as dt_time
+from io import BytesIO
+from django.test import TestCase
+from core.models import Company, User, AttendanceRecord
+from core.services.bulk_upsert_service import BulkUpsertService
+from core.csv_processor import CSVProcessor
+
+
+class BulkUpsertServiceTests(TestCase):
+    """Tests for set-based create/update of attendance records"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='Test Company')
+        self.service = BulkUpsertService(AttendanceRecord, ('ep_no', 'date'))
+
+    def _row(self, ep_no, day, **overrides):
+        row = {
+            'ep_no': ep_no,
+            'ep_name': f'Employee {ep_no}',
+            'company': self.company,
+            'date': date(2024, 1, day),
+            'shift': 'Day',
+            'overstay': '',
+            'status': 'P',
+            'in_time': dt_time(9, 0),
+        }
+        row.update(overrides)
+        return row
+
+    def test_creates_new_rows(self):
+        created, updated = self.service.upsert([self._row('EMP001', 1), self._row('EMP002', 1)])
+
+        self.assertEqual((created, updated), (2, 0))
+        self.assertEqual(AttendanceRecord.objects.count(), 2)
+
+    def test_updates_existing_rows(self):
+        AttendanceRecord.objects.create(**self._row('EMP001', 1))
+
+        created, updated = self.service.upsert([
+            self._row('EMP001', 1, status='A', in_time=None),
+            self._row('EMP001', 2),
+        ])
+
+        self.assertEqual((created, updated), (1, 1))
+        record = AttendanceRecord.objects.get(ep_no='EMP001', date=date(2024, 1, 1))
+        self.assertEqual(record.status, 'A')
+        self.assertIsNone(record.in_time)
+
+    def test_repeated_key_in_batch_last_row_wins(self):
+        created, updated = self.service.upsert([
+            self._row('EMP001', 1, status='P'),
+            self._row('EMP001', 1, status='A'),
+        ])
+
+        self.assertEqual((created, updated), (1, 1))
+        self.assertEqual(AttendanceRecord.objects.get().status, 'A')
+
+    def test_rows_only_update_the_fields_they_carry(self):
+        AttendanceRecord.objects.create(**self._row('EMP001', 1, hours='08:00'))
+        AttendanceRecord.objects.create(**self._row('EMP002', 1, hours='07:00'))
+
+        created, updated = self.service.upsert([
+            {'ep_no': 'EMP001', 'date': date(2024, 1, 1), 'status': 'A'},
+            {'ep_no': 'EMP002', 'date': date(2024, 1, 1), 'hours': '09:00'},
+            {'ep_no': 'EMP002', 'date': date(2024, 1, 1), 'shift': 'Night'},
+        ])
+
+        self.assertEqual((created, updated), (0, 3))
+        first = AttendanceRecord.objects.get(ep_no='EMP001')
+        second = AttendanceRecord.objects.get(ep_no='EMP002')
+        self.assertEqual((first.status, first.hours), ('A', '08:00'))
+        self.assertEqual((second.status, second.hours, second.shift), ('P', '09:00', 'Night'))
+
+    def test_fetch_existing_keys_ignores_other_dates(self):
+        existing = AttendanceRecord.objects.create(**self._row('EMP001', 1))
+        AttendanceRecord.objects.create(**self._row('EMP002', 3))
+
+        keys = self.service.fetch_existing_keys([('EMP001', date(2024, 1, 1)), ('EMP002', date(2024, 1, 2))])
+
+        self.assertEqual(keys, {('EMP001', date(2024, 1, 1)): existing.pk})
+
+    def test_hash_field_skips_unchanged_rows(self):
+        service = BulkUpsertService(AttendanceRecord, ('ep_no', 'date'), hash_field='row_hash')
+        service.upsert([self._row('EMP001', 1), self._row('EMP002', 1)])
+        before = {r.ep_no: r.updated_at for r in AttendanceRecord.objects.all()}
+
+        created, updated = service.upsert([self._row('EMP001', 1), self._row('EMP002', 1, status='A')])
+
+        self.assertEqual((created, updated), (0, 1))
+        records = {r.ep_no: r for r in AttendanceRecord.objects.all()}
+        self.assertEqual(records['EMP001'].updated_at, before['EMP001'])
+        self.assertGreater(records['EMP002'].updated_at, before['EMP002'])
+        self.assertEqual(records['EMP002'].status, 'A')
+
+    def test_manual_save_clears_row_hash(self):
+        service = BulkUpsertService(AttendanceRecord, ('ep_no', 'date'), hash_field='row_hash')
+        service.upsert([self._row('EMP001', 1)])
+        record = AttendanceRecord.objects.get()
+        self.assertTrue(record.row_hash)
+
+        record.status = 'A'
+        record.save(update_fields=['status'])
+
+        self.assertEqual(service.upsert([self._row('EMP001', 1)]), (0, 1))
+        self.assertEqual(AttendanceRecord.objects.get().status, 'P')
+
+
+class CSVProcessorBulkWriteTests(TestCase):
+    """Tests for created/updated counts reported by process_csv"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='Test Company')
+        self.root_user = User.objects.create_user(username='root', password='root123', role='root')
+
+    def _upload(self, content):
+        csv_file = BytesIO(content.encode('utf-8'))
+        csv_file.name = 'test.csv'
+        return CSVProcessor().process_csv(csv_file, self.root_user)
+
+    def test_process_csv_reports_created_and_updated(self):
+        AttendanceRecord.objects.create(
+            ep_no='EMP001', ep_name='John Doe', company=self.company,
+            date=date(2024, 11, 1), status='A'
+        )
+
+        result = self._upload(
+            "EP NO,EP NAME,COMPANY NAME,DATE,SHIFT,STATUS,IN,OUT\n"
+            "EMP001,John Doe,Test Company,2024-11-01,Day,P,09:00,17:00\n"
+            "EMP002,Jane Smith,Test Company,2024-11-01,Day,P,09:00,17:00\n"
+            "EMP003,Bad Row,Test Company,not-a-date,Day,P,09:00,17:00\n"
+        )
+
+        self.assertEqual(result['success_count'], 1)
+        self.assertEqual(result['updated_count'], 1)
+        self.assertEqual(result['error_count'], 1)
+        self.assertEqual(AttendanceRecord.objects.count(), 2)
+        self.assertEqual(AttendanceRecord.objects.get(ep_no='EMP001').status, 'P')
+
+    def test_reupload_leaves_unchanged_rows_alone(self):
+        content = (
+            "EP NO,EP NAME,COMPANY NAME,DATE,SHIFT,STATUS,IN,OUT\n"
+            "EMP001,John Doe,Test Company,2024-11-01,Day,P,09:00,17:00\n"
+            "EMP002,Jane Smith,Test Company,2024-11-01,Day,P,09:00,17:00\n"
+        )
+        self._upload(content)
+
+        result = self._upload(content.replace('EMP002,Jane Smith,Test Company,2024-11-01,Day,P', 'EMP002,Jane Smith,Test Company,2024-11-01,Day,A'))
+
+        self.assertEqual(
+            (result['success_count'], result['updated_count'], result['unchanged_count']), (0, 1, 1)
+        )
+        self.assertEqual(AttendanceRecord.objects.get(ep_no='EMP002').status, 'A')
@@ -0,0 +1,152 @@
+"""
+Tests for resuming interrupted imports from an ImportCheckpoint
+"""
+from io import BytesIO
+from unittest import mock
+import pandas as pd
+from django.test import TestCase
+from core.csv_processor import CSVProcessor
+from core.models import Company, User, AttendanceRecord, ImportCheckpoint, ImportLog
+from core.services.bulk_upsert_service import BulkUpsertService
+from core.services.checkpoint_service import CheckpointService
+from core.services.staging_merge_service import StagingMergeService
+from core.services.data_importer_service import DataImporterService
+from core.services.file_parser_service import FileType
+
+
+class CheckpointResumeTests(TestCase):
+    """Tests for checkpointed CSV and Excel imports"""
+
+    def setUp(self):
+        Company.objects.create(name='Test Company')
+        self.root_user = User.objects.create_user(username='root', password='root123', role='root')
+        self.checkpoints = CheckpointService()
+        lines = ["EP NO,EP NAME,COMPANY NAME,DATE,SHIFT,STATUS,IN,OUT"]
+        for i in range(1, 8):
+            lines.append(f"EMP{i:03d},Employee {i},Test Company,2024-11-0{i},Day,P,09:00,17:00")
+        lines.append("EMP099,Bad Row,Test Company,not-a-date,Day,P,09:00,17:00")
+        self.content = ("\n".join(lines) + "\n").encode('utf-8')
+
+    def _upload(self, checkpoint):
+        processor = CSVProcessor(streaming=False)
+        processor.CHUNK_SIZE = 3
+        csv_file = BytesIO(self.content)
+        csv_file.name = 'test.csv'
+        return processor.process_csv(csv_file, self.root_user, checkpoint=checkpoint)
+
+    def test_csv_import_resumes_after_crash(self):
+        checkpoint = self.checkpoints.load(self.root_user, 'attendance', 'a' * 64)
+        original = CSVProcessor.process_dataframe_columnar
+        calls = []
+
+        def crash_on_second_chunk(processor, *args, **kwargs):
+            calls.append(1)
+            if len(calls) == 2:
+                raise SystemExit('worker killed')
+            return original(processor, *args, **kwargs)
+
+        with mock.patch.object(CSVProcessor, 'process_dataframe_columnar', crash_on_second_chunk):
+            with self.assertRaises(SystemExit):
+                self._upload(checkpoint)
+
+        checkpoint = self.checkpoints.load(self.root_user, 'attendance', 'a' * 64)
+        self.assertEqual((checkpoint.row_offset, checkpoint.success_count), (3, 3))
+        self.assertEqual(AttendanceRecord.objects.count(), 3)
+
+        result = self._upload(checkpoint)
+
+        self.assertEqual((result['success_count'], result['updated_count'], result['error_count']), (7, 0, 1))
+        self.assertIn('Row 9', result['errors'][0])
+        self.assertEqual(result['total_rows'], 8)
+        self.assertEqual(AttendanceRecord.objects.count(), 7)
+
+    def test_csv_import_retries_failed_chunk_on_resume(self):
+        self._upload(None)
+        AttendanceRecord.objects.filter(ep_no__in=['EMP004', 'EMP005', 'EMP006']).delete()
+        checkpoint = self.checkpoints.load(self.root_user, 'attendance', 'd' * 64)
+        upsert = StagingMergeService.upsert
+        calls = []
+
+        def fail_second_chunk(upsert_service, records):
+            calls.append(records)
+            if len(calls) == 2:
+                raise RuntimeError('database is locked')
+            return upsert(upsert_service, records)
+
+        with mock.patch.object(StagingMergeService, 'upsert', fail_second_chunk):
+            result = self._upload(checkpoint)
+
+        self.assertEqual((result['success_count'], result['unchanged_count'], result['error_count']), (0, 4, 4))
+        self.assertIn('Rows 5-7: database is locked', result['errors'])
+        checkpoint.refresh_from_db()
+        self.assertEqual((checkpoint.row_offset, checkpoint.unchanged_count, checkpoint.failed_ranges), (8, 4, [[3, 6]]))
+        self.assertEqual(AttendanceRecord.objects.count(), 4)
+
+        with mock.patch.object(StagingMergeService, 'upsert', fail_second_chunk):
+            result = self._upload(checkpoint)
+
+        # Only the failed chunk is written again
+        self.assertEqual([record['ep_no'] for record in calls[-1]], ['EMP004', 'EMP005', 'EMP006'])
+        self.assertEqual(len(calls), 4)
+        self.assertEqual((result['success_count'], result['unchanged_count'], result['error_count']), (3, 4, 1))
+        self.assertEqual(result['total_rows'], 8)
+        self.assertEqual(AttendanceRecord.objects.count(), 7)
+        checkpoint.refresh_from_db()
+        self.assertEqual(checkpoint.failed_ranges, [])
+
+    def test_excel_import_skips_committed_rows(self):
+        service = DataImporterService()
+        service.BATCH_SIZE = 2
+        df = pd.DataFrame(
+            [[f'EMP00{i}', f'Employee {i}', 'Test Company', '2024-11-01', 'Day', 'P'] for i in range(1, 5)],
+            columns=['EP NO', 'EP NAME', 'COMPANY NAME', 'DATE', 'SHIFT', 'STATUS']
+        )
+        checkpoint = self.checkpoints.load(self.root_user, 'excel', 'b' * 64)
+        self.checkpoints.advance(checkpoint, 2, success_count=2)
+
+        imported, duplicates = service.import_attendance_records(df, self.root_user, checkpoint=checkpoint)
+
+        self.assertEqual((imported, duplicates), (4, 0))
+        self.assertEqual(set(AttendanceRecord.objects.values_list('ep_no', flat=True)), {'EMP003', 'EMP004'})
+        checkpoint.refresh_from_db()
+        self.assertEqual((checkpoint.row_offset, checkpoint.success_count), (4, 4))
+
+        self.checkpoints.clear(checkpoint)
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_excel_import_retries_failed_chunk_on_resume(self):
+        service = DataImporterService()
+        service.BATCH_SIZE = 2
+        df = pd.DataFrame(
+            [[f'EMP00{i}', f'Employee {i}', 'Test Company', '2024-11-01', 'Day', 'P'] for i in range(1, 7)],
+            columns=['EP NO', 'EP NAME', 'COMPANY NAME', 'DATE', 'SHIFT', 'STATUS']
+        )
+        checkpoint = self.checkpoints.load(self.root_user, 'excel', 'c' * 64)
+        upsert = BulkUpsertService.upsert
+        calls = []
+
+        def fail_second_chunk(upsert_service, records):
+            calls.append(records)
+            if len(calls) == 2:
+                raise RuntimeError('database is locked')
+            return upsert(upsert_service, records)
+
+        with mock.patch.object(BulkUpsertService, 'upsert', fail_second_chunk):
+            result = service.import_batch(df, FileType.ARC_SUMMARY, self.root_user, 'test.xlsx', checkpoint=checkpoint)
+
+        self.assertFalse(result.success)
+        self.assertIn('Rows 3-4', result.error_message)
+        self.assertEqual(ImportLog.objects.get(id=result.import_log_id).status, 'failed')
+        checkpoint.refresh_from_db()
+        self.assertEqual((checkpoint.row_offset, checkpoint.success_count, checkpoint.failed_ranges), (6, 4, [[2, 4]]))
+
+        with mock.patch.object(BulkUpsertService, 'upsert', fail_second_chunk):
+            result = service.import_batch(df, FileType.ARC_SUMMARY, self.root_user, 'test.xlsx', checkpoint=checkpoint)
+
+        # Only the failed chunk is written again
+        self.assertTrue(result.success)
+        self.assertEqual([record['ep_no'] for record in calls[-1]], ['EMP003', 'EMP004'])
+        self.assertEqual(len(calls), 4)
+        self.assertEqual((result.imported_rows, AttendanceRecord.objects.count()), (6, 6))
+        checkpoint.refresh_from_db()
+        self.assertEqual((checkpoint.row_offset, checkpoint.success_count, checkpoint.failed_ranges), (6, 6, []))
@@ -0,0 +1,93 @@
+"""
+Tests for ChunkedReaderService
+"""
+from io import BytesIO
+from django.test import TestCase
+import openpyxl
+import pandas as pd
+from core.models import Company, User, AttendanceRecord
+from core.services.chunked_reader_service import ChunkedReaderService
+from core.csv_processor import CSVProcessor
+
+
+def make_xlsx(rows, name='test.xlsx'):
+    """Build an in-memory XLSX upload from a list of row tuples"""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for row in rows:
+        sheet.append(row)
+    buffer = BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    buffer.name = name
+    return buffer
+
+
+class ChunkedReaderServiceTests(TestCase):
+    """Tests for chunked CSV and XLSX reading"""
+
+    def setUp(self):
+        self.reader = ChunkedReaderService()
+
+    def test_csv_chunks_and_row_count(self):
+        csv_file = BytesIO(b" A ,B\n1,x\n2,y\n3,z")
+        csv_file.name = 'test.csv'
+
+        chunks = list(self.reader.iter_chunks(csv_file, chunk_size=2))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+        self.assertEqual(chunks[0].columns.tolist(), ['A', 'B'])
+        self.assertEqual(self.reader.count_rows(csv_file), 3)
+
+    def test_xlsx_chunks_match_read_excel(self):
+        rows = [(' EP NO', 'HOURS', None)] + [(f'EMP{i:03d}', i, None) for i in range(5)]
+        rows.insert(3, (None, None, None))
+        xlsx_file = make_xlsx(rows + [(None, None, None)])
+
+        chunks = list(self.reader.iter_chunks(xlsx_file, chunk_size=2))
+        expected = pd.read_excel(BytesIO(xlsx_file.getvalue()), engine='openpyxl')
+        expected.columns = expected.columns.str.strip()
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 2])
+        combined = pd.concat(chunks, ignore_index=True)
+        self.assertEqual(combined.columns.tolist(), ['EP NO', 'HOURS'])
+        self.assertEqual(combined['EP NO'].tolist()[:3], expected['EP NO'].tolist()[:2] + [None])
+        self.assertEqual(combined['HOURS'].dropna().tolist(), expected['HOURS'].dropna().tolist())
+        self.assertEqual(self.reader.count_rows(xlsx_file), 7)
+
+    def test_html_export_chunks(self):
+        html = (
+            '<html><body><table><thead><tr><th> EP NO</th><th>NAME</th><th>HOURS</th></tr></thead><tbody>'
+            '<tr><td>PP001</td><td>Jos\u00e9\n   A</td><td>1,234</td></tr>'
+            '<tr><td colspan="2">PP002</td><td><table><tr><td>5</td></tr></table></td></tr>'
+            '<tr><td>PP003</td><td>C</td><td>7</td></tr>'
+            '</tbody></table><table><tr><td>Totals</td></tr><tr><td>3</td></tr></table></body></html>'
+        ).encode('utf-8')
+        html_file = BytesIO(html)
+        html_file.name = 'export.xls'
+
+        chunks = list(self.reader.iter_chunks(html_file, chunk_size=2))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+        combined = pd.concat(chunks, ignore_index=True)
+        self.assertEqual(combined.columns.tolist(), ['EP NO', 'NAME', 'HOURS'])
+        self.assertEqual(combined.values.tolist(), [['PP001', 'Jos\u00e9 A', 1234], ['PP002', 'PP002', 5], ['PP003', 'C', 7]])
+        tables = [(number, pd.concat(chunks).values.tolist()) for number, chunks in self.reader.iter_html_tables(html_file)]
+        self.assertEqual(tables[1], (2, [[3]]))
+        self.assertGreaterEqual(self.reader.count_rows(html_file), 3)
+
+    def test_streamed_xlsx_upload(self):
+        Company.objects.create(name='Test Company')
+        root_user = User.objects.create_user(username='root', password='root123', role='root')
+        xlsx_file = make_xlsx(
+            [('EP NO', 'EP NAME', 'COMPANY NAME', 'DATE', 'SHIFT', 'STATUS', 'IN', 'OUT')]
+            + [(f'EMP{i:03d}', f'Employee {i}', 'Test Company', f'2024-11-0{i}', 'Day', 'P', '09:00', '17:00')
+               for i in range(1, 6)]
+        )
+        processor = CSVProcessor(streaming=True)
+        processor.CHUNK_SIZE = 2
+
+        result = processor.process_csv(xlsx_file, root_user)
+
+        self.assertEqual((result['success_count'], result['error_count'], result['total_rows']), (5, 0, 5))
+        self.assertEqual(AttendanceRecord.objects.count(), 5)
@@ -0,0 +1,143 @@
+"""
+Tests for ChunkedUploadService and the chunked upload API
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.urls import reverse
+import openpyxl
+from core.models import Company, User, AttendanceRecord, ChunkedUpload, ImportJob
+from core.services.chunked_upload_service import ChunkedUploadService
+from core.services.import_job_service import ImportJobService
+from core.tests.test_import_job_service import LOCMEM_CACHES
+
+
+@mock.patch.object(ChunkedUploadService, 'CHUNK_SIZE', 1024)
+class ChunkedUploadTests(TestCase):
+    """Tests for uploading a workbook in resumable chunks"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.tmp_dir, CACHES=LOCMEM_CACHES)
+        self.settings_override.enable()
+        Company.objects.create(name='Test Company')
+        User.objects.create_user(username='root', password='root123', role='root')
+        self.client.login(username='root', password='root123')
+
+        workbook = openpyxl.Workbook()
+        workbook.active.append(['EP NO', 'EP NAME', 'PUNCHDATE', 'PUNCH1 IN', 'PUNCH2 OUT', 'HOURS WORKED', 'STATUS'])
+        for i in range(1, 21):
+            workbook.active.append([f'PP{i:010d}', f'Employee {i}', '2024-11-01', '09:00', '17:00', '08:00', 'P'])
+        buffer = BytesIO()
+        workbook.save(buffer)
+        self.content = buffer.getvalue()
+        self.chunks = [self.content[i:i + 1024] for i in range(0, len(self.content), 1024)]
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _start(self):
+        response = self.client.post(
+            reverse('core:api_excel_chunked_start'),
+            json.dumps({'filename': 'big.xlsx', 'size': len(self.content)}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()['upload']['upload_id']
+
+    def _put(self, upload_id, index, data=None):
+        return self.client.put(
+            reverse('core:api_excel_chunked_part', args=[upload_id, index]),
+            self.chunks[index] if data is None else data,
+            content_type='application/octet-stream'
+        )
+
+    def _finalize(self, upload_id, sha256=''):
+        return self.client.post(
+            reverse('core:api_excel_chunked_finalize', args=[upload_id]),
+            json.dumps({'sha256': sha256}),
+            content_type='application/json'
+        )
+
+    def test_upload_resumes_and_queues_import(self):
+        self.assertGreater(len(self.chunks), 3)
+        upload_id = self._start()
+
+        self.assertEqual(self._put(upload_id, 0).status_code, 200)
+        response = self._put(upload_id, 2)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['upload']['next_chunk'], 1)
+
+        # Later chunks land on another worker, without the running hash
+        ChunkedUploadService._hashers.clear()
+        status = self.client.get(reverse('core:api_excel_chunked', args=[upload_id])).json()['upload']
+        for index in range(status['next_chunk'], len(self.chunks)):
+            self.assertEqual(self._put(upload_id, index).status_code, 200)
+        # A retried chunk is acknowledged without being written twice
+        self.assertEqual(self._put(upload_id, 1).status_code, 200)
+
+        sha256 = hashlib.sha256(self.content).hexdigest()
+        response = self._finalize(upload_id, sha256)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['file_hash'], sha256)
+        job = ImportJob.objects.get(id=response.json()['job_id'])
+        with open(job.file_path, 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertEqual(ChunkedUpload.objects.get(upload_id=upload_id).status, 'complete')
+
+        service = ImportJobService()
+        job = service.run(service.claim_next('worker'))
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(AttendanceRecord.objects.count(), 20)
+
+    def test_running_hash_matches_file(self):
+        upload_id = self._start()
+        for index in range(len(self.chunks)):
+            self._put(upload_id, index)
+
+        response = self._finalize(upload_id)
+
+        self.assertEqual(response.json()['file_hash'], hashlib.sha256(self.content).hexdigest())
+
+    def test_racing_chunk_is_checked_against_stored_offset(self):
+        service = ChunkedUploadService()
+        upload_id = self._start()
+        # Loaded by a second request before the first one appended chunk 0
+        stale = ChunkedUpload.objects.get(upload_id=upload_id)
+        service.append_chunk(ChunkedUpload.objects.get(upload_id=upload_id), 0, BytesIO(self.chunks[0]))
+
+        upload = service.append_chunk(stale, 0, BytesIO(b'x' * len(self.chunks[0])))
+
+        self.assertEqual(upload.received_bytes, len(self.chunks[0]))
+        with open(service.partial_path(upload), 'rb') as f:
+            self.assertEqual(f.read(), self.chunks[0])
+        self.assertEqual(ChunkedUploadService._hashers[upload_id][0], len(self.chunks[0]))
+
+    def test_incomplete_or_corrupt_upload_is_rejected(self):
+        upload_id = self._start()
+        self.assertEqual(self._put(upload_id, 0, data=self.chunks[0][:10]).status_code, 400)
+        self.assertEqual(self._finalize(upload_id).status_code, 409)
+
+        for index in range(len(self.chunks)):
+            self._put(upload_id, index)
+        response = self._finalize(upload_id, sha256='0' * 64)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ImportJob.objects.exists())
+        self.assertEqual(os.path.getsize(ChunkedUploadService().partial_path(ChunkedUpload.objects.get())), len(self.content))
+
+    def test_other_users_cannot_see_upload(self):
+        upload_id = self._start()
+        User.objects.create_user(username='other', password='other123', role='admin')
+        self.client.login(username='other', password='other123')
+
+        response = self.client.get(reverse('core:api_excel_chunked', args=[upload_id]))
+
+        self.assertEqual(response.status_code, 404)
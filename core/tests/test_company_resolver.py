@@ -0,0 +1,39 @@
+"""
+Tests for CompanyResolver
+"""
+from datetime import date
+from django.test import TestCase
+from core.models import Company, AttendanceRecord
+from core.services.company_resolver import CompanyResolver
+
+
+class CompanyResolverTests(TestCase):
+    """Tests for per-upload company resolution"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='Existing Co')
+        self.resolver = CompanyResolver()
+
+    def test_prefetch_names_creates_missing_companies(self):
+        companies = self.resolver.prefetch_names(['Existing Co', 'New Co', 'New Co'])
+
+        self.assertEqual(companies['Existing Co'], self.company)
+        self.assertEqual(companies['New Co'].name, 'New Co')
+        self.assertEqual(Company.objects.count(), 2)
+
+    def test_company_for_name_uses_cache(self):
+        self.resolver.prefetch_names(['Existing Co'])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.resolver.company_for_name('Existing Co'), self.company)
+
+    def test_prefetch_ep_numbers_prefers_latest_record(self):
+        other = Company.objects.create(name='Other Co')
+        AttendanceRecord.objects.create(ep_no='EMP001', ep_name='A', company=self.company, date=date(2024, 1, 1))
+        AttendanceRecord.objects.create(ep_no='EMP001', ep_name='A', company=other, date=date(2024, 2, 1))
+
+        companies = self.resolver.prefetch_ep_numbers(['EMP001', 'EMP404'])
+
+        self.assertEqual(companies, {'EMP001': other})
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.resolver.company_for_ep_no('EMP404'))
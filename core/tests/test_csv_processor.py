@@ -0,0 +1,145 @@
+"""
+Tests for CSVProcessor columnar validation and chunked ingestion
+"""
+from datetime import date, time as dt_time, timedelta
+from io import BytesIO
+from django.test import TestCase
+import pandas as pd
+from core.models import Company, User, AttendanceRecord
+from core.csv_processor import CSVProcessor
+
+
+class CSVProcessorColumnarValidationTests(TestCase):
+    """Columnar validation must agree with row-by-row process_row"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='Test Company')
+        self.root_user = User.objects.create_user(username='root', password='root123', role='root')
+        self.admin_user = User.objects.create_user(
+            username='admin', password='admin123', role='admin', company=self.company
+        )
+        self.processor = CSVProcessor()
+        future = (date.today() + timedelta(days=3)).strftime('%Y-%m-%d')
+        self.df = pd.DataFrame({
+            'EP NO': ['EMP001', 'EMP002', 'EMP003', 'EMP004', None, 'EMP006', 'EMP007'],
+            'EP NAME': ['A', 'B', 'C', 'D', 'E', 'F', 'G'],
+            'COMPANY NAME': ['Test Company', 'Test Company', 'Other Co', 'Test Company', 'Test Company', 'Test Company', 'Test Company'],
+            'DATE': ['2024-11-01', '21-11-2024', '2024/11/03', future, '2024-11-05', 'bad', '2024-11-07'],
+            'SHIFT': ['Day'] * 7,
+            'STATUS': ['P', 'A', 'P', 'P', 'P', 'X', 'P'],
+            'IN': ['09:00', '25:30', '06:04:00 (N)', '09:00', '09:00', '09:00', '9:75'],
+            'OUT': ['17:00', '0', None, '17:00', '17:00', '17:00', '17:00'],
+            'HOURS': ['08:00', '30:15', None, None, None, None, None],
+        })
+
+    def _row_wise(self, user):
+        results = {}
+        for row_number, row in enumerate(self.df.to_dict('records'), start=2):
+            results[row_number] = self.processor.process_row(row, row_number, user)
+        return results
+
+    def test_matches_process_row_for_root(self):
+        error_mask, row_errors, records = self.processor.validate_dataframe(self.df, self.root_user)
+        expected = self._row_wise(self.root_user)
+
+        expected_errors = {n: r[1] for n, r in expected.items() if not r[0]}
+        expected_records = [r[2] for r in expected.values() if r[0]]
+
+        self.assertEqual(row_errors, expected_errors)
+        self.assertEqual(error_mask.tolist(), [not r[0] for r in expected.values()])
+        self.assertEqual(records, expected_records)
+
+    def test_admin_company_mismatch_is_rejected(self):
+        error_mask, row_errors, records = self.processor.validate_dataframe(self.df, self.admin_user)
+        expected = self._row_wise(self.admin_user)
+
+        self.assertEqual(row_errors, {n: r[1] for n, r in expected.items() if not r[0]})
+        self.assertIn('Access Denied', row_errors[4])
+        self.assertNotIn('Other Co', [r['company'].name for r in records])
+
+    def test_parse_time_column(self):
+        parsed = self.processor.parse_time_column(pd.Series(['25:30', '06:04:00 (N)', '0', None, '9:75']))
+
+        self.assertEqual(parsed['valid'].tolist(), [True, True, False, False, False])
+        self.assertEqual(parsed['empty'].tolist(), [False, False, True, True, False])
+        self.assertEqual(parsed.loc[0, ['hours', 'minutes']].tolist(), [1, 30])
+
+    def test_parsed_values(self):
+        _, _, records = self.processor.validate_dataframe(self.df, self.root_user)
+
+        self.assertEqual(records[1]['date'], date(2024, 11, 21))
+        self.assertEqual(records[1]['in_time'], dt_time(1, 30))
+        self.assertIsNone(records[1]['out_time'])
+        self.assertEqual(records[1]['hours'], '06:15')
+
+
+class CSVProcessorStreamingTests(TestCase):
+    """Chunked CSV ingestion must match whole-file processing"""
+
+    def setUp(self):
+        Company.objects.create(name='Test Company')
+        self.root_user = User.objects.create_user(username='root', password='root123', role='root')
+        lines = ["EP NO,EP NAME,COMPANY NAME,DATE,SHIFT,STATUS,IN,OUT"]
+        for i in range(1, 8):
+            lines.append(f"EMP{i:03d},Employee {i},Test Company,2024-11-0{i},Day,P,09:00,17:00")
+        lines.append("EMP099,Bad Row,Test Company,not-a-date,Day,P,09:00,17:00")
+        self.content = ("\n".join(lines) + "\n").encode('utf-8')
+
+    def _upload(self, processor):
+        csv_file = BytesIO(self.content)
+        csv_file.name = 'test.csv'
+        return processor.process_csv(csv_file, self.root_user)
+
+    def test_streamed_upload_matches_whole_file(self):
+        processor = CSVProcessor(streaming=True)
+        processor.CHUNK_SIZE = 3
+        streamed = self._upload(processor)
+
+        self.assertEqual(streamed['success_count'], 7)
+        self.assertEqual(streamed['error_count'], 1)
+        self.assertEqual(streamed['total_rows'], 8)
+        self.assertIn('Row 9', streamed['errors'][0])
+        self.assertEqual(AttendanceRecord.objects.count(), 7)
+
+        whole = self._upload(CSVProcessor(streaming=False))
+        # Same rows, so the content hashes match and nothing is rewritten
+        self.assertEqual(
+            (whole['success_count'], whole['updated_count'], whole['unchanged_count'], whole['error_count']),
+            (0, 0, 7, 1)
+        )
+        self.assertEqual(whole['errors'], streamed['errors'])
+
+    def test_row_wise_streaming_offsets_row_numbers(self):
+        processor = CSVProcessor(columnar_validation=False, streaming=True)
+        processor.CHUNK_SIZE = 3
+        result = self._upload(processor)
+
+        self.assertEqual(result['success_count'], 7)
+        self.assertIn('Row 9', result['errors'][0])
+
+    def test_small_uploads_are_not_streamed(self):
+        csv_file = BytesIO(self.content)
+        csv_file.name = 'test.csv'
+        csv_file.size = len(self.content)
+
+        self.assertFalse(CSVProcessor().should_stream(csv_file))
+
+    def test_upload_is_parsed_once(self):
+        processor = CSVProcessor()
+        calls = []
+        read_file_to_dataframe = processor.read_file_to_dataframe
+        processor.read_file_to_dataframe = lambda file: calls.append(file) or read_file_to_dataframe(file)
+
+        result = self._upload(processor)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(result['success_count'], 7)
+
+    def test_missing_headers_rejected_from_first_chunk(self):
+        csv_file = BytesIO(b"EP NO,DATE\nEMP001,2024-11-01\n")
+        csv_file.name = 'test.csv'
+
+        result = CSVProcessor(streaming=True).process_csv(csv_file, self.root_user)
+
+        self.assertFalse(result['success'])
+        self.assertIn('Missing required fields', result['errors'][0])
@@ -0,0 +1,143 @@
+"""
+Tests for DataImporterService
+"""
+from datetime import date, time as dt_time
+from django.test import TestCase, override_settings
+import pandas as pd
+from core.models import Company, User, AttendanceRecord, ImportLog, Contractor, Employee, DailySummary, PunchRecord
+from core.services.data_importer_service import DataImporterService
+from core.services.file_parser_service import FileType
+
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'progress': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-progress'},
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ImportAttendanceRecordsTests(TestCase):
+    """Tests for the chunked bulk import of attendance rows"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='Test Company')
+        self.root_user = User.objects.create_user(username='root', password='root123', role='root')
+        self.service = DataImporterService()
+
+    def _frame(self, rows):
+        return pd.DataFrame(rows, columns=['EP NO', 'EP NAME', 'COMPANY NAME', 'DATE', 'SHIFT', 'STATUS', 'IN', 'HOURS'])
+
+    def test_creates_and_updates_records(self):
+        AttendanceRecord.objects.create(
+            ep_no='EMP001', ep_name='John Doe', company=self.company,
+            date=date(2024, 11, 1), status='A', hours='04:00'
+        )
+        df = self._frame([
+            ['EMP001', 'John Doe', 'Test Company', '2024-11-01', 'Day', 'P', '09:00', None],
+            ['EMP002', 'Jane Smith', 'New Company', '2024-11-01', 'Day', 'P', '09:30', '08:00'],
+            ['EMP003', 'Bad Row', 'Test Company', 'not-a-date', 'Day', 'P', '09:00', None],
+            [None, 'No Number', 'Test Company', '2024-11-01', 'Day', 'P', '09:00', None],
+        ])
+
+        imported, duplicates = self.service.import_attendance_records(df, self.root_user, session_id='test.xlsx')
+
+        self.assertEqual((imported, duplicates), (1, 1))
+        first = AttendanceRecord.objects.get(ep_no='EMP001')
+        self.assertEqual((first.status, first.in_time, first.hours), ('P', dt_time(9, 0), '04:00'))
+        second = AttendanceRecord.objects.get(ep_no='EMP002')
+        self.assertEqual((second.company.name, second.cont_code, second.hours), ('New Company', 'New Company', '08:00'))
+        self.assertEqual(self.service.get_progress('test.xlsx')['processed_rows'], 4)
+
+    def test_repeated_rows_across_chunks(self):
+        self.service.BATCH_SIZE = 2
+        df = self._frame([
+            ['EMP001', 'John Doe', 'Test Company', '2024-11-01', 'Day', 'A', None, None],
+            ['EMP002', 'Jane Smith', 'Test Company', '2024-11-01', 'Day', 'P', None, None],
+            ['EMP001', 'John Doe', 'Test Company', '2024-11-01', 'Night', 'P', '21:00', None],
+        ])
+
+        imported, duplicates = self.service.import_attendance_records(df, self.root_user)
+
+        self.assertEqual((imported, duplicates), (2, 1))
+        record = AttendanceRecord.objects.get(ep_no='EMP001')
+        self.assertEqual((record.shift, record.status, record.in_time), ('Night', 'P', dt_time(21, 0)))
+
+    def test_blank_company_is_imported_as_unknown(self):
+        df = self._frame([
+            ['EMP001', 'John Doe', '   ', '2024-11-01', 'Day', 'P', None, None],
+            ['EMP002', 'Jane Smith', 'Test Company', '2024-11-01', 'Day', 'P', None, None],
+            ['EMP003', 'Bob Jones', None, '2024-11-01', 'Day', 'P', None, None],
+        ])
+
+        result = self.service.import_batch(df, FileType.ARC_SUMMARY, self.root_user, 'test.xlsx')
+
+        self.assertTrue(result.success)
+        self.assertEqual(
+            list(AttendanceRecord.objects.order_by('ep_no').values_list('ep_no', 'company__name')),
+            [('EMP001', 'Unknown'), ('EMP002', 'Test Company'), ('EMP003', 'Unknown')]
+        )
+
+    def test_admin_only_imports_own_company(self):
+        admin = User.objects.create_user(username='admin', password='admin123', role='admin', company=self.company)
+        df = self._frame([
+            ['EMP001', 'John Doe', 'Test Company', '2024-11-01', 'Day', 'P', None, None],
+            ['EMP002', 'Jane Smith', 'Other Company', '2024-11-01', 'Day', 'P', None, None],
+        ])
+
+        imported, duplicates = self.service.import_attendance_records(df, admin)
+
+        self.assertEqual((imported, duplicates), (1, 0))
+        self.assertEqual(list(AttendanceRecord.objects.values_list('ep_no', flat=True)), ['EMP001'])
+        self.assertFalse(Company.objects.filter(name='Other Company').exists())
+
+    def test_import_batch_logs_result(self):
+        df = self._frame([
+            ['EMP001', 'John Doe', 'Test Company', '2024-11-01', 'Day', 'P', None, None],
+        ])
+
+        result = self.service.import_batch(df, FileType.ARC_SUMMARY, self.root_user, 'test.xlsx')
+
+        self.assertTrue(result.success)
+        import_log = ImportLog.objects.get(id=result.import_log_id)
+        self.assertEqual((import_log.status, import_log.imported_rows), ('completed', 1))
+
+
+class ImportEmployeeRecordsTests(TestCase):
+    """Tests for the bulk loader shared by the Employee-keyed importers"""
+
+    def setUp(self):
+        contractor = Contractor.objects.create(contractor_code=1, contractor_name='Test Contractor')
+        for ep_no in ('EMP001', 'EMP002', 'EMP003'):
+            Employee.objects.create(ep_no=ep_no, ep_name=f'Employee {ep_no}', contractor=contractor)
+        self.service = DataImporterService()
+
+    def test_skips_existing_repeated_and_unknown_keys(self):
+        DailySummary.objects.create(employee_id='EMP001', punchdate=date(2024, 11, 1), mandays=1, ot=0)
+        df = pd.DataFrame({
+            'ep_no': ['EMP001', 'EMP002', 'EMP002', 'EMP003', 'EMP999', None],
+            'punchdate': pd.to_datetime(['2024-11-01'] * 6),
+            'mandays': [1, 0.5, 1, None, 1, 1],
+            'ot': [0, 2, 0, 0, 0, 0],
+        })
+
+        imported, duplicates = self.service.import_daily_summaries(df)
+
+        self.assertEqual((imported, duplicates), (2, 2))
+        self.assertEqual(DailySummary.objects.count(), 3)
+        self.assertEqual(float(DailySummary.objects.get(employee_id='EMP002').mandays), 0.5)
+        self.assertEqual(float(DailySummary.objects.get(employee_id='EMP003').mandays), 0)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.service.BATCH_SIZE = 100
+        df = pd.DataFrame({
+            'ep_no': ['EMP001', 'EMP002', 'EMP003'] * 15,
+            'punchdate': [f'2024-11-{day:02d}' for day in range(1, 16) for _ in range(3)],
+            'status': ['P'] * 45,
+        })
+
+        # Employees, existing keys, bulk insert
+        with self.assertNumQueries(3):
+            imported, duplicates = self.service.import_punch_records(df)
+
+        self.assertEqual((imported, duplicates), (45, 0))
+        self.assertEqual(PunchRecord.objects.filter(shift='').count(), 45)
@@ -0,0 +1,68 @@
+"""
+Tests for DataValidatorService
+"""
+from datetime import date
+from django.test import TestCase
+import pandas as pd
+from core.models import Contractor, Employee, PunchRecord, OvertimeRequest
+from core.services.data_validator_service import DataValidatorService
+
+
+class DetectDuplicatesTests(TestCase):
+    """Tests for in-file and stored duplicate detection"""
+
+    def setUp(self):
+        contractor = Contractor.objects.create(contractor_code=1, contractor_name='Test Contractor')
+        for ep_no in ('PP0000000001', 'PP0000000002', 'PP0000000003'):
+            Employee.objects.create(ep_no=ep_no, ep_name=f'Employee {ep_no}', contractor=contractor)
+        PunchRecord.objects.create(employee_id='PP0000000001', punchdate=date(2024, 11, 1), status='P')
+        OvertimeRequest.objects.create(employee_id='PP0000000002', punchdate=date(2024, 11, 2))
+        self.service = DataValidatorService()
+
+    def test_marks_in_file_and_stored_duplicates(self):
+        df = pd.DataFrame({
+            'EP NO': ['PP0000000001', 'PP0000000002', 'PP0000000003', 'PP0000000003', 'PP0000000002', None],
+            'PUNCHDATE': ['01/11/2024', '2024-11-02', '03/11/2024', '03/11/2024', '2024-11-03', '2024-11-01'],
+        })
+
+        # Stored pairs, repeated pair; one query per request table
+        with self.assertNumQueries(5):
+            duplicates = self.service.detect_duplicates(df)
+
+        self.assertEqual(duplicates, [0, 1, 2, 3])
+
+    def test_datetime_column(self):
+        df = pd.DataFrame({
+            'ep_no': ['PP0000000001', 'PP0000000003'],
+            'punchdate': pd.to_datetime(['2024-11-01', '2024-11-01']),
+        })
+
+        self.assertEqual(self.service.detect_duplicates(df), [0])
+
+
+class ValidateBatchTests(TestCase):
+    """Tests for the columnar validation in validate_batch"""
+
+    def setUp(self):
+        self.service = DataValidatorService()
+
+    def test_matches_cell_validators(self):
+        df = pd.DataFrame({
+            'ep_no': ['PP0000000001', ' VP0000000002 ', 'XX123', '', None, 0, 'PP0000000001', 'PP000000000'],
+            'punchdate': ['01/11/2024', '2024-11-02', '3-11-2024', '2099-01-01', '', None, 'not a date', '31/02/2024'],
+            'in_time': ['09:00', '25:30:15', '09:60', '10:00:61', '0', '', '9am', '08:15 (N)'],
+            'hours': [0, 0.0, '  ', '100:00', None, '8', '07:30:00', '1:5'],
+        })
+
+        report = self.service.validate_batch(df, 'punch')
+
+        expected = []
+        for column, check in (('ep_no', self.service.validate_ep_no), ('punchdate', self.service.validate_date),
+                              ('in_time', self.service.validate_time), ('hours', self.service.validate_time)):
+            for idx, value in df[column].items():
+                result = check(value)
+                if not result.is_valid:
+                    expected.append((idx + 2, column, str(value), result.error_message))
+        actual = [(e.row_number, e.column_name, e.value, e.error_message) for e in report.errors]
+        self.assertEqual(actual, expected)
+        self.assertEqual(report.invalid_rows, len({row for row, *_ in expected}))
@@ -0,0 +1,46 @@
+"""
+Tests for per-column date format inference
+"""
+from datetime import date, datetime
+from django.test import SimpleTestCase
+import numpy as np
+import pandas as pd
+from core.date_parsing import DATE_FORMATS, infer_date_format, parse_date, parse_date_series
+
+
+class DateParsingTests(SimpleTestCase):
+    """Tests for scalar and column date parsing"""
+
+    def test_infers_one_format_per_column(self):
+        text = pd.Series(['21-11-2024', '05-11-2024', '01-12-2024'])
+
+        self.assertEqual(infer_date_format(text), '%d-%m-%Y')
+        self.assertIsNone(infer_date_format(pd.Series(['abc', '32/13/2024'])))
+
+    def test_ambiguous_values_follow_the_column(self):
+        formats = DATE_FORMATS + ('%m/%d/%Y',)
+        series = pd.Series(['11/21/2024', '01/02/2024', '12/25/2023'])
+
+        parsed = parse_date_series(series, formats)
+
+        self.assertEqual(parsed.dt.date.tolist(), [date(2024, 11, 21), date(2024, 1, 2), date(2023, 12, 25)])
+        self.assertEqual(parse_date('01/02/2024', formats), date(2024, 2, 1))
+
+    def test_leftovers_and_datetime_cells(self):
+        series = pd.Series(
+            [' 21/11/2024', '2024-11-05', datetime(2024, 11, 3, 14, 30), date(2024, 11, 4), None, np.nan, '', 'abc', '21/11/2024'],
+            index=list('abcdefghi')
+        )
+
+        parsed = parse_date_series(series)
+
+        self.assertEqual(parsed.index.tolist(), list('abcdefghi'))
+        self.assertEqual(parsed.tolist()[:4], [
+            pd.Timestamp(2024, 11, 21), pd.Timestamp(2024, 11, 5), pd.Timestamp(2024, 11, 3), pd.Timestamp(2024, 11, 4),
+        ])
+        self.assertTrue(parsed.iloc[4:8].isna().all())
+        self.assertEqual(parsed.iloc[8], pd.Timestamp(2024, 11, 21))
+        self.assertEqual([parse_date(value) for value in series], [
+            date(2024, 11, 21), date(2024, 11, 5), date(2024, 11, 3), date(2024, 11, 4),
+            None, None, None, None, date(2024, 11, 21),
+        ])
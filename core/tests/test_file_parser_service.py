@@ -0,0 +1,134 @@
+"""
+Tests for FileParserService
+"""
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import time as dt_time
+from django.test import SimpleTestCase
+import numpy as np
+import openpyxl
+import pandas as pd
+from core.services.file_parser_service import FileParserService, FileType
+
+
+class NormalizeTimesTests(SimpleTestCase):
+    """Tests for time normalization and time column classification"""
+
+    def setUp(self):
+        self.parser = FileParserService()
+
+    def test_normalize_times(self):
+        series = pd.Series([
+            '9:5', '25:30:15', ' 08:15 (N)', '08:15 (N):30', '100:00',
+            dt_time(9, 0), '0', 0, '', None, np.nan, 'abc', 8.5,
+        ])
+
+        self.assertEqual(self.parser._normalize_times(series).tolist(), [
+            '09:05:00', '25:30:15', '08:15:00 (N)', '08:15:30 (N)', '100:00:00',
+            '09:00:00', '', '', '', '', '', 'abc', '8.5',
+        ])
+
+    def test_only_time_columns_are_normalized(self):
+        df = pd.DataFrame({
+            'EP NO': ['PP0000000001'],
+            'PUNCH1 IN': ['9:00'],
+            'HOURS WORKED': ['8:30'],
+            'CONTRACTOR NAME': ['10:00 Contracting'],
+            'INSPECTION': ['9:00'],
+        })
+
+        normalized = self.parser.normalize_data(df, FileType.PUNCHRECORD)
+
+        self.assertEqual(normalized.iloc[0].tolist(), ['PP0000000001', '09:00:00', '08:30:00', '10:00 Contracting', '9:00'])
+
+
+class CrystalReportTests(SimpleTestCase):
+    """Tests for reading and reshaping Crystal Reports monthly attendance grids"""
+
+    def setUp(self):
+        self.parser = FileParserService()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+
+    def _save_report(self, name='CrystalReportViewer1.xlsx'):
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['For', '12/2025'])
+        sheet.append(['EP NO', 'EP NAME', 'Contractor Name', '01/12/2025', None, None, None,
+                      '02/12/2025', None, None, None, 'Payable Days'])
+        sheet.append([])
+        sheet.append([None, None, None, 'Shift', 'Plant In', 'Plant Out', 'Status',
+                      'Shift', 'Plant In', 'Plant Out', 'Stutus'])
+        sheet.append(['PP0000000001', 'John Doe', 'Test Company', 'G', 'CHUB1', 'CHUB1', 'P',
+                      None, None, None, 'A', 1])
+        sheet.append(['PP0000000002', 'Jane Smith', 'Test Company', None, None, None, None,
+                      'B', 'MARIN', 'MARIN', 'P', 1])
+        sheet.append(['101014329', 'Badge Only', 'Test Company', 'G', 'CHUB1', 'CHUB1', 'P'])
+        path = os.path.join(self.tmp_dir, name)
+        workbook.save(path)
+        return path
+
+    def test_reshapes_day_blocks_into_rows(self):
+        df, error = self.parser.parse_file(self._save_report())
+        self.assertIsNone(error)
+
+        file_type = self.parser.detect_file_type(df)
+        normalized = self.parser.normalize_data(df, file_type)
+
+        self.assertEqual(file_type, FileType.CRYSTAL_REPORT)
+        self.assertEqual(list(normalized.columns), [
+            'ep_no', 'ep_name', 'contractor_name', 'date', 'shift', 'entry_plant', 'exit_plant', 'status'
+        ])
+        self.assertEqual(normalized[['ep_no', 'date', 'shift', 'entry_plant', 'status']].values.tolist(), [
+            ['PP0000000001', '2025-12-01', 'G', 'CHUB1', 'P'],
+            ['PP0000000001', '2025-12-02', '', '', 'A'],
+            ['PP0000000002', '2025-12-02', 'B', 'MARIN', 'P'],
+        ])
+
+    def test_reads_workbook_with_unreadable_stylesheet(self):
+        path = self._save_report()
+        broken_path = os.path.join(self.tmp_dir, 'broken.xlsx')
+        with zipfile.ZipFile(path) as source, zipfile.ZipFile(broken_path, 'w') as target:
+            for item in source.infolist():
+                content = source.read(item.filename)
+                if item.filename == 'xl/styles.xml':
+                    # Font family values above 14, as Crystal Reports writes them
+                    content = content.replace(b'<family val="2"/>', b'<family val="34"/>')
+                target.writestr(item, content)
+
+        df, error = self.parser.parse_file(broken_path)
+
+        self.assertIsNone(error)
+        self.assertEqual(self.parser.detect_file_type(df), FileType.CRYSTAL_REPORT)
+
+    def test_other_files_are_not_crystal_reports(self):
+        df = pd.DataFrame({'EP NO': ['PP0000000001'], 'PUNCHDATE': ['2024-11-01'], 'STATUS': ['P']})
+
+        self.assertIsNone(self.parser.find_crystal_layout(df))
+
+
+class HtmlExportTests(SimpleTestCase):
+    """Tests for .xls exports that are HTML tables"""
+
+    def setUp(self):
+        self.service = FileParserService()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+
+    def test_parses_html_tables(self):
+        file_path = os.path.join(self.tmp_dir, 'export.xls')
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(
+                '<table><tr><th>EP NO</th><th>HOURS</th></tr><tr><td>PP001</td><td>8</td></tr></table>'
+                '<table><tr><th>TOTAL</th></tr><tr><td>1</td></tr></table>'
+            )
+
+        df, error = self.service.parse_file(file_path)
+        sheets, sheets_error = self.service.parse_file_sheets(file_path)
+
+        self.assertIsNone(error)
+        self.assertEqual(df.to_dict('records'), [{'EP NO': 'PP001', 'HOURS': 8}])
+        self.assertIsNone(sheets_error)
+        self.assertEqual([name for name, _ in sheets], ['Table 1', 'Table 2'])
@@ -0,0 +1,130 @@
+"""
+Tests for dry-run imports through ImportDiffService
+"""
+import json
+import os
+import shutil
+import tempfile
+from io import BytesIO
+import openpyxl
+import pandas as pd
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from core.csv_processor import CSVProcessor
+from core.models import Company, User, AttendanceRecord, ImportLog, UploadLog
+from core.services.data_importer_service import DataImporterService
+from core.services.file_parser_service import FileType
+from core.services.import_job_service import ImportJobService
+from core.tests.test_import_job_service import LOCMEM_CACHES
+
+
+class ImportDiffTests(TestCase):
+    """Dry runs report what a real import would do and write nothing"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.tmp_dir, CACHES=LOCMEM_CACHES)
+        self.settings_override.enable()
+        Company.objects.create(name='Test Company')
+        self.root_user = User.objects.create_user(username='root', password='root123', role='root')
+        self.header = "EP NO,EP NAME,COMPANY NAME,DATE,SHIFT,STATUS,IN,OUT"
+        self.rows = [f"EMP00{i},Employee {i},Test Company,2024-11-0{i},Day,P,09:00,17:00" for i in range(1, 5)]
+        self._upload(self.rows)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _csv(self, rows):
+        csv_file = BytesIO(("\n".join([self.header] + rows) + "\n").encode('utf-8'))
+        csv_file.name = 'test.csv'
+        return csv_file
+
+    def _upload(self, rows, **kwargs):
+        return CSVProcessor().process_csv(self._csv(rows), self.root_user, **kwargs)
+
+    def _snapshot(self):
+        return list(AttendanceRecord.objects.order_by('ep_no').values_list('ep_no', 'status', 'out_time', 'company__name', 'updated_at'))
+
+    def test_csv_dry_run_matches_real_run(self):
+        rows = list(self.rows)
+        rows[1] = rows[1].replace('17:00', '18:30')
+        rows[2] = rows[2].replace('Test Company', 'New Company')
+        rows += ["EMP005,Employee 5,Test Company,2024-11-05,Day,P,09:00,17:00", rows[1], "EMP099,Bad,Test Company,nope,Day,P,09:00,17:00"]
+        before = self._snapshot()
+
+        preview = self._upload(rows, dry_run=True)
+
+        self.assertEqual(self._snapshot(), before)
+        self.assertFalse(Company.objects.filter(name='New Company').exists())
+        self.assertEqual(preview['diff']['created'], 1)
+        self.assertEqual(preview['diff']['unchanged'], 2)
+        changes = {change['key']['ep_no']: change['fields'] for change in preview['diff']['changes']}
+        self.assertEqual(changes['EMP002'], {'out_time': {'old': '17:00:00', 'new': '18:30:00'}})
+        self.assertEqual(changes['EMP003']['company'], {'old': 'Test Company', 'new': 'New Company'})
+
+        result = self._upload(rows)
+
+        counts = ('success_count', 'updated_count', 'unchanged_count', 'error_count')
+        self.assertEqual([preview[name] for name in counts], [result[name] for name in counts])
+
+    def test_import_batch_dry_run_writes_no_log(self):
+        df = pd.DataFrame(
+            [['EMP001', 'Test Company', '2024-11-01', 'Day', 'A'], ['EMP009', 'Test Company', '2024-11-01', 'Day', 'P']],
+            columns=['ep_no', 'company_name', 'date', 'shift', 'status']
+        )
+
+        result = DataImporterService().import_batch(df, FileType.ARC_SUMMARY, self.root_user, 'test.xlsx', dry_run=True)
+
+        self.assertEqual((result.diff['created'], result.diff['updated'], result.diff['unchanged']), (1, 1, 0))
+        self.assertEqual(result.diff['changes'][0]['fields']['status'], {'old': 'P', 'new': 'A'})
+        self.assertFalse(ImportLog.objects.exists())
+        self.assertEqual(AttendanceRecord.objects.count(), 4)
+
+    def test_preview_view_queues_dry_run_job(self):
+        self.client.login(username='root', password='root123')
+        rows = self.rows + ["EMP005,Employee 5,Test Company,2024-11-05,Day,P,09:00,17:00"]
+
+        response = self.client.post(reverse('core:upload_preview'), {'csv_file': self._csv(rows)})
+
+        self.assertEqual(response.status_code, 202)
+        service = ImportJobService()
+        job = service.run(service.claim_next('worker'))
+        self.assertEqual((job.id, job.dry_run, job.status), (response.json()['job_id'], True, 'completed'))
+        self.assertEqual(
+            [job.result[name] for name in ('success_count', 'updated_count', 'unchanged_count')],
+            [1, 0, 4]
+        )
+        self.assertEqual(AttendanceRecord.objects.count(), 4)
+        self.assertFalse(UploadLog.objects.exists())
+        self.assertEqual(self.client.get(response.json()['job_url']).json()['job']['result']['diff']['created'], 1)
+
+    def test_excel_confirm_dry_run_keeps_upload(self):
+        workbook = openpyxl.Workbook()
+        workbook.active.append(['EP NO', 'EP NAME', 'PUNCHDATE', 'PUNCH1 IN', 'PUNCH2 OUT', 'HOURS WORKED', 'STATUS'])
+        workbook.active.append(['PP0000000001', 'John Doe', '2024-11-01', '09:00', '17:00', '08:00', 'P'])
+        buffer = BytesIO()
+        workbook.save(buffer)
+        upload = SimpleUploadedFile('punch.xlsx', buffer.getvalue())
+        self.client.login(username='root', password='root123')
+        session_id = self.client.post(reverse('core:api_excel_upload'), {'file': upload}).json()['session_id']
+
+        response = self.client.post(
+            reverse('core:api_excel_confirm', args=[session_id]),
+            json.dumps({'dry_run': True}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 202)
+        service = ImportJobService()
+        job = service.run(service.claim_next('worker'))
+        self.assertEqual((job.status, job.result['dry_run'], job.result['diff']['created']), ('completed', True, 1))
+        self.assertEqual(AttendanceRecord.objects.count(), 4)
+        self.assertFalse(ImportLog.objects.exists())
+        self.assertTrue(os.path.exists(job.file_path))
+
+        # The kept upload can then be imported for real
+        response = self.client.post(reverse('core:api_excel_process', args=[session_id]))
+        job = service.run(service.claim_next('worker'))
+        self.assertEqual((job.status, job.result['imported_rows']), ('completed', 1))
@@ -0,0 +1,222 @@
+"""
+Tests for ImportJobService and the run_import_worker command
+"""
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+import openpyxl
+from core.models import Company, User, AttendanceRecord, UploadLog, ImportJob, ImportLog
+from core.services.import_job_service import ImportJobService
+from core.services.progress_service import ProgressService
+
+
+CSV_CONTENT = (
+    b"EP NO,EP NAME,COMPANY NAME,DATE,SHIFT,STATUS,IN,OUT\n"
+    b"EMP001,John Doe,Test Company,2024-11-01,Day,P,09:00,17:00\n"
+    b"EMP002,Jane Smith,Test Company,2024-11-01,Day,P,09:00,17:00\n"
+)
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'progress': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-progress'},
+}
+
+
+class ImportJobServiceTests(TestCase):
+    """Tests for queueing and running upload jobs"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.tmp_dir, CACHES=LOCMEM_CACHES)
+        self.settings_override.enable()
+        Company.objects.create(name='Test Company')
+        self.root_user = User.objects.create_user(username='root', password='root123', role='root')
+        self.service = ImportJobService()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _enqueue(self, content=CSV_CONTENT, name='test.csv'):
+        return self.service.enqueue(self.root_user, 'attendance', SimpleUploadedFile(name, content))
+
+    def _progress(self, job):
+        return ProgressService().get(self.service.progress_channel(job.id))
+
+    def test_enqueue_saves_file_without_processing(self):
+        job = self._enqueue()
+
+        self.assertEqual(job.status, 'queued')
+        self.assertTrue(os.path.exists(job.file_path))
+        self.assertEqual(self._progress(job)['status'], 'queued')
+        self.assertEqual(AttendanceRecord.objects.count(), 0)
+
+    def test_claim_next_takes_oldest_queued_job_once(self):
+        first = self._enqueue()
+        second = self._enqueue()
+
+        self.assertEqual(self.service.claim_next('worker-a').id, first.id)
+        self.assertEqual(self.service.claim_next('worker-b').id, second.id)
+        self.assertIsNone(self.service.claim_next('worker-c'))
+        self.assertEqual(ImportJob.objects.get(id=first.id).worker, 'worker-a')
+
+    def test_only_jobs_with_expired_heartbeat_are_requeued(self):
+        self._enqueue()
+        self._enqueue()
+        slow = self.service.claim_next('worker-a')
+        dead = self.service.claim_next('worker-b')
+        long_ago = timezone.now() - self.service.LEASE - timedelta(hours=2)
+        ImportJob.objects.update(started_at=long_ago, heartbeat_at=long_ago)
+
+        # The slow job's worker is still reporting progress
+        slow.heartbeat_at = long_ago
+        self.service.progress_callback(slow, ProgressService())(10, 100)
+        # A heartbeat from a worker that no longer holds the job is ignored
+        dead.worker = 'worker-a'
+        self.service.heartbeat(dead)
+
+        self.assertEqual(self.service.requeue_stale(), 1)
+        self.assertEqual(ImportJob.objects.get(id=slow.id).status, 'running')
+        self.assertEqual(ImportJob.objects.get(id=dead.id).status, 'queued')
+
+    def test_run_attendance_job_writes_records_and_upload_log(self):
+        job = self._enqueue()
+
+        job = self.service.run(self.service.claim_next('worker'))
+
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.result['success_count'], 2)
+        self.assertEqual(AttendanceRecord.objects.count(), 2)
+        upload_log = UploadLog.objects.get(id=job.result['upload_log_id'])
+        self.assertEqual((upload_log.filename, upload_log.success_count), ('test.csv', 2))
+        self.assertEqual(self._progress(job)['status'], 'complete')
+        self.assertFalse(os.path.exists(job.file_path))
+
+    def test_identical_attendance_upload_is_skipped(self):
+        self._enqueue()
+        first = self.service.run(self.service.claim_next('worker'))
+        AttendanceRecord.objects.filter(ep_no='EMP001').update(status='A')
+        self._enqueue(name='again.csv')
+
+        job = self.service.run(self.service.claim_next('worker'))
+
+        self.assertEqual(job.status, 'completed')
+        self.assertTrue(job.result['skipped'])
+        self.assertEqual(AttendanceRecord.objects.get(ep_no='EMP001').status, 'A')
+        upload_logs = UploadLog.objects.order_by('id')
+        self.assertEqual(upload_logs[0].id, first.result['upload_log_id'])
+        self.assertEqual(upload_logs[0].file_hash, upload_logs[1].file_hash)
+        self.assertEqual(upload_logs[1].success_count, 0)
+
+    def test_forced_upload_reimports_identical_file(self):
+        self._enqueue()
+        self.service.run(self.service.claim_next('worker'))
+        AttendanceRecord.objects.filter(ep_no='EMP001').delete()
+        self.client.login(username='root', password='root123')
+        self.client.post(reverse('core:upload'), {
+            'csv_file': SimpleUploadedFile('again.csv', CSV_CONTENT),
+            'force': 'on'
+        })
+
+        job = self.service.run(self.service.claim_next('worker'))
+
+        self.assertTrue(job.force)
+        self.assertNotIn('skipped', job.result)
+        self.assertEqual((job.result['success_count'], job.result['updated_count']), (1, 0))
+        self.assertTrue(AttendanceRecord.objects.filter(ep_no='EMP001').exists())
+
+    def test_failed_job_records_error(self):
+        job = self._enqueue()
+        os.remove(job.file_path)
+
+        job = self.service.run(self.service.claim_next('worker'))
+
+        self.assertEqual(job.status, 'failed')
+        self.assertTrue(job.error_message)
+        self.assertEqual(self._progress(job)['status'], 'failed')
+
+    def test_excel_job_saves_error_report_for_download(self):
+        workbook = openpyxl.Workbook()
+        workbook.active.append(['EP NO', 'EP NAME', 'PUNCHDATE', 'PUNCH1 IN', 'PUNCH2 OUT', 'HOURS WORKED', 'STATUS'])
+        workbook.active.append(['PP0000000001', 'John Doe', '2024-11-01', '09:00', '17:00', '08:00', 'P'])
+        workbook.active.append(['BAD', 'Jane Smith', '2024-11-01', '09:00', '17:00', '08:00', 'P'])
+        file_path = os.path.join(self.tmp_dir, 'punch.xlsx')
+        workbook.save(file_path)
+        self.service.enqueue_path(self.root_user, 'excel', file_path, 'punch.xlsx')
+
+        job = self.service.run(self.service.claim_next('worker'))
+
+        self.assertEqual(job.status, 'completed')
+        self.assertFalse(os.path.exists(file_path))
+        report_path = self.service.error_report_path(self.root_user.id, 'punch.xlsx')
+        self.assertEqual(ImportLog.objects.get(id=job.result['import_log_id']).error_report_path, report_path)
+
+        self.client.login(username='root', password='root123')
+        response = self.client.get(reverse('core:api_excel_errors', args=['punch.xlsx']))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            b''.join(response.streaming_content).decode().splitlines(),
+            ['Row,Column,Value,Error', '3,ep_no,BAD,Invalid EP NO: BAD']
+        )
+
+    def test_identical_excel_upload_is_skipped(self):
+        workbook = openpyxl.Workbook()
+        workbook.active.append(['EP NO', 'EP NAME', 'PUNCHDATE', 'PUNCH1 IN', 'PUNCH2 OUT', 'HOURS WORKED', 'STATUS'])
+        workbook.active.append(['PP0000000001', 'John Doe', '2024-11-01', '09:00', '17:00', '08:00', 'P'])
+        for name in ('first.xlsx', 'second.xlsx'):
+            workbook.save(os.path.join(self.tmp_dir, name))
+
+        self.service.enqueue_path(self.root_user, 'excel', os.path.join(self.tmp_dir, 'first.xlsx'), 'first.xlsx')
+        first = self.service.run(self.service.claim_next('worker'))
+        self.service.enqueue_path(self.root_user, 'excel', os.path.join(self.tmp_dir, 'second.xlsx'), 'second.xlsx')
+        second = self.service.run(self.service.claim_next('worker'))
+
+        self.assertNotIn('skipped', first.result)
+        self.assertTrue(second.result['skipped'])
+        import_log = ImportLog.objects.get(id=second.result['import_log_id'])
+        self.assertEqual((import_log.status, import_log.imported_rows, import_log.duplicate_rows), ('skipped', 0, 1))
+        self.assertEqual(import_log.file_hash, ImportLog.objects.get(id=first.result['import_log_id']).file_hash)
+
+    def test_crystal_report_is_imported_without_conversion(self):
+        workbook = openpyxl.Workbook()
+        workbook.active.append(['For', '11/2024'])
+        workbook.active.append(['EP NO', 'EP NAME', 'Contractor Name', '01/11/2024', None, None, None, '02/11/2024'])
+        workbook.active.append([None, None, None, 'Shift', 'Plant In', 'Plant Out', 'Status', 'Shift', 'Plant In', 'Plant Out', 'Status'])
+        workbook.active.append(['PP0000000001', 'John Doe', 'Test Company', 'G', 'CHUB1', 'CHUB1', 'P', None, None, None, 'A'])
+        file_path = os.path.join(self.tmp_dir, 'crystal.xlsx')
+        workbook.save(file_path)
+        self.service.enqueue_path(self.root_user, 'excel', file_path, 'crystal.xlsx')
+
+        job = self.service.run(self.service.claim_next('worker'))
+
+        self.assertEqual((job.status, job.result['file_type'], job.result['imported_rows']), ('completed', 'crystal_report', 2))
+        self.assertEqual(
+            list(AttendanceRecord.objects.order_by('date').values_list('ep_no', 'shift', 'status', 'company__name')),
+            [('PP0000000001', 'G', 'P', 'Test Company'), ('PP0000000001', '', 'A', 'Test Company')]
+        )
+
+    def test_worker_command_processes_queue(self):
+        self._enqueue()
+        out = StringIO()
+
+        call_command('run_import_worker', '--once', stdout=out)
+
+        self.assertIn('Processed 1 job(s)', out.getvalue())
+        self.assertEqual(ImportJob.objects.get().status, 'completed')
+
+    def test_upload_view_only_enqueues(self):
+        self.client.login(username='root', password='root123')
+
+        response = self.client.post(reverse('core:upload'), {'csv_file': SimpleUploadedFile('test.csv', CSV_CONTENT)})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(ImportJob.objects.get().status, 'queued')
+        self.assertEqual(AttendanceRecord.objects.count(), 0)
@@ -0,0 +1,74 @@
+"""
+Tests for ProgressService and the progress stream endpoint
+"""
+import json
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from core.models import User, ImportJob
+from core.services.progress_service import ProgressService
+
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'progress': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-progress'},
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProgressServiceTests(TestCase):
+    """Tests for throttled progress publishing and SSE streaming"""
+
+    def setUp(self):
+        caches['progress'].clear()
+        self.service = ProgressService(min_interval=60)
+
+    def test_publish_is_throttled_until_status_changes(self):
+        self.assertTrue(self.service.publish('job_1', {'status': 'processing', 'processed': 1}))
+        self.assertFalse(self.service.publish('job_1', {'status': 'processing', 'processed': 2}))
+        self.assertEqual(self.service.get('job_1')['processed'], 1)
+
+        self.assertTrue(self.service.publish('job_1', {'status': 'complete', 'processed': 3}))
+        self.assertEqual(self.service.get('job_1'), {'status': 'complete', 'processed': 3})
+
+    def test_progress_is_shared_between_instances(self):
+        self.service.publish('job_2', {'status': 'processing', 'processed': 5})
+
+        self.assertEqual(ProgressService().get('job_2')['processed'], 5)
+
+    def test_stream_ends_on_final_status(self):
+        self.service.publish('job_3', {'status': 'complete', 'processed': 10})
+
+        events = list(self.service.stream('job_3', duration=5, poll_interval=0))
+
+        self.assertTrue(events[0].startswith('retry:'))
+        self.assertEqual(json.loads(events[1][len('data: '):]), {'status': 'complete', 'processed': 10})
+        self.assertEqual(len(events), 2)
+
+    def test_stream_view_sends_current_upload_progress(self):
+        User.objects.create_user(username='root', password='root123', role='root')
+        self.client.login(username='root', password='root123')
+        session = self.client.session
+        session['current_upload_id'] = 7
+        session.save()
+        self.service.publish('job_7', {'status': 'complete', 'processed': 2, 'total': 2, 'percentage': 100})
+
+        response = self.client.get(reverse('core:upload_progress_stream'))
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('"status": "complete"', body)
+
+    def test_excel_stream_is_limited_to_the_uploader(self):
+        owner = User.objects.create_user(username='owner', password='owner123', role='admin')
+        User.objects.create_user(username='other', password='other123', role='admin')
+        ImportJob.objects.create(user=owner, kind='excel', filename='punch.xlsx', file_path='punch.xlsx')
+        self.service.publish('excel_punch.xlsx', {'status': 'completed', 'processed_rows': 2})
+        url = reverse('core:api_excel_progress_stream', args=['punch.xlsx'])
+
+        self.client.login(username='other', password='other123')
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.login(username='owner', password='owner123')
+        response = self.client.get(url)
+        self.assertIn('"status": "completed"', b''.join(response.streaming_content).decode())
@@ -0,0 +1,101 @@
+"""
+Tests for StagingMergeService
+"""
+from datetime import date, time as dt_time
+from django.db import IntegrityError, connection
+from django.test import TestCase
+from core.models import Company, AttendanceRecord
+from core.services.staging_merge_service import StagingMergeService
+
+
+class StagingMergeServiceTests(TestCase):
+    """Tests for merging attendance rows through a staging table"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='Test Company')
+        self.service = StagingMergeService(AttendanceRecord, ('ep_no', 'date'))
+
+    def _row(self, ep_no, day, **overrides):
+        row = {
+            'ep_no': ep_no,
+            'ep_name': f'Employee {ep_no}',
+            'company': self.company,
+            'date': date(2024, 1, day),
+            'status': 'P',
+            'in_time': dt_time(9, 0),
+        }
+        row.update(overrides)
+        return row
+
+    def _index_names(self):
+        with connection.cursor() as cursor:
+            return {index for index, info in connection.introspection.get_constraints(
+                cursor, AttendanceRecord._meta.db_table).items() if info['index']}
+
+    def test_creates_and_updates_with_one_merge(self):
+        existing = AttendanceRecord.objects.create(**self._row('EMP001', 1, status='A', hours='08:00'))
+        indexes = self._index_names()
+
+        created, updated = self.service.upsert([
+            self._row('EMP001', 1, in_time=None),
+            self._row('EMP002', 1),
+            self._row('EMP002', 1, status='A'),
+        ])
+
+        self.assertEqual((created, updated), (1, 2))
+        record = AttendanceRecord.objects.get(pk=existing.pk)
+        self.assertEqual((record.status, record.in_time, record.hours), ('P', None, '08:00'))
+        self.assertEqual(record.created_at, existing.created_at)
+        self.assertGreater(record.updated_at, existing.updated_at)
+        new_record = AttendanceRecord.objects.get(ep_no='EMP002')
+        self.assertEqual((new_record.status, new_record.company, new_record.cont_code), ('A', self.company, ''))
+        self.assertEqual(self._index_names(), indexes)
+
+    def test_rows_with_different_fields(self):
+        AttendanceRecord.objects.create(**self._row('EMP001', 1, shift='Day'))
+
+        created, updated = self.service.upsert([
+            {'ep_no': 'EMP001', 'date': date(2024, 1, 1), 'shift': 'Night'},
+            self._row('EMP002', 2, company_id=self.company.pk, company=None),
+        ])
+
+        self.assertEqual((created, updated), (1, 1))
+        self.assertEqual(AttendanceRecord.objects.get(ep_no='EMP001').shift, 'Night')
+
+    def test_hash_field_skips_unchanged_rows(self):
+        service = StagingMergeService(AttendanceRecord, ('ep_no', 'date'), hash_field='row_hash')
+        service.upsert([self._row('EMP001', 1), self._row('EMP002', 1)])
+        before = {r.ep_no: r.updated_at for r in AttendanceRecord.objects.all()}
+
+        created, updated = service.upsert([
+            self._row('EMP001', 1),
+            self._row('EMP001', 1),
+            self._row('EMP002', 1, status='A'),
+            self._row('EMP003', 1),
+        ])
+
+        self.assertEqual((created, updated), (1, 1))
+        records = {r.ep_no: r for r in AttendanceRecord.objects.all()}
+        self.assertEqual(records['EMP001'].updated_at, before['EMP001'])
+        self.assertGreater(records['EMP002'].updated_at, before['EMP002'])
+        self.assertEqual(records['EMP002'].status, 'A')
+
+    def _staging_tables(self):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute("SELECT tablename FROM pg_tables WHERE schemaname LIKE 'pg_temp%%'")
+            else:
+                cursor.execute("SELECT name FROM sqlite_temp_master WHERE type = 'table'")
+            return [name for (name,) in cursor.fetchall() if '_staging' in name]
+
+    def test_failed_merge_keeps_original_error_and_other_tables(self):
+        table = AttendanceRecord._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE TABLE {table}_staging (id integer)')
+
+        with self.assertRaises(IntegrityError):
+            self.service.upsert([self._row('EMP001', 1, company=None)])
+
+        self.assertEqual(self._staging_tables(), [])
+        self.assertIn(f'{table}_staging', connection.introspection.table_names())
+        self.assertEqual(self.service.upsert([self._row('EMP001', 1)]), (1, 0))
@@ -0,0 +1,52 @@
+"""
+Tests for the shared time and duration parser
+"""
+from datetime import time as dt_time
+from decimal import Decimal
+from django.test import SimpleTestCase
+import numpy as np
+import pandas as pd
+from core import time_parsing
+from core.time_parsing import format_hhmm, parse_hours, parse_time, parse_time_series
+
+
+class TimeParsingTests(SimpleTestCase):
+    """Tests for scalar and column time parsing"""
+
+    def test_scalar_parsers(self):
+        values = ['09:30', ' 25:30:15 ', '06:04 (N)', '08:15 (N):30', '9:75', '0', '', None, np.nan, '9:30 AM']
+
+        self.assertEqual([parse_time(value) for value in values], [
+            dt_time(9, 30), dt_time(1, 30, 15), dt_time(6, 4), dt_time(8, 15, 30),
+            None, None, None, None, None, None,
+        ])
+        self.assertEqual([format_hhmm(value) for value in values], [
+            '09:30', '01:30', '06:04', '08:15', '', '', '', '', '', '',
+        ])
+        self.assertEqual(
+            [parse_hours(value) for value in ['8:30', 7.5, '-1', '8:30:00', '8:75', 'abc', None]],
+            [Decimal('8.5'), Decimal('7.5'), None, None, None, None, None]
+        )
+
+    def test_series_matches_scalar(self):
+        series = pd.Series(['25:30', '06:04:00 (N)', '0', None, '9:75', 'abc', '25:30'], index=list('abcdefg'))
+
+        parsed = parse_time_series(series)
+
+        self.assertEqual(parsed.index.tolist(), list('abcdefg'))
+        self.assertEqual(parsed['valid'].tolist(), [True, True, False, False, False, False, True])
+        self.assertEqual(parsed['empty'].tolist(), [False, False, True, True, False, False, False])
+        self.assertEqual(parsed['time'].tolist(), [parse_time(value) for value in series])
+        self.assertEqual(parsed['hhmm'].tolist(), [format_hhmm(value) for value in series])
+        self.assertEqual(parsed['normalized'].tolist(), [
+            '25:30:00', '06:04:00 (N)', '', '', '09:75:00', 'abc', '25:30:00',
+        ])
+
+    def test_repeated_values_hit_the_cache(self):
+        time_parsing.parse_time_text.cache_clear()
+
+        for _ in range(3):
+            parse_time('10:45')
+
+        info = time_parsing.parse_time_text.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 2))
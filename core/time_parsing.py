@@ -0,0 +1,204 @@
+"""
+Parsing of attendance time and duration values shared by every import path
+
+Punch times and durations arrive as "HH:MM", "HH:MM:SS", "HH:MM (N)" or
+"HH:MM (N):SS", where "(N)" marks a punch on the next day and durations may
+run past 24 hours. A month of uploads holds millions of these cells but only
+a few thousand distinct strings, so each string is parsed once and the
+result is cached.
+"""
+from datetime import time as dt_time
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+import re
+from typing import NamedTuple, Optional
+
+try:
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+
+TIME_PATTERN = re.compile(
+    r'(?P<hours>\d+):(?P<minutes>\d+)(?::(?P<seconds>\d+))?'
+    r'\s*(?P<day>\([^)]*\))?(?::(?P<seconds_after>\d+))?'
+)
+
+# Cell values meaning "no time"
+EMPTY_VALUES = frozenset(['', '0', '0.0'])
+
+# Distinct strings kept per parser; minutes alone give 1440 values per day marker
+CACHE_SIZE = 8192
+
+
+class ParsedTime(NamedTuple):
+    """Components of a time or duration string"""
+    hours: int
+    minutes: int
+    seconds: Optional[int]
+    day: str
+
+    @property
+    def valid(self) -> bool:
+        """Whether minutes and seconds are in range"""
+        return self.minutes <= 59 and (self.seconds or 0) <= 59
+
+    @property
+    def time(self) -> dt_time:
+        """Clock time, with hours past 24 wrapped around"""
+        return dt_time(self.hours % 24, self.minutes, self.seconds or 0)
+
+    @property
+    def hhmm(self) -> str:
+        """Clock time as HH:MM"""
+        return f"{self.hours % 24:02d}:{self.minutes:02d}"
+
+    @property
+    def hhmmss(self) -> str:
+        """Clock time as HH:MM:SS"""
+        return f"{self.hours % 24:02d}:{self.minutes:02d}:{self.seconds or 0:02d}"
+
+    @property
+    def normalized(self) -> str:
+        """HH:MM:SS with the hours as given and the day marker kept"""
+        text = f"{self.hours:02d}:{self.minutes:02d}:{self.seconds or 0:02d}"
+        return f"{text} {self.day}" if self.day else text
+
+
+def time_text(value) -> str:
+    """Stripped text of a cell, '' for None and NaN"""
+    if value is None or (isinstance(value, float) and value != value):
+        return ''
+    return str(value).strip()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_time_text(text: str) -> Optional[ParsedTime]:
+    """
+    Split a time string into its components
+
+    Args:
+        text: Stripped cell text, as returned by time_text
+
+    Returns:
+        ParsedTime, or None if the text is empty or not a time; out-of-range
+        minutes or seconds are returned with valid False
+    """
+    if text in EMPTY_VALUES:
+        return None
+    match = TIME_PATTERN.fullmatch(text)
+    if match is None:
+        return None
+    seconds = match.group('seconds') or match.group('seconds_after')
+    return ParsedTime(
+        int(match.group('hours')),
+        int(match.group('minutes')),
+        int(seconds) if seconds is not None else None,
+        match.group('day') or ''
+    )
+
+
+def parse_time(value) -> Optional[dt_time]:
+    """
+    Parse a cell into a clock time
+
+    Args:
+        value: Cell value
+
+    Returns:
+        time object with hours past 24 wrapped around, or None if the value
+        is empty or invalid
+    """
+    parsed = parse_time_text(time_text(value))
+    if parsed is None or not parsed.valid:
+        return None
+    return parsed.time
+
+
+def format_hhmm(value) -> str:
+    """
+    Format a cell as HH:MM, dropping seconds and the day marker
+
+    Args:
+        value: Cell value
+
+    Returns:
+        String in HH:MM format, '' if the value is empty or invalid
+    """
+    parsed = parse_time_text(time_text(value))
+    if parsed is None or not parsed.valid:
+        return ''
+    return parsed.hhmm
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_hours_text(text: str) -> Optional[Decimal]:
+    if ':' in text:
+        parsed = parse_time_text(text)
+        if parsed is None or parsed.seconds is not None or parsed.day or parsed.minutes >= 60:
+            return None
+        return Decimal(parsed.hours) + Decimal(parsed.minutes) / Decimal(60)
+    try:
+        hours = Decimal(text)
+    except (ValueError, InvalidOperation):
+        return None
+    return hours if hours >= 0 else None
+
+
+def parse_hours(value) -> Optional[Decimal]:
+    """
+    Parse a duration given as H:MM or as decimal hours
+
+    Args:
+        value: Cell value
+
+    Returns:
+        Decimal hours, or None if the value is empty, negative or invalid
+    """
+    text = time_text(value)
+    if not text:
+        return None
+    return _parse_hours_text(text)
+
+
+def parse_time_series(series: 'pd.Series') -> 'pd.DataFrame':
+    """
+    Parse a whole column, once per distinct value
+
+    Args:
+        series: Column of cell values
+
+    Returns:
+        DataFrame aligned with series, with boolean 'empty' and 'valid'
+        columns, integer 'hours' (wrapped around 24), 'minutes' and 'seconds',
+        the clock 'time' (None unless valid), 'hhmm' and 'hhmmss' strings
+        ('' unless valid), and 'normalized' text: HH:MM:SS with the hours as
+        given and any day marker for times, the stripped text otherwise
+    """
+    codes, uniques = pd.factorize(series)
+    rows = []
+    for value in uniques:
+        text = time_text(value)
+        parsed = parse_time_text(text)
+        if parsed is None:
+            empty = text in EMPTY_VALUES
+            rows.append((empty, False, 0, 0, 0, None, '', '', '' if empty else text))
+        elif parsed.valid:
+            rows.append((
+                False, True, parsed.hours % 24, parsed.minutes, parsed.seconds or 0,
+                parsed.time, parsed.hhmm, parsed.hhmmss, parsed.normalized
+            ))
+        else:
+            rows.append((
+                False, False, parsed.hours % 24, parsed.minutes, parsed.seconds or 0,
+                None, '', '', parsed.normalized
+            ))
+    # Missing values are coded -1, which take() reads as this trailing empty row
+    rows.append((True, False, 0, 0, 0, None, '', '', ''))
+
+    parsed = pd.DataFrame.from_records(rows, columns=[
+        'empty', 'valid', 'hours', 'minutes', 'seconds', 'time', 'hhmm', 'hhmmss', 'normalized'
+    ]).take(codes)
+    parsed.index = series.index
+    return parsed
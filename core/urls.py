@@ -27,6 +27,8 @@ urlpatterns = [
     # CSV Upload
     path('upload/', views.upload_csv_view, name='upload'),
     path('upload/progress/', views.upload_progress_view, name='upload_progress'),
+    path('upload/preview/', views.upload_preview_view, name='upload_preview'),
+    path('upload/progress/stream/', views.upload_progress_stream_view, name='upload_progress_stream'),
     path('upload/logs/', views.upload_logs_view, name='upload_logs'),
     path('upload/template/', views.download_csv_template, name='download_template'),
     
@@ -62,10 +64,17 @@ urlpatterns = [
     
     # Excel File Upload API
     path('api/excel/upload/', views_excel_api.upload_excel_file, name='api_excel_upload'),
+    path('api/excel/upload/batch/', views_excel_api.upload_excel_batch, name='api_excel_upload_batch'),
+    path('api/excel/upload/chunked/', views_excel_api.start_chunked_upload, name='api_excel_chunked_start'),
+    path('api/excel/upload/chunked/<str:upload_id>/', views_excel_api.chunked_upload_status, name='api_excel_chunked'),
+    path('api/excel/upload/chunked/<str:upload_id>/<int:chunk_index>/', views_excel_api.upload_chunk, name='api_excel_chunked_part'),
+    path('api/excel/upload/chunked/<str:upload_id>/finalize/', views_excel_api.finalize_chunked_upload, name='api_excel_chunked_finalize'),
     path('api/excel/upload/<str:session_id>/process/', views_excel_api.process_excel_file, name='api_excel_process'),
     path('api/excel/upload/<str:session_id>/progress/', views_excel_api.get_import_progress, name='api_excel_progress'),
+    path('api/excel/upload/<str:session_id>/progress/stream/', views_excel_api.stream_import_progress, name='api_excel_progress_stream'),
     path('api/excel/upload/<str:session_id>/confirm/', views_excel_api.confirm_excel_import, name='api_excel_confirm'),
     path('api/excel/upload/<str:session_id>/errors/', views_excel_api.download_error_report, name='api_excel_errors'),
+    path('api/excel/jobs/<int:job_id>/', views_excel_api.get_import_job, name='api_excel_job'),
     path('api/excel/imports/', views_excel_api.import_history, name='api_excel_imports'),
     path('api/excel/imports/<int:import_id>/', views_excel_api.import_detail, name='api_excel_import_detail'),
     path('api/excel/permissions/', views_excel_api.manage_permissions, name='api_excel_permissions'),
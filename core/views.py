@@ -82,96 +82,21 @@ def upload_csv_view(request):
         
         logger.info(f'CSV upload started by {request.user.username}: {csv_file.name}')
         
-        # Create a unique upload ID for this session
-        import json
-        import os
-        upload_id = f"upload_{request.user.id}_{int(timezone.now().timestamp())}"
-        progress_file = os.path.join(os.path.dirname(__file__), '..', 'logs', f'{upload_id}.json')
-        
-        # Ensure logs directory exists
-        os.makedirs(os.path.dirname(progress_file), exist_ok=True)
-        
-        # Initialize progress in file
-        with open(progress_file, 'w') as f:
-            json.dump({'processed': 0, 'total': 0, 'status': 'starting', 'percentage': 0}, f)
-        
-        # Store upload_id in session and save immediately
-        request.session['current_upload_id'] = upload_id
-        request.session['progress_file'] = progress_file
+        # Processing runs in the run_import_worker command, not in this request
+        from .services.import_job_service import ImportJobService
+        # A forced upload is imported even if the same file already went through cleanly
+        force = request.POST.get('force') in ('on', 'true', '1')
+        job = ImportJobService().enqueue(request.user, 'attendance', csv_file, force=force)
+        
+        # Store the job id in session and save immediately for progress lookups
+        request.session['current_upload_id'] = job.id
         request.session.save()
         
-        # Process CSV with progress callback
-        from .csv_processor import CSVProcessor
-        processor = CSVProcessor()
-        
-        # Set progress callback that updates file in real-time
-        def progress_callback(processed, total, current_ep=None):
-            try:
-                with open(progress_file, 'w') as f:
-                    progress_data = {
-                        'processed': processed,
-                        'total': total,
-                        'status': 'processing',
-                        'percentage': int((processed / total) * 100) if total > 0 else 0
-                    }
-                    if current_ep:
-                        progress_data['current_ep'] = current_ep
-                    json.dump(progress_data, f)
-            except Exception as e:
-                logger.error(f'Error writing progress: {e}')
-        
-        processor.progress_callback = progress_callback
-        result = processor.process_csv(csv_file, request.user)
-        
-        # Mark as complete
-        try:
-            with open(progress_file, 'w') as f:
-                json.dump({
-                    'processed': result.get('processed_rows', 0),
-                    'total': result.get('total_rows', 0),
-                    'status': 'complete',
-                    'percentage': 100
-                }, f)
-        except Exception as e:
-            logger.error(f'Error writing final progress: {e}')
-        
-        # Create upload log
-        error_messages = '\n'.join(result['errors']) if result['errors'] else ''
-        upload_log = UploadLog.objects.create(
-            user=request.user,
-            filename=csv_file.name,
-            success_count=result['success_count'],
-            updated_count=result['updated_count'],
-            error_count=result['error_count'],
-            error_messages=error_messages
-        )
-        
-        # Log results
-        logger.info(
-            f'CSV processing completed by {request.user.username}: '
-            f'Created={result["success_count"]}, Updated={result["updated_count"]}, Errors={result["error_count"]}'
+        messages.info(
+            request,
+            f'"{csv_file.name}" is queued for processing. Results will appear in the upload logs when it finishes.'
         )
         
-        if result['error_count'] > 0:
-            logger.error(f'CSV processing errors for {csv_file.name}: {error_messages[:200]}...')
-        
-        # Display results
-        if result['success']:
-            messages.success(
-                request,
-                f'CSV processed successfully! Created: {result["success_count"]}, Updated: {result["updated_count"]}'
-            )
-        else:
-            messages.warning(
-                request,
-                f'CSV processed with errors. Created: {result["success_count"]}, Updated: {result["updated_count"]}, Errors: {result["error_count"]}'
-            )
-            if result['errors']:
-                for error in result['errors'][:5]:  # Show first 5 errors
-                    messages.error(request, error)
-                if len(result['errors']) > 5:
-                    messages.info(request, f'... and {len(result["errors"]) - 5} more errors. Check upload logs for details.')
-        
         return redirect('core:upload')
     
     # Get recent upload logs for current user
@@ -1037,19 +962,65 @@ def attendance_delete_all_view(request):
 def upload_progress_view(request):
     """API endpoint to check upload progress"""
     from django.http import JsonResponse
-    import json
-    import os
+    from .services.import_job_service import ImportJobService
+    from .services.progress_service import ProgressService
     
-    progress_file = request.session.get('progress_file')
-    if not progress_file or not os.path.exists(progress_file):
+    job_id = request.session.get('current_upload_id')
+    progress = ProgressService().get(ImportJobService().progress_channel(job_id)) if job_id else None
+    if not progress:
         return JsonResponse({'status': 'no_upload', 'processed': 0, 'total': 0, 'percentage': 0})
     
-    try:
-        with open(progress_file, 'r') as f:
-            progress = json.load(f)
-        return JsonResponse(progress)
-    except Exception as e:
-        return JsonResponse({'status': 'error', 'processed': 0, 'total': 0, 'percentage': 0, 'error': str(e)})
+    return JsonResponse(progress)
+
+
+@login_required
+@role_required(['root', 'admin'])
+def upload_preview_view(request):
+    """Queue a dry run of an attendance upload; the job's result says how many rows would be new, changed or unchanged"""
+    from django.http import JsonResponse
+    from django.urls import reverse
+    from .services.import_job_service import ImportJobService
+    
+    csv_file = request.FILES.get('csv_file')
+    if request.method != 'POST' or not csv_file:
+        return JsonResponse({'success': False, 'error': 'No file uploaded'}, status=400)
+    if not csv_file.name.lower().endswith(('.csv', '.xls', '.xlsx')):
+        return JsonResponse({'success': False, 'error': 'Please upload a valid CSV, XLS, or XLSX file.'}, status=400)
+    
+    # The comparison runs in the run_import_worker command, not in this request
+    job = ImportJobService().enqueue(request.user, 'attendance', csv_file, dry_run=True)
+    logger.info(f'Upload preview queued by {request.user.username}: {csv_file.name}')
+    
+    # Progress comes through the usual upload progress endpoints
+    request.session['current_upload_id'] = job.id
+    request.session.save()
+    
+    return JsonResponse({
+        'success': True,
+        'queued': True,
+        'job_id': job.id,
+        'job_url': reverse('core:api_excel_job', args=[job.id])
+    }, status=202)
+
+
+@login_required
+@role_required(['root', 'admin'])
+def upload_progress_stream_view(request):
+    """Server-Sent Events stream of the current upload's progress"""
+    from django.http import StreamingHttpResponse
+    from .services.import_job_service import ImportJobService
+    from .services.progress_service import ProgressService
+    
+    job_id = request.session.get('current_upload_id')
+    if job_id:
+        events = ProgressService().stream(ImportJobService().progress_channel(job_id))
+    else:
+        events = iter(['data: {"status": "no_upload", "processed": 0, "total": 0, "percentage": 0}\n\n'])
+    
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Keep nginx from buffering the stream
+    return response
 
 
 @login_required
@@ -1937,78 +1908,18 @@ def upload_mandays_view(request):
         
         logger.info(f'Manday CSV upload started by {request.user.username}: {csv_file.name}')
         
-        # Create a unique upload ID for this session
-        from django.core.cache import cache
-        upload_id = f"manday_upload_{request.user.id}_{int(timezone.now().timestamp())}"
-        
-        # Initialize progress in cache
-        cache.set(upload_id, {'processed': 0, 'total': 0, 'status': 'starting'}, timeout=3600)
+        # Processing runs in the run_import_worker command, not in this request
+        from .services.import_job_service import ImportJobService
+        job = ImportJobService().enqueue(request.user, 'manday', csv_file)
         
         # Store upload_id in session
-        request.session['current_manday_upload_id'] = upload_id
-        
-        # Process CSV with progress callback
-        from .manday_processor import MandayProcessor
-        from .models import MandayUploadLog
-        processor = MandayProcessor()
-        
-        # Set progress callback
-        def progress_callback(processed, total):
-            cache.set(upload_id, {
-                'processed': processed,
-                'total': total,
-                'status': 'processing',
-                'percentage': int((processed / total) * 100) if total > 0 else 0
-            }, timeout=3600)
-        
-        processor.progress_callback = progress_callback
-        result = processor.process_csv(csv_file, request.user)
-        
-        # Mark as complete
-        cache.set(upload_id, {
-            'processed': result.get('processed_rows', 0),
-            'total': result.get('total_rows', 0),
-            'status': 'complete',
-            'percentage': 100
-        }, timeout=3600)
-        
-        # Create upload log
-        error_messages = '\n'.join(result['errors']) if result['errors'] else ''
-        upload_log = MandayUploadLog.objects.create(
-            user=request.user,
-            filename=csv_file.name,
-            success_count=result['success_count'],
-            updated_count=result['updated_count'],
-            error_count=result['error_count'],
-            error_messages=error_messages
-        )
+        request.session['current_manday_upload_id'] = job.id
         
-        # Log results
-        logger.info(
-            f'Manday CSV processing completed by {request.user.username}: '
-            f'Created={result["success_count"]}, Updated={result["updated_count"]}, Errors={result["error_count"]}'
+        messages.info(
+            request,
+            f'"{csv_file.name}" is queued for processing. Results will appear in the upload logs when it finishes.'
         )
         
-        if result['error_count'] > 0:
-            logger.error(f'Manday CSV processing errors for {csv_file.name}: {error_messages[:200]}...')
-        
-        # Display results
-        if result['success']:
-            messages.success(
-                request,
-                f'Manday data processed successfully! Created: {result["success_count"]}, Updated: {result["updated_count"]}'
-            )
-        else:
-            messages.warning(
-                request,
-                f'Manday data processed with errors. Created: {result["success_count"]}, Updated: {result["updated_count"]}, Errors: {result["error_count"]}'
-            )
-            if result['errors']:
-                for error in result['errors'][:5]:  # Show first 5 errors
-                    messages.error(request, error)
-                if len(result['errors']) > 5:
-                    messages.info(request, f'... and {len(result["errors"]) - 5} more errors. Check upload logs for details.')
-        
         return redirect('core:upload_mandays')
     
     # Get recent upload logs for current user
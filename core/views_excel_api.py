@@ -5,7 +5,7 @@ This module provides REST API endpoints for Excel file upload, validation, and i
 """
 import os
 import json
-from django.http import JsonResponse, FileResponse, HttpResponse
+from django.http import JsonResponse, FileResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
@@ -14,19 +14,21 @@ from django.conf import settings
 import pandas as pd
 import logging
 
-from core.models import ImportLog, ExportLog, UploadPermission, User
+from core.models import ImportLog, ImportJob, ChunkedUpload, ExportLog, UploadPermission, User
 from core.services.file_parser_service import FileParserService, FileType
-from core.services.data_validator_service import DataValidatorService
 from core.services.data_importer_service import DataImporterService
 from core.services.permission_service import PermissionService
+from core.services.import_job_service import ImportJobService
+from core.services.chunked_upload_service import ChunkedUploadService, ChunkedUploadError
 
 logger = logging.getLogger(__name__)
 
 # Initialize services
 file_parser = FileParserService()
-validator = DataValidatorService()
 importer = DataImporterService()
 permission_service = PermissionService()
+import_jobs = ImportJobService()
+chunked_uploads = ChunkedUploadService()
 
 
 @login_required
@@ -92,93 +94,244 @@ def upload_excel_file(request):
 @login_required
 @require_http_methods(["POST"])
 @csrf_exempt
-def process_excel_file(request, session_id):
+def upload_excel_batch(request):
     """
-    Process uploaded file: parse, detect type, validate, and AUTO-IMPORT
+    Upload several Excel files (or multi-sheet workbooks) and queue them as one import job
     
-    POST /api/excel/upload/<session_id>/process/
+    POST /api/excel/upload/batch/
+    A "force" form field imports sheets even if they repeat an earlier clean import
     """
     try:
-        # Get file path
-        upload_dir = os.path.join(settings.MEDIA_ROOT, 'excel_uploads', str(request.user.id))
-        file_path = os.path.join(upload_dir, session_id)
-        
-        if not os.path.exists(file_path):
+        uploaded_files = request.FILES.getlist('files')
+        if not uploaded_files:
             return JsonResponse({
                 'success': False,
-                'error': 'File not found'
-            }, status=404)
-        
-        # Parse file
-        df, error = file_parser.parse_file(file_path)
-        if error:
-            return JsonResponse({
-                'success': False,
-                'error': error
+                'error': 'No files uploaded'
             }, status=400)
         
-        # Detect file type
-        file_type = file_parser.detect_file_type(df)
-        if file_type == FileType.UNKNOWN:
-            return JsonResponse({
-                'success': False,
-                'error': 'Could not detect file type. Please ensure the file has the correct column structure.'
-            }, status=400)
+        max_size = 50 * 1024 * 1024  # 50MB per file
+        for uploaded_file in uploaded_files:
+            if not uploaded_file.name.endswith(('.xls', '.xlsx')):
+                return JsonResponse({
+                    'success': False,
+                    'error': f'{uploaded_file.name}: only .xls and .xlsx files are supported'
+                }, status=400)
+            if uploaded_file.size > max_size:
+                return JsonResponse({
+                    'success': False,
+                    'error': f'{uploaded_file.name}: file size exceeds maximum limit of 50MB'
+                }, status=400)
         
-        # Check upload permission
-        if not permission_service.can_upload(request.user, file_type):
-            return JsonResponse({
-                'success': False,
-                'error': f'You do not have permission to upload {file_type.value} files'
-            }, status=403)
+        # Parsing runs in parallel inside the import worker
+        force = request.POST.get('force') in ('on', 'true', '1')
+        job = import_jobs.enqueue_files(request.user, 'excel_batch', uploaded_files, force=force)
         
-        # Normalize data
-        df = file_parser.normalize_data(df, file_type)
+        logger.info(f"Batch of {len(uploaded_files)} files queued by {request.user.username}")
         
-        # Validate data
-        validation_report = validator.validate_batch(df, file_type.value)
+        return JsonResponse({
+            'success': True,
+            'queued': True,
+            'job_id': job.id,
+            'files': len(uploaded_files)
+        }, status=202)
         
-        # Get preview data
-        preview_df = file_parser.get_preview_data(df, 10)
+    except Exception as e:
+        logger.error(f"Batch upload error: {e}")
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+def _chunked_upload_state(upload):
+    return {
+        'upload_id': upload.upload_id,
+        'filename': upload.filename,
+        'total_size': upload.total_size,
+        'chunk_size': upload.chunk_size,
+        'received_bytes': upload.received_bytes,
+        'next_chunk': upload.next_chunk,
+        'status': upload.status,
+        'job_id': upload.job_id
+    }
+
+
+@login_required
+@require_http_methods(["POST"])
+@csrf_exempt
+def start_chunked_upload(request):
+    """
+    Open a chunked upload for a large Excel file
+    
+    POST /api/excel/upload/chunked/
+    Body (JSON): {"filename": "...", "size": <bytes>}
+    """
+    try:
+        data = json.loads(request.body)
+        upload = chunked_uploads.start(request.user, data.get('filename'), int(data.get('size') or 0))
         
-        logger.info(f"File processed: {session_id}, type: {file_type.value}, valid: {validation_report.valid_rows}/{validation_report.total_rows}")
+        return JsonResponse({
+            'success': True,
+            'upload': _chunked_upload_state(upload)
+        }, status=201)
         
-        # AUTO-IMPORT: Import data immediately after validation
-        result = importer.import_batch(
-            df=df,
-            file_type=file_type,
-            user=request.user,
-            filename=session_id,
-            session_id=session_id  # Pass session_id for progress tracking
-        )
+    except ChunkedUploadError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=e.status)
+    except (ValueError, TypeError):
+        return JsonResponse({
+            'success': False,
+            'error': 'filename and size are required'
+        }, status=400)
+    except Exception as e:
+        logger.error(f"Chunked upload start error: {e}")
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+def _get_chunked_upload(request, upload_id):
+    """The user's own chunked upload, or None"""
+    return ChunkedUpload.objects.filter(upload_id=upload_id, user=request.user).first()
+
+
+@login_required
+@require_http_methods(["GET"])
+def chunked_upload_status(request, upload_id):
+    """
+    Get the state of a chunked upload; resume from next_chunk
+    
+    GET /api/excel/upload/chunked/<upload_id>/
+    """
+    upload = _get_chunked_upload(request, upload_id)
+    if upload is None:
+        return JsonResponse({
+            'success': False,
+            'error': 'Upload not found'
+        }, status=404)
+    
+    return JsonResponse({
+        'success': True,
+        'upload': _chunked_upload_state(upload)
+    })
+
+
+@login_required
+@require_http_methods(["PUT"])
+@csrf_exempt
+def upload_chunk(request, upload_id, chunk_index):
+    """
+    Append one chunk, sent as the raw request body
+    
+    PUT /api/excel/upload/chunked/<upload_id>/<chunk_index>/
+    """
+    upload = _get_chunked_upload(request, upload_id)
+    if upload is None:
+        return JsonResponse({
+            'success': False,
+            'error': 'Upload not found'
+        }, status=404)
+    
+    try:
+        # The body is streamed to disk, never read into memory whole
+        upload = chunked_uploads.append_chunk(upload, chunk_index, request)
         
-        # Clean up temporary files
-        try:
-            os.remove(file_path)
-        except:
-            pass
+        return JsonResponse({
+            'success': True,
+            'upload': _chunked_upload_state(upload)
+        })
         
-        logger.info(f"Auto-import completed: {result.imported_rows} imported, {result.duplicate_rows} duplicates")
+    except ChunkedUploadError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e),
+            'upload': _chunked_upload_state(upload)
+        }, status=e.status)
+    except Exception as e:
+        logger.error(f"Chunk upload error: {e}")
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+@login_required
+@require_http_methods(["POST"])
+@csrf_exempt
+def finalize_chunked_upload(request, upload_id):
+    """
+    Finish a chunked upload and queue it for parsing and import
+    
+    POST /api/excel/upload/chunked/<upload_id>/finalize/
+    Body (optional JSON): {"sha256": "...", "force": true}
+    """
+    upload = _get_chunked_upload(request, upload_id)
+    if upload is None:
+        return JsonResponse({
+            'success': False,
+            'error': 'Upload not found'
+        }, status=404)
+    
+    try:
+        data = json.loads(request.body) if request.body else {}
+        job = chunked_uploads.finalize(upload, data.get('sha256', ''), force=bool(data.get('force')))
         
         return JsonResponse({
             'success': True,
-            'file_type': file_type.value,
-            'total_rows': validation_report.total_rows,
-            'valid_rows': validation_report.valid_rows,
-            'invalid_rows': validation_report.invalid_rows,
-            'duplicate_rows': len(validation_report.duplicates),
-            'preview_data': preview_df.to_dict('records'),
-            'preview_columns': list(preview_df.columns),
-            'validation_errors': validation_report.to_dict()['errors'][:100],  # Limit to first 100 errors
-            'has_errors': validation_report.invalid_rows > 0,
-            # Import results
-            'imported_rows': result.imported_rows,
-            'import_duplicate_rows': result.duplicate_rows,
-            'import_error_rows': result.error_rows,
-            'import_success': result.success,
-            'import_log_id': result.import_log_id,
-            'import_error_message': result.error_message
-        })
+            'queued': True,
+            'job_id': job.id,
+            'session_id': job.filename,
+            'file_hash': upload.file_hash
+        }, status=202)
+        
+    except ChunkedUploadError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e),
+            'upload': _chunked_upload_state(upload)
+        }, status=e.status)
+    except Exception as e:
+        logger.error(f"Chunked upload finalize error: {e}")
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+@login_required
+@require_http_methods(["POST"])
+@csrf_exempt
+def process_excel_file(request, session_id):
+    """
+    Queue uploaded file to be parsed, validated and AUTO-IMPORTED by the import worker
+    
+    POST /api/excel/upload/<session_id>/process/
+    Body (optional JSON or form): "force" imports the file even if it repeats an earlier clean import
+    """
+    try:
+        # Get file path
+        upload_dir = os.path.join(settings.MEDIA_ROOT, 'excel_uploads', str(request.user.id))
+        file_path = os.path.join(upload_dir, session_id)
+        
+        if not os.path.exists(file_path):
+            return JsonResponse({
+                'success': False,
+                'error': 'File not found'
+            }, status=404)
+        
+        # Parsing, validation and import run in the run_import_worker command
+        data = json.loads(request.body) if request.content_type == 'application/json' and request.body else request.POST
+        force = data.get('force') in (True, 'on', 'true', '1')
+        job = import_jobs.enqueue_path(request.user, 'excel', file_path, session_id, force=force)
+        
+        return JsonResponse({
+            'success': True,
+            'queued': True,
+            'job_id': job.id
+        }, status=202)
         
     except Exception as e:
         logger.error(f"Processing error: {e}")
@@ -188,6 +341,18 @@ def process_excel_file(request, session_id):
         }, status=500)
 
 
+def _can_view_session(user, session_id):
+    """Whether user queued the import publishing progress under session_id; root sees all"""
+    if user.role == 'root':
+        return True
+    jobs = ImportJob.objects.filter(user=user)
+    # Batch jobs publish under batch_<job id>, single Excel jobs under the upload's filename
+    batch_id = session_id[len('batch_'):] if session_id.startswith('batch_') else ''
+    if batch_id.isdigit():
+        return jobs.filter(id=int(batch_id), kind='excel_batch').exists()
+    return jobs.filter(kind='excel', filename=session_id).exists()
+
+
 @login_required
 @require_http_methods(["GET"])
 def get_import_progress(request, session_id):
@@ -197,6 +362,12 @@ def get_import_progress(request, session_id):
     GET /api/excel/upload/<session_id>/progress/
     """
     try:
+        if not _can_view_session(request.user, session_id):
+            return JsonResponse({
+                'success': False,
+                'error': 'Permission denied'
+            }, status=403)
+        
         progress = importer.get_progress(session_id)
         
         if progress:
@@ -218,6 +389,73 @@ def get_import_progress(request, session_id):
         }, status=500)
 
 
+@login_required
+@require_http_methods(["GET"])
+def stream_import_progress(request, session_id):
+    """
+    Stream import progress as Server-Sent Events
+    
+    GET /api/excel/upload/<session_id>/progress/stream/
+    """
+    if not _can_view_session(request.user, session_id):
+        return JsonResponse({
+            'success': False,
+            'error': 'Permission denied'
+        }, status=403)
+    
+    response = StreamingHttpResponse(importer.stream_progress(session_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Keep nginx from buffering the stream
+    return response
+
+
+@login_required
+@require_http_methods(["GET"])
+def get_import_job(request, job_id):
+    """
+    Get status and result of a queued import job
+    
+    GET /api/excel/jobs/<job_id>/
+    """
+    try:
+        job = ImportJob.objects.get(id=job_id)
+        
+        # Users see their own jobs; root sees all
+        if request.user.role != 'root' and job.user_id != request.user.id:
+            return JsonResponse({
+                'success': False,
+                'error': 'Permission denied'
+            }, status=403)
+        
+        return JsonResponse({
+            'success': True,
+            'job': {
+                'id': job.id,
+                'kind': job.kind,
+                'filename': job.filename,
+                'status': job.status,
+                'dry_run': job.dry_run,
+                'result': job.result,
+                'error_message': job.error_message,
+                'created_at': job.created_at.isoformat(),
+                'started_at': job.started_at.isoformat() if job.started_at else None,
+                'finished_at': job.finished_at.isoformat() if job.finished_at else None
+            }
+        })
+        
+    except ImportJob.DoesNotExist:
+        return JsonResponse({
+            'success': False,
+            'error': 'Job not found'
+        }, status=404)
+    except Exception as e:
+        logger.error(f"Job status error: {e}")
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
 @login_required
 @require_http_methods(["POST"])
 @csrf_exempt
@@ -226,10 +464,35 @@ def confirm_excel_import(request, session_id):
     Confirm import and process all valid records
     
     POST /api/excel/upload/<session_id>/confirm/
+    
+    With {"dry_run": true} in the body, the uploaded file is queued for a
+    dry run instead: the job's result reports how many rows would be new,
+    changed or unchanged, nothing is written, and the upload is kept so it
+    can be processed afterwards.
     """
     try:
-        # Get processed file
+        data = json.loads(request.body) if request.body else {}
         upload_dir = os.path.join(settings.MEDIA_ROOT, 'excel_uploads', str(request.user.id))
+        
+        if data.get('dry_run'):
+            file_path = os.path.join(upload_dir, session_id)
+            if not os.path.exists(file_path):
+                return JsonResponse({
+                    'success': False,
+                    'error': 'File not found'
+                }, status=404)
+            
+            # Parsing, validation and the comparison run in the run_import_worker command
+            job = import_jobs.enqueue_path(request.user, 'excel', file_path, session_id, dry_run=True)
+            
+            return JsonResponse({
+                'success': True,
+                'queued': True,
+                'dry_run': True,
+                'job_id': job.id
+            }, status=202)
+        
+        # Get processed file
         processed_path = os.path.join(upload_dir, session_id + '.processed.csv')
         
         if not os.path.exists(processed_path):
@@ -288,53 +551,21 @@ def download_error_report(request, session_id):
     GET /api/excel/upload/<session_id>/errors/
     """
     try:
-        # Get file path
-        upload_dir = os.path.join(settings.MEDIA_ROOT, 'excel_uploads', str(request.user.id))
-        file_path = os.path.join(upload_dir, session_id)
+        # The report is written by the import worker while processing the upload
+        report_path = import_jobs.error_report_path(request.user.id, session_id)
         
-        if not os.path.exists(file_path):
-            return JsonResponse({
-                'success': False,
-                'error': 'File not found'
-            }, status=404)
-        
-        # Parse and validate file
-        df, error = file_parser.parse_file(file_path)
-        if error:
-            return JsonResponse({
-                'success': False,
-                'error': error
-            }, status=400)
-        
-        file_type = file_parser.detect_file_type(df)
-        df = file_parser.normalize_data(df, file_type)
-        validation_report = validator.validate_batch(df, file_type.value)
-        
-        # Create error report CSV
-        if not validation_report.errors:
+        if not os.path.exists(report_path):
             return JsonResponse({
                 'success': False,
                 'error': 'No errors found'
             }, status=404)
         
-        # Build error report
-        error_data = []
-        for error in validation_report.errors:
-            error_data.append({
-                'Row': error.row_number,
-                'Column': error.column_name,
-                'Value': error.value,
-                'Error': error.error_message
-            })
-        
-        error_df = pd.DataFrame(error_data)
-        
-        # Generate CSV response
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="error_report_{session_id}.csv"'
-        error_df.to_csv(response, index=False)
-        
-        return response
+        return FileResponse(
+            open(report_path, 'rb'),
+            as_attachment=True,
+            filename=f'error_report_{session_id}.csv',
+            content_type='text/csv'
+        )
         
     except Exception as e:
         logger.error(f"Error report generation failed: {e}")